@@ -0,0 +1,129 @@
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'part1-verification'))
+from image_upload import buffer_pool, decode_data_url, decode_image, read_into_buffer, release_buffer
+
+
+def sample_jpeg(width=640, height=480, quality=92):
+    """Webcam-like frame: smooth gradient plus sensor noise"""
+    rng = np.random.default_rng(42)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    frame += rng.normal(0, 8, frame.shape)
+    ok, encoded = cv2.imencode('.jpg', np.clip(frame, 0, 255).astype(np.uint8),
+                               [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes()
+
+
+def time_per_call(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def run(iterations):
+    jpeg = sample_jpeg()
+    fields = {
+        'visitor_name': 'Benchmark Visitor',
+        'destination_floor': '3',
+        'purpose': 'Meeting',
+        'duration_hours': '2'
+    }
+    json_body = json.dumps(dict(fields, face_image='data:image/jpeg;base64,' + base64.b64encode(jpeg).decode())).encode()
+
+    def legacy():
+        data = json.loads(json_body)
+        decode_data_url(data['face_image'])
+
+    def binary():
+        view = read_into_buffer(io.BytesIO(jpeg), len(jpeg))
+        decode_image(view)
+        release_buffer(view)
+
+    legacy_ms = time_per_call(legacy, iterations)
+    binary_ms = time_per_call(binary, iterations)
+    return {
+        'image_bytes': len(jpeg),
+        'json_base64_request_bytes': len(json_body),
+        'binary_request_bytes': len(jpeg),
+        'bytes_saved_per_verification': len(json_body) - len(jpeg),
+        'json_base64_decode_ms': round(legacy_ms, 3),
+        'binary_decode_ms': round(binary_ms, 3),
+        'ms_saved_per_verification': round(legacy_ms - binary_ms, 3)
+    }
+
+
+def run_server(requests_total, concurrency):
+    """Concurrent binary uploads through the app on a threaded Werkzeug server"""
+    # Keep the service from calling the robot system while being measured
+    os.environ.setdefault('ROBOT_SYSTEM_URL', 'http://127.0.0.1:9')
+    os.environ.setdefault('DUPLICATE_VISITOR_POLICY', 'flag')
+    import requests
+    from werkzeug.serving import make_server
+    import app as service
+
+    service.readiness.start()
+    service.readiness.wait('face_index', 120)
+    server = make_server('127.0.0.1', 0, service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/verify_visitor_upload'
+
+    jpeg = sample_jpeg()
+    fields = {'visitor_name': 'Benchmark Visitor', 'destination_floor': '3',
+              'purpose': 'Benchmark', 'duration_hours': '1'}
+    sessions = threading.local()
+
+    def upload(i):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        start = time.perf_counter()
+        response = sessions.session.post(url, params=fields, data=jpeg, headers={'Content-Type': 'image/jpeg'})
+        return time.perf_counter() - start, response.status_code
+
+    before = buffer_pool.get_stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(upload, range(requests_total)))
+    wall_s = time.perf_counter() - start
+    server.shutdown()
+
+    after = buffer_pool.get_stats()
+    latencies_ms = np.array([r[0] for r in results]) * 1000
+    return {
+        'requests': requests_total,
+        'concurrency': concurrency,
+        'status_codes': {str(code): sum(1 for r in results if r[1] == code) for code in sorted({r[1] for r in results})},
+        'throughput_per_s': round(requests_total / wall_s, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'buffers_reused': after['reused'] - before['reused'],
+        'buffers_allocated': after['allocated'] - before['allocated'],
+        'buffers_dropped': after['dropped'] - before['dropped']
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare base64 JSON and binary face upload decoding')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--server', action='store_true',
+                        help='also send concurrent uploads through the app on a threaded server')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    results = run(args.iterations)
+    if args.server:
+        results['server'] = run_server(args.requests, args.concurrency)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,440 @@
+import argparse
+import base64
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+REPO_PATH = os.path.dirname(BENCHMARKS_PATH)
+SERVICE_PATHS = {
+    'verification': os.path.join(REPO_PATH, 'part1-verification'),
+    'sensor': os.path.join(REPO_PATH, 'part2-sensor-ml'),
+    'robot': os.path.join(REPO_PATH, 'part3-robots')
+}
+SERVICE_MODULES = {
+    'verification': 'app',
+    'sensor': 'sensor_monitor',
+    'robot': 'robot_controller'
+}
+STARTUP_TIMEOUT_SECONDS = 120
+
+# Keep the services from calling each other or Jenkins while being measured
+WORKER_ENV = {
+    'ROBOT_SYSTEM_URL': 'http://127.0.0.1:9',
+    'DUPLICATE_VISITOR_POLICY': 'flag',
+    'ROBOT_RUN_SIMULATION': 'false',
+    'BROADCAST_BACKEND': 'local'
+}
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(latencies_s, wall_s, statuses):
+    latencies_ms = np.asarray(latencies_s) * 1000
+    return {
+        'requests': len(latencies_ms),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'mean_ms': round(float(latencies_ms.mean()), 3),
+        'throughput_per_s': round(len(latencies_ms) / wall_s, 2) if wall_s > 0 else None,
+        'status_codes': {str(k): v for k, v in sorted(statuses.items())},
+        'rss_mb': round(rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def measure(fn, requests, threads=1, warmup=5):
+    """Call fn(i) `requests` times; fn returns an HTTP-style status code"""
+    for i in range(warmup):
+        fn(-1 - i)
+
+    statuses = {}
+    lock = threading.Lock()
+
+    def timed(i):
+        start = time.perf_counter()
+        status = fn(i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+        return elapsed
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(timed, range(requests)))
+    else:
+        latencies = [timed(i) for i in range(requests)]
+    return summarize(latencies, time.perf_counter() - start, statuses)
+
+
+def thread_client(app):
+    """Flask test client per thread"""
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+    return client
+
+
+def sample_face_jpeg(path=None):
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+    sys.path.insert(0, BENCHMARKS_PATH)
+    from bench_image_decode import sample_jpeg
+    return sample_jpeg()
+
+
+def bench_verification(args, scratch):
+    import app as service
+    client = thread_client(service.app)
+    jpeg = sample_face_jpeg(args.face_image)
+    fields = {'visitor_name': 'Benchmark Visitor', 'destination_floor': '3',
+              'purpose': 'Benchmark', 'duration_hours': '1'}
+    json_body = dict(fields, face_image='data:image/jpeg;base64,' + base64.b64encode(jpeg).decode())
+
+    return {
+        'POST /verify_visitor': measure(
+            lambda i: client().post('/verify_visitor', json=json_body).status_code,
+            args.requests, args.threads),
+        'POST /verify_visitor_upload': measure(
+            lambda i: client().post('/verify_visitor_upload', query_string=fields, data=jpeg,
+                                    content_type='image/jpeg').status_code,
+            args.requests, args.threads),
+        'GET /health': measure(lambda i: client().get('/health').status_code, args.requests, args.threads)
+    }
+
+
+def isolate_sensor(service, scratch):
+    """Never overwrite the deployed model or today's readings"""
+    service.SENSOR_DATA_PATH = os.path.join(scratch, 'sensor-data')
+    service.SHARED_DATA_PATH = os.path.join(scratch, 'shared-data')
+    service.ml_pipeline.sensor_data_path = service.SENSOR_DATA_PATH
+    service.ml_pipeline.models_path = os.path.join(scratch, 'models')
+    service.sensor_history.sensor_data_path = service.SENSOR_DATA_PATH
+    service.ml_pipeline.sensor_models.models_path = service.ml_pipeline.models_path
+    for path in (service.SENSOR_DATA_PATH, service.SHARED_DATA_PATH, service.ml_pipeline.models_path):
+        os.makedirs(path, exist_ok=True)
+
+
+def isolate_robot(service, scratch):
+    service.SHARED_DATA_PATH = os.path.join(scratch, 'shared-data')
+    os.makedirs(service.SHARED_DATA_PATH, exist_ok=True)
+    service.robot_system.authorized_visitors.log_path = os.path.join(service.SHARED_DATA_PATH, 'authorized_visitors.jsonl')
+
+
+def bench_sensor(args, scratch):
+    import sensor_monitor as service
+    isolate_sensor(service, scratch)
+
+    generator = service.sensor_generator
+    pipeline = service.ml_pipeline
+    client = thread_client(service.app)
+    readings = [generator.generate_sensor_reading() for _ in range(max(args.requests, 100))]
+
+    def generate(i):
+        generator.generate_sensor_reading()
+        return 200
+
+    def save(i):
+        generator.save_sensor_data(readings[i % len(readings)])
+        return 200
+
+    def train(i):
+        return 200 if pipeline.train_model().get('success') else 500
+
+    def predict(i):
+        return 200 if 'error' not in pipeline.predict(readings[i % len(readings)]) else 500
+
+    def ingest(i):
+        pipeline.ingest_reading(readings[i % len(readings)])
+        return 200
+
+    results = {
+        'SensorDataGenerator.generate_sensor_reading': measure(generate, args.requests, warmup=0),
+        'SensorDataGenerator.save_sensor_data': measure(save, args.requests, warmup=0),
+        'MLPipeline.train_model': measure(train, args.train_runs, warmup=0)
+    }
+    pipeline.prediction_cache.clear()
+    results['MLPipeline.predict'] = measure(predict, args.requests)
+    results['MLPipeline.ingest_reading'] = measure(ingest, args.requests)
+    results['POST /predict'] = measure(
+        lambda i: client().post('/predict', json=readings[i % len(readings)]).status_code,
+        args.requests, args.threads)
+    results['GET /sensor_data'] = measure(
+        lambda i: client().get('/sensor_data').status_code, args.requests, args.threads)
+    results['GET /sensor_data/query'] = measure(
+        lambda i: client().get('/sensor_data/query?bucket_seconds=300&fields=temperature,pressure').status_code,
+        args.requests, args.threads)
+    return results
+
+
+def bench_robot(args, scratch):
+    import robot_controller as service
+    isolate_robot(service, scratch)
+    client = thread_client(service.app)
+    valid_until = (datetime.now() + timedelta(hours=1)).isoformat()
+
+    def threshold_alert(i):
+        alert = {'timestamp': datetime.now().isoformat(), 'sensor_id': 'OIL_SENSOR_1',
+                 'violations': ['Temperature: 95.0°C'], 'all_parameters': {}}
+        return client().post('/threshold_alert', json=alert).status_code
+
+    def new_visitor(i):
+        visitor = {'visitor_id': 800_000_000 + i, 'name': f'Benchmark {i}',
+                   'destination_floor': i % 5 + 1, 'valid_until': valid_until}
+        return client().post('/new_visitor', json=visitor).status_code
+
+    results = {
+        'POST /threshold_alert': measure(threshold_alert, args.requests, args.threads),
+        'POST /new_visitor': measure(new_visitor, args.requests, args.threads),
+        'GET /api/dashboard_data': measure(
+            lambda i: client().get('/api/dashboard_data').status_code, args.requests, args.threads)
+    }
+    etag = client().get('/api/dashboard_data').headers.get('ETag', '')
+    results['GET /api/dashboard_data If-None-Match'] = measure(
+        lambda i: client().get('/api/dashboard_data', headers={'If-None-Match': etag}).status_code,
+        args.requests, args.threads)
+
+    # Socket.IO: one broadcast fanned out to every connected test client
+    sockets = [service.socketio.test_client(service.app) for _ in range(args.socket_clients)]
+
+    def broadcast(i):
+        service.robot_system.create_alert(f'Benchmark broadcast {i}', 'info')
+        return 200
+
+    results[f'socketio broadcast x{args.socket_clients} clients'] = measure(broadcast, args.requests)
+    for socket in sockets:
+        socket.get_received()
+
+    def dashboard_update(i):
+        socket = sockets[i % len(sockets)]
+        socket.emit('request_dashboard_update')
+        return 200 if socket.get_received() else 500
+
+    results['socketio request_dashboard_update'] = measure(dashboard_update, args.requests)
+    for socket in sockets:
+        socket.disconnect()
+    return results
+
+
+BENCHES = {
+    'verification': bench_verification,
+    'sensor': bench_sensor,
+    'robot': bench_robot
+}
+
+
+ISOLATE = {
+    'sensor': isolate_sensor,
+    'robot': isolate_robot
+}
+
+
+def run_startup_probe(args):
+    """Time a cold import, the first /health and readiness in this fresh process"""
+    os.chdir(SERVICE_PATHS[args.startup_probe])
+    sys.path.insert(0, SERVICE_PATHS[args.startup_probe])
+    result = {}
+    with tempfile.TemporaryDirectory(prefix=f'startup-{args.startup_probe}-') as scratch:
+        try:
+            start = time.perf_counter()
+            service = importlib.import_module(SERVICE_MODULES[args.startup_probe])
+            result['import_seconds'] = round(time.perf_counter() - start, 3)
+            if args.startup_probe in ISOLATE:
+                ISOLATE[args.startup_probe](service, scratch)
+
+            client = service.app.test_client()
+            result['health_status'] = client.get('/health').status_code
+            result['first_health_seconds'] = round(time.perf_counter() - start, 3)
+
+            service.readiness.start()
+            status = 503
+            while status != 200 and time.perf_counter() - start < STARTUP_TIMEOUT_SECONDS:
+                response = client.get('/ready')
+                status = response.status_code
+                if status != 200:
+                    time.sleep(0.05)
+            readiness = response.get_json()
+            result['ready'] = status == 200
+            result['ready_seconds'] = round(time.perf_counter() - start, 3)
+            result['mode'] = readiness['mode']
+            result['steps'] = readiness['steps']
+            result['deferred_imports'] = readiness['imports']
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+        result['rss_mb'] = round(rss_mb(), 1)
+    with open(args.result_file, 'w') as f:
+        json.dump(result, f)
+
+
+def heaviest_imports(importtime_log, limit=10):
+    """Service module and its direct imports by cumulative -X importtime cost"""
+    entries = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            entries.append((name.strip(), int(cumulative) / 1000))
+    entries.sort(key=lambda entry: -entry[1])
+    return {name: round(ms, 1) for name, ms in entries[:limit]}
+
+
+def measure_startup(service):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    command = [sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+               '--startup-probe', service, '--result-file', result_file]
+    log = subprocess.run(command, env=dict(os.environ, **WORKER_ENV), capture_output=True, text=True)
+    try:
+        with open(result_file) as f:
+            result = json.load(f)
+        result['heaviest_imports_ms'] = heaviest_imports(log.stderr)
+        return result
+    except (OSError, ValueError):
+        return {'error': (log.stderr or log.stdout).strip()[-2000:]}
+    finally:
+        if os.path.exists(result_file):
+            os.unlink(result_file)
+
+
+def run_worker(args):
+    """Benchmark one service in this process and write its results to a file"""
+    os.chdir(SERVICE_PATHS[args.worker])
+    sys.path.insert(0, SERVICE_PATHS[args.worker])
+    result = {'rss_mb_at_start': round(rss_mb(), 1)}
+    with tempfile.TemporaryDirectory(prefix=f'bench-{args.worker}-') as scratch:
+        try:
+            start = time.perf_counter()
+            result['scenarios'] = BENCHES[args.worker](args, scratch)
+            result['total_seconds'] = round(time.perf_counter() - start, 2)
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    with open(args.result_file, 'w') as f:
+        json.dump(result, f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_PATH,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    """Benchmark each service in its own process so RSS is per service"""
+    report = {
+        'run': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'requests': args.requests,
+            'threads': args.threads
+        },
+        'services': {}
+    }
+
+    for service in args.services:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            result_file = f.name
+        command = [sys.executable, os.path.abspath(__file__), '--worker', service,
+                   '--result-file', result_file, '--requests', str(args.requests),
+                   '--threads', str(args.threads), '--train-runs', str(args.train_runs),
+                   '--socket-clients', str(args.socket_clients)]
+        if args.face_image:
+            command += ['--face-image', os.path.abspath(args.face_image)]
+
+        print(f"Benchmarking {service}...")
+        log = subprocess.run(command, env=dict(os.environ, **WORKER_ENV), capture_output=True, text=True)
+        try:
+            with open(result_file) as f:
+                report['services'][service] = json.load(f)
+        except (OSError, ValueError):
+            report['services'][service] = {'error': (log.stderr or log.stdout).strip()[-2000:]}
+        finally:
+            if os.path.exists(result_file):
+                os.unlink(result_file)
+        report['services'][service]['startup'] = measure_startup(service)
+    return report
+
+
+def compare(report, baseline):
+    """Print p95 and throughput changes against a previous report"""
+    for service, result in report['services'].items():
+        before = baseline.get('services', {}).get(service, {}).get('startup', {})
+        after = result.get('startup', {})
+        for key in ('import_seconds', 'ready_seconds'):
+            if key in before and key in after:
+                print(f"{service:13s} startup {key:37s} {before[key]:9.3f} -> {after[key]:9.3f} s")
+
+        previous = baseline.get('services', {}).get(service, {}).get('scenarios', {})
+        for scenario, stats in result.get('scenarios', {}).items():
+            if scenario not in previous:
+                continue
+            before = previous[scenario]
+            p95_change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            print(f"{service:13s} {scenario:45s} p95 {before['p95_ms']:9.3f} -> {stats['p95_ms']:9.3f} ms "
+                  f"({p95_change:+.1f}%)  throughput {before['throughput_per_s']} -> {stats['throughput_per_s']}/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark all three services and write a JSON report')
+    parser.add_argument('--services', nargs='+', default=list(SERVICE_PATHS), choices=list(SERVICE_PATHS))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1, help='concurrent callers for HTTP scenarios')
+    parser.add_argument('--train-runs', type=int, default=3)
+    parser.add_argument('--socket-clients', type=int, default=100)
+    parser.add_argument('--face-image', help='JPEG containing a face; a synthetic frame is used otherwise')
+    parser.add_argument('--output', default=os.path.join(BENCHMARKS_PATH, 'results', f"services-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument('--baseline', help='previous report to compare against')
+    parser.add_argument('--worker', choices=list(SERVICE_PATHS), help=argparse.SUPPRESS)
+    parser.add_argument('--startup-probe', choices=list(SERVICE_PATHS), help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        sys.exit(0)
+    if args.startup_probe:
+        run_startup_probe(args)
+        sys.exit(0)
+
+    report = run_suite(args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
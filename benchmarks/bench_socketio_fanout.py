@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+import aiohttp
+import numpy as np
+import socketio
+
+# Visitor IDs used by the harness; high enough not to collide with kiosk IDs
+VISITOR_ID_BASE = 900_000_000
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return {}
+    values = np.asarray(values_ms)
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2)
+    }
+
+
+async def connect_clients(url, count, concurrency, received):
+    """Open `count` dashboard clients that record when each test visitor arrives"""
+    semaphore = asyncio.Semaphore(concurrency)
+    clients = []
+    failures = 0
+
+    async def open_client():
+        nonlocal failures
+        client = socketio.AsyncClient(reconnection=False)
+
+        @client.on('new_visitor')
+        async def on_new_visitor(data):
+            seq = data.get('visitor_id', 0) - VISITOR_ID_BASE
+            if seq in received:
+                received[seq].append(time.perf_counter())
+
+        async with semaphore:
+            try:
+                await client.connect(url, transports=['websocket'])
+                clients.append(client)
+            except Exception as e:
+                failures += 1
+                if failures == 1:
+                    print(f"Client connection failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(open_client() for _ in range(count)))
+    return clients, failures, time.perf_counter() - start
+
+
+async def run(url, clients, events, interval, concurrency, settle):
+    received = {}
+    connected, failures, connect_seconds = await connect_clients(url, clients, concurrency, received)
+
+    sent_at = {}
+    async with aiohttp.ClientSession() as session:
+        for seq in range(events):
+            received[seq] = []
+            visitor = {
+                'visitor_id': VISITOR_ID_BASE + seq,
+                'name': f'Load Test {seq}',
+                'destination_floor': 1,
+                'valid_until': (datetime.now() + timedelta(minutes=1)).isoformat()
+            }
+            sent_at[seq] = time.perf_counter()
+            async with session.post(f"{url}/new_visitor", json=visitor) as response:
+                await response.read()
+            await asyncio.sleep(interval)
+
+    await asyncio.sleep(settle)
+    await asyncio.gather(*(client.disconnect() for client in connected), return_exceptions=True)
+
+    deliveries = []
+    fan_out_complete = []
+    delivered = 0
+    for seq, times in received.items():
+        latencies = [(t - sent_at[seq]) * 1000 for t in times]
+        deliveries.extend(latencies)
+        delivered += len(latencies)
+        if len(latencies) == len(connected) and latencies:
+            fan_out_complete.append(max(latencies))
+
+    return {
+        'url': url,
+        'clients_requested': clients,
+        'clients_connected': len(connected),
+        'connect_failures': failures,
+        'connect_seconds': round(connect_seconds, 2),
+        'events': events,
+        'deliveries_expected': events * len(connected),
+        'deliveries_received': delivered,
+        'delivery_latency': percentiles(deliveries),
+        'fan_out_complete_latency': percentiles(fan_out_complete)
+    }
+
+
+if __name__ == '__main__':
+    # Each event registers a one-minute test visitor through /new_visitor, which
+    # also writes the usual pipeline trigger file: point this at a staging instance
+    parser = argparse.ArgumentParser(description='Measure robot dashboard Socket.IO fan-out latency')
+    parser.add_argument('--url', default='http://localhost:5003')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between broadcast events')
+    parser.add_argument('--connect-concurrency', type=int, default=100)
+    parser.add_argument('--settle', type=float, default=2.0, help='seconds to wait for late deliveries')
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.clients, args.events, args.interval,
+                             args.connect_concurrency, args.settle))
+    print(json.dumps(result, indent=2))
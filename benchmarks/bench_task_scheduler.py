@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'part3-robots'))
+from task_scheduler import SECONDS_PER_FLOOR, TASK_TYPES, TaskScheduler
+
+FLOORS = 10
+
+
+def make_fleet(n_robots, rng):
+    """Robots with two or three random capabilities, each covering a band of floors"""
+    capabilities = sorted({t['capability'] for t in TASK_TYPES.values()})
+    fleet = {}
+    for i in range(n_robots):
+        first_floor = int(rng.integers(1, FLOORS - 1))
+        fleet[f'robot_{i + 1}'] = {
+            'current_floor': first_floor,
+            'battery_level': float(rng.uniform(40, 100)),
+            'assigned_floors': list(range(first_floor, min(first_floor + 3, FLOORS + 1))),
+            'capabilities': list(rng.choice(capabilities, size=int(rng.integers(2, 4)), replace=False))
+        }
+    return fleet
+
+
+def run(n_robots, rate, sim_seconds, tick_seconds, speedup, seed):
+    """Feed Poisson task arrivals through the scheduler on a simulated clock.
+
+    Robots travel and work `speedup` times faster than the real fleet so a
+    short run at thousands of tasks per second still completes tasks.
+    """
+    rng = np.random.default_rng(seed)
+    task_types = {kind: dict(t, service_seconds=t['service_seconds'] / speedup) for kind, t in TASK_TYPES.items()}
+    scheduler = TaskScheduler(make_fleet(n_robots, rng), task_types, seconds_per_floor=SECONDS_PER_FLOOR / speedup)
+    kinds = list(TASK_TYPES)
+
+    dispatch_s = 0.0
+    submit_s = 0.0
+    submitted = 0
+    start = time.perf_counter()
+    for step in range(int(sim_seconds / tick_seconds)):
+        now = step * tick_seconds
+        n = rng.poisson(rate * tick_seconds)
+        task_kinds = rng.choice(kinds, size=n)
+        floors = rng.integers(1, FLOORS + 1, size=n)
+
+        t0 = time.perf_counter()
+        for kind, floor in zip(task_kinds.tolist(), floors.tolist()):
+            scheduler.submit(kind, floor, now=now)
+        t1 = time.perf_counter()
+        scheduler.advance(now)
+        scheduler.dispatch(now)
+        t2 = time.perf_counter()
+
+        submit_s += t1 - t0
+        dispatch_s += t2 - t1
+        submitted += n
+    wall_s = time.perf_counter() - start
+
+    stats = scheduler.get_stats()
+    return {
+        'robots': n_robots,
+        'arrival_rate_per_sim_s': rate,
+        'sim_seconds': sim_seconds,
+        'speedup': speedup,
+        'submitted': submitted,
+        'assigned': stats['assigned'],
+        'completed': stats['completed'],
+        'rejected': stats['rejected'],
+        'pending_at_end': stats['pending'],
+        'wall_seconds': round(wall_s, 3),
+        'tasks_per_wall_s': round(submitted / wall_s, 1) if wall_s > 0 else None,
+        'submit_us_per_task': round(submit_s / max(submitted, 1) * 1e6, 2),
+        'dispatch_us_per_assignment': round(dispatch_s / max(stats['assigned'], 1) * 1e6, 2),
+        'sim_latency_seconds': stats['latency_seconds']
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure robot task scheduler throughput on a simulated clock')
+    parser.add_argument('--robots', type=int, nargs='+', default=[2, 20, 200])
+    parser.add_argument('--rate', type=float, default=2000, help='Task arrivals per simulated second')
+    parser.add_argument('--sim-seconds', type=float, default=10)
+    parser.add_argument('--tick-seconds', type=float, default=0.1)
+    parser.add_argument('--speedup', type=float, default=1000, help='How much faster robots work than real ones')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = [run(n, args.rate, args.sim_seconds, args.tick_seconds, args.speedup, args.seed) for n in args.robots]
+    print(json.dumps(results, indent=2))
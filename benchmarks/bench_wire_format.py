@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'part2-sensor-ml'))
+import sensor_segments
+import wire
+from sensor_synth import SensorSynthesizer
+
+
+def sample_visitor():
+    now = datetime.now()
+    return {
+        'visitor_id': 'VIS_20240101_120000_4821',
+        'name': 'Benchmark Visitor',
+        'destination_floor': 3,
+        'purpose': 'Meeting',
+        'duration_hours': 2,
+        'entry_time': now.isoformat(),
+        'valid_until': (now + timedelta(hours=2)).isoformat(),
+        'image_key': '3f2a9c0d1b7e4f56',
+        'image_path': '/app/visitor-images/3f/3f2a9c0d1b7e4f56.jpg',
+        'status': 'approved'
+    }
+
+
+def sample_alert(reading):
+    return {
+        'timestamp': reading['timestamp'],
+        'sensor_id': reading['sensor_id'],
+        'violations': ['Temperature: 91.2°C (threshold: 85.0°C)', 'Pressure: 163.5 PSI (threshold: 150.0 PSI)'],
+        'all_parameters': reading
+    }
+
+
+def time_per_call(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def compare_codecs(payload, formats, iterations):
+    """Encoded size and encode/decode time of one payload per wire format"""
+    results = {}
+    indented = json.dumps(payload, indent=2).encode()
+    results['json_indent2'] = {
+        'bytes': len(indented),
+        'encode_ms': round(time_per_call(lambda: json.dumps(payload, indent=2), iterations), 4),
+        'decode_ms': round(time_per_call(lambda: json.loads(indented), iterations), 4)
+    }
+    for wire_format in formats:
+        body, content_type = wire.encode(payload, wire_format)
+        decode = wire.CODECS[content_type][1]
+        results[wire_format] = {
+            'bytes': len(body),
+            'encode_ms': round(time_per_call(lambda: wire.encode(payload, wire_format), iterations), 4),
+            'decode_ms': round(time_per_call(lambda: decode(body), iterations), 4)
+        }
+    return results
+
+
+def compare_storage(readings, batch_size):
+    """Persist readings in batches as a rewritten JSON day file and as an appended segment"""
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        json_file = os.path.join(scratch, 'sensor_data.json')
+        start = time.perf_counter()
+        for i in range(0, len(readings), batch_size):
+            # SensorDataGenerator.save_sensor_data: read, extend, rewrite
+            existing = []
+            if os.path.exists(json_file):
+                with open(json_file, 'r') as f:
+                    existing = json.load(f)
+            existing.extend(readings[i:i + batch_size])
+            with open(json_file, 'w') as f:
+                json.dump(existing, f, indent=2)
+        json_write_s = time.perf_counter() - start
+        start = time.perf_counter()
+        with open(json_file, 'r') as f:
+            json.load(f)
+        json_read_s = time.perf_counter() - start
+
+        segment_file = os.path.join(scratch, 'sensor_data.seg')
+        start = time.perf_counter()
+        for i in range(0, len(readings), batch_size):
+            sensor_segments.append_segment(segment_file, readings[i:i + batch_size])
+        segment_write_s = time.perf_counter() - start
+        start = time.perf_counter()
+        sensor_segments.to_columns(sensor_segments.read_segment(segment_file))
+        segment_read_s = time.perf_counter() - start
+
+        results['json_day_file'] = {
+            'bytes': os.path.getsize(json_file),
+            'write_all_seconds': round(json_write_s, 3),
+            'read_seconds': round(json_read_s, 4)
+        }
+        results['segment'] = {
+            'bytes': os.path.getsize(segment_file),
+            'write_all_seconds': round(segment_write_s, 3),
+            'read_columns_seconds': round(segment_read_s, 4)
+        }
+    return results
+
+
+def run(batch_sizes, iterations, day_readings, save_batch):
+    synthesizer = SensorSynthesizer(seed=42)
+    formats = ['json'] + (['msgpack'] if wire.msgpack is not None else [])
+
+    readings = synthesizer.readings(max(batch_sizes + [day_readings]))
+    results = {
+        'msgpack_available': wire.msgpack is not None,
+        'visitor': compare_codecs(sample_visitor(), formats, iterations),
+        'threshold_alert': compare_codecs(sample_alert(readings[0]), formats, iterations)
+    }
+    for n in batch_sizes:
+        results[f'readings_x{n}'] = compare_codecs(readings[:n], formats + ['readings'],
+                                                   max(1, iterations // n))
+    results[f'daily_file_{day_readings}_readings_in_batches_of_{save_batch}'] = compare_storage(
+        readings[:day_readings], save_batch)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare JSON, MessagePack and packed sensor records')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--day-readings', type=int, default=2880, help='readings persisted per simulated day')
+    parser.add_argument('--save-batch', type=int, default=1, help='readings per save (the generator saves one)')
+    args = parser.parse_args()
+    print(json.dumps(run(args.batch_sizes, args.iterations, args.day_readings, args.save_batch), indent=2))
@@ -101,7 +101,7 @@ pipeline {
                     echo "Analyzing sensor data on ${env.NODE_NAME}..."
                     
                     def sensorDataSize = sh(
-                        script: "find ${SHARED_DATA_PATH} -name 'sensor_data_*.json' -exec wc -c {} + | tail -1 | awk '{print \$1}' || echo '0'",
+                        script: "find ${SHARED_DATA_PATH} -name 'sensor_data_*' -exec wc -c {} + | tail -1 | awk '{print \$1}' || echo '0'",
                         returnStdout: true
                     ).trim()
                     
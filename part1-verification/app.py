@@ -1,15 +1,25 @@
-from flask import Flask, render_template, request, jsonify
-import cv2
-import face_recognition
+from flask import Flask, Response, render_template, request, jsonify, send_file
 import os
 import json
 from datetime import datetime, timedelta
-import base64
-import numpy as np
 from face_verification import FaceVerification
+from image_store import ImageStore
+from face_index import ActiveFaceIndex
+import metrics
+import profiler
+import startup
+import wire
+from image_upload import (ImageTooLargeError, MAX_IMAGE_BYTES, buffer_pool, decode_data_url,
+                          decode_image, read_into_buffer, release_buffer)
 import requests
 
+# dlib's face models load on first use, not at import
+face_recognition = startup.lazy_import('face_recognition')
+
 app = Flask(__name__)
+# Base64 JSON uploads are a third larger than the image itself
+app.config['MAX_CONTENT_LENGTH'] = MAX_IMAGE_BYTES * 3 // 2
+app.register_blueprint(profiler.blueprint)
 face_verifier = FaceVerification()
 
 SHARED_DATA_PATH = "/app/shared-data"
@@ -21,6 +31,43 @@ os.makedirs(SHARED_DATA_PATH, exist_ok=True)
 os.makedirs(VISITOR_IMAGES_PATH, exist_ok=True)
 os.makedirs(VISITOR_RECORDS_PATH, exist_ok=True)
 
+# Face encodings of visitors holding a valid pass, for duplicate detection
+face_index = ActiveFaceIndex(os.path.join(VISITOR_RECORDS_PATH, 'face-encodings'))
+
+# 'return_existing' hands back the active pass; 'flag' issues a new pass
+# marked as a duplicate
+DUPLICATE_VISITOR_POLICY = os.getenv('DUPLICATE_VISITOR_POLICY', 'return_existing')
+
+# Longest pass that can be issued; the face index reloads this far back on start-up
+MAX_PASS_HOURS = int(os.getenv('MAX_PASS_HOURS', '168'))
+
+# Visitor images are written off the request path, deduplicated by content
+image_store = ImageStore(
+    VISITOR_IMAGES_PATH,
+    jpeg_quality=int(os.getenv('VISITOR_IMAGE_QUALITY', '85'))
+)
+
+FACE_ENCODING_SECONDS = metrics.histogram('verification_face_encoding_seconds',
+                                          'Face detection and encoding time')
+VERIFICATIONS_TOTAL = metrics.counter('verification_requests_total', 'Verification outcomes')
+
+# How long a verification waits for start-up before answering 503
+STARTUP_WAIT_SECONDS = float(os.getenv('STARTUP_WAIT_SECONDS', '5'))
+
+# Face models and the active face index load off the request path; /health
+# answers immediately and /ready reports progress
+readiness = startup.Readiness('verification-system')
+readiness.step('face_models', lambda: startup.preload(face_recognition, startup.lazy_import('cv2')))
+readiness.step('face_index', lambda: face_index.rebuild(VISITOR_RECORDS_PATH, MAX_PASS_HOURS))
+
+def load_visitor_record(visitor_id):
+    """Load a visitor record by ID, or None if missing"""
+    filename = os.path.join(VISITOR_RECORDS_PATH, f"visitor_{visitor_id}.json")
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        return json.load(f)
+
 def get_next_visitor_id():
     """Generate next visitor ID"""
     try:
@@ -40,6 +87,7 @@ def get_next_visitor_id():
         print(f"Error generating visitor ID: {e}")
         return int(datetime.now().timestamp()) % 10000  # Fallback ID
 
+@metrics.timed('verification_save_visitor_record', 'Visitor record and daily log write time')
 def save_visitor_record(visitor_data):
     """Save visitor record to JSON file"""
     try:
@@ -75,95 +123,158 @@ def index():
 
 @app.route('/verify_visitor', methods=['POST'])
 def verify_visitor():
+    """Verify a visitor from JSON with a base64 data URL image"""
     try:
         data = request.get_json()
-        
-        # Extract visitor information
-        visitor_name = data.get('visitor_name')
-        destination_floor = data.get('destination_floor')
-        purpose = data.get('purpose')
-        duration_hours = int(data.get('duration_hours', 1))
-        face_image_data = data.get('face_image')
-        
-        # Decode base64 image
-        image_data = base64.b64decode(face_image_data.split(',')[1])
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Verify face
-        face_encodings = face_recognition.face_encodings(image)
-        
-        if not face_encodings:
-            return jsonify({
-                'success': False,
-                'message': 'No face detected in the image'
-            })
-        
-        # Generate visitor ID
-        visitor_id = get_next_visitor_id()
-        
-        # Save visitor image with timestamp
-        today_folder = datetime.now().strftime('%Y-%m-%d')
-        daily_folder = os.path.join(VISITOR_IMAGES_PATH, today_folder)
-        os.makedirs(daily_folder, exist_ok=True)
-        
-        image_filename = f"visitor_{visitor_id}_{datetime.now().strftime('%H%M%S')}.jpg"
-        image_path = os.path.join(daily_folder, image_filename)
-        cv2.imwrite(image_path, image)
-        
-        # Create visitor record
-        visitor_data = {
-            'visitor_id': visitor_id,
-            'name': visitor_name,
-            'destination_floor': int(destination_floor),
-            'purpose': purpose,
-            'duration_hours': duration_hours,
-            'entry_time': datetime.now().isoformat(),
-            'valid_until': (datetime.now() + timedelta(hours=duration_hours)).isoformat(),
-            'image_path': image_path,
-            'status': 'approved'
-        }
-        
-        # Save visitor record
-        if not save_visitor_record(visitor_data):
-            return jsonify({
-                'success': False,
-                'message': 'Failed to save visitor record'
-            })
-        
-        # Save to shared data directory for Jenkins pipeline
-        shared_file = os.path.join(SHARED_DATA_PATH, f"visitor_{visitor_id}.json")
-        with open(shared_file, 'w') as f:
-            json.dump(visitor_data, f, indent=2)
-        
-        # Notify robot system
-        try:
-            robot_url = os.getenv('ROBOT_SYSTEM_URL', 'http://robot-system:5000')
-            robot_response = requests.post(
-                f'{robot_url}/new_visitor',
-                json=visitor_data,
-                timeout=5
-            )
-            print(f"Notified robot system: {robot_response.status_code}")
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to notify robot system: {e}")
-        
-        # Trigger Jenkins pipeline
-        trigger_jenkins_pipeline('verification-pipeline')
-        
+        image, image_data = decode_data_url(data.get('face_image'))
+        return register_visitor(data, image, image_data)
+    except ImageTooLargeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 413
+    except Exception as e:
+        print(f"Verification error: {e}")
         return jsonify({
-            'success': True,
-            'visitor_id': visitor_id,
-            'message': f'Access granted to floor {destination_floor} for {duration_hours} hours',
-            'valid_until': visitor_data['valid_until']
+            'success': False,
+            'message': f'Verification failed: {str(e)}'
         })
+
+@app.route('/verify_visitor_upload', methods=['POST'])
+def verify_visitor_upload():
+    """Verify a visitor from a binary image upload.
+    
+    Accepts either a raw image/jpeg body with the visitor fields in the query
+    string, or multipart/form-data with a face_image file part.
+    """
+    image_view = None
+    try:
+        if request.mimetype == 'multipart/form-data':
+            fields = request.form
+            upload = request.files.get('face_image')
+            if upload is None:
+                return jsonify({'success': False, 'message': 'Missing face_image'}), 400
+            image_view = read_into_buffer(upload.stream)
+        else:
+            fields = request.args
+            image_view = read_into_buffer(request.stream, request.content_length)
         
+        # Decode straight from the reusable upload buffer
+        image = decode_image(image_view)
+        return register_visitor(fields, image, image_view)
+    except ImageTooLargeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 413
     except Exception as e:
         print(f"Verification error: {e}")
         return jsonify({
             'success': False,
             'message': f'Verification failed: {str(e)}'
         })
+    finally:
+        if image_view is not None:
+            release_buffer(image_view)
+
+def register_visitor(data, image, image_data):
+    """Encode the face, issue a pass and notify downstream systems"""
+    # Extract visitor information
+    visitor_name = data.get('visitor_name')
+    destination_floor = data.get('destination_floor')
+    purpose = data.get('purpose')
+    duration_hours = int(data.get('duration_hours', 1))
+    if not 1 <= duration_hours <= MAX_PASS_HOURS:
+        VERIFICATIONS_TOTAL.inc(result='invalid')
+        return jsonify({
+            'success': False,
+            'message': f'duration_hours must be between 1 and {MAX_PASS_HOURS}'
+        }), 400
+    
+    if not (readiness.wait('face_models', STARTUP_WAIT_SECONDS)
+            and readiness.wait('face_index', STARTUP_WAIT_SECONDS)):
+        VERIFICATIONS_TOTAL.inc(result='not_ready')
+        return jsonify({
+            'success': False,
+            'message': 'Verification is starting up, please retry shortly'
+        }), 503
+    
+    # Verify face
+    with metrics.timer(FACE_ENCODING_SECONDS):
+        face_encodings = face_recognition.face_encodings(image)
+    
+    if not face_encodings:
+        VERIFICATIONS_TOTAL.inc(result='no_face')
+        return jsonify({
+            'success': False,
+            'message': 'No face detected in the image'
+        })
+    
+    # Check whether this person already holds an active pass
+    duplicate_of = None
+    match = face_index.find(face_encodings[0])
+    if match is not None:
+        existing = load_visitor_record(match[0])
+        if existing is not None and DUPLICATE_VISITOR_POLICY == 'return_existing':
+            VERIFICATIONS_TOTAL.inc(result='existing_pass')
+            return jsonify({
+                'success': True,
+                'duplicate': True,
+                'visitor_id': existing['visitor_id'],
+                'message': f"Existing pass found for floor {existing['destination_floor']}",
+                'valid_until': existing['valid_until']
+            })
+        duplicate_of = match[0]
+    
+    # Generate visitor ID
+    visitor_id = get_next_visitor_id()
+    
+    # Queue visitor image for content-addressed storage
+    image_key = image_store.store(image, source_bytes=image_data)
+    
+    # Create visitor record
+    visitor_data = {
+        'visitor_id': visitor_id,
+        'name': visitor_name,
+        'destination_floor': int(destination_floor),
+        'purpose': purpose,
+        'duration_hours': duration_hours,
+        'entry_time': datetime.now().isoformat(),
+        'valid_until': (datetime.now() + timedelta(hours=duration_hours)).isoformat(),
+        'image_key': image_key,
+        'image_path': image_store.image_path(image_key),
+        'status': 'approved'
+    }
+    if duplicate_of is not None:
+        visitor_data['duplicate_of'] = duplicate_of
+    
+    # Save visitor record
+    if not save_visitor_record(visitor_data):
+        return jsonify({
+            'success': False,
+            'message': 'Failed to save visitor record'
+        })
+    
+    face_index.add(visitor_id, face_encodings[0], datetime.fromisoformat(visitor_data['valid_until']))
+    
+    # Save to shared data directory for Jenkins pipeline
+    shared_file = os.path.join(SHARED_DATA_PATH, f"visitor_{visitor_id}.json")
+    with open(shared_file, 'w') as f:
+        json.dump(visitor_data, f, indent=2)
+    
+    # Notify robot system
+    try:
+        robot_url = os.getenv('ROBOT_SYSTEM_URL', 'http://robot-system:5000')
+        robot_response = wire.post(f'{robot_url}/new_visitor', visitor_data, timeout=5)
+        print(f"Notified robot system: {robot_response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to notify robot system: {e}")
+    
+    # Trigger Jenkins pipeline
+    trigger_jenkins_pipeline('verification-pipeline')
+    
+    VERIFICATIONS_TOTAL.inc(result='duplicate' if duplicate_of is not None else 'approved')
+    return jsonify({
+        'success': True,
+        'duplicate': duplicate_of is not None,
+        'visitor_id': visitor_id,
+        'message': f'Access granted to floor {destination_floor} for {duration_hours} hours',
+        'valid_until': visitor_data['valid_until']
+    })
 
 @app.route('/get_visitors')
 def get_visitors():
@@ -277,6 +388,28 @@ def get_stats():
             'error': str(e)
         })
 
+@app.route('/visitor_image/<image_key>')
+def get_visitor_image(image_key):
+    """Serve a stored visitor image by key"""
+    if not image_store.is_valid_key(image_key):
+        return jsonify({'success': False, 'message': 'Invalid image key'}), 400
+    return send_visitor_image(image_store.image_path(image_key))
+
+@app.route('/visitor_thumbnail/<image_key>')
+def get_visitor_thumbnail(image_key):
+    """Serve a visitor image thumbnail by key"""
+    if not image_store.is_valid_key(image_key):
+        return jsonify({'success': False, 'message': 'Invalid image key'}), 400
+    return send_visitor_image(image_store.thumbnail_path(image_key))
+
+def send_visitor_image(path):
+    if not os.path.exists(path):
+        return jsonify({
+            'success': False,
+            'message': 'Image not found'
+        }), 404
+    return send_file(path, mimetype='image/jpeg', max_age=86400)
+
 def trigger_jenkins_pipeline(pipeline_name):
     """Trigger Jenkins pipeline"""
     try:
@@ -289,14 +422,29 @@ def trigger_jenkins_pipeline(pipeline_name):
     except Exception as e:
         print(f"Failed to trigger Jenkins pipeline: {e}")
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus-style metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ready')
+def ready():
+    """Readiness probe with start-up progress"""
+    return readiness.response()
+
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'healthy', 
+        'ready': readiness.is_ready(),
         'service': 'verification-system',
         'storage': 'file-based',
+        'image_store': image_store.get_stats(),
+        'upload_buffers': buffer_pool.get_stats(),
+        'active_face_index': len(face_index),
         'timestamp': datetime.now().isoformat()
     })
 
 if __name__ == '__main__':
+    readiness.start()
     app.run(host='0.0.0.0', port=5000, debug=True)
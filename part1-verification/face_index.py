@@ -0,0 +1,111 @@
+import numpy as np
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+ENCODING_SIZE = 128
+
+
+class ActiveFaceIndex:
+    """Vectorized index of face encodings for visitors with a valid pass.
+
+    Entries expire at their valid_until time; lookups compare one encoding
+    against every active visitor with a single matrix-vector product.
+    """
+
+    def __init__(self, encodings_path, tolerance=0.6, initial_capacity=1024):
+        self.encodings_path = encodings_path
+        self.tolerance = tolerance
+        self.lock = threading.Lock()
+        self.encodings = np.zeros((initial_capacity, ENCODING_SIZE))
+        self.norms = np.zeros(initial_capacity)
+        self.valid_until = np.zeros(initial_capacity)
+        self.visitor_ids = np.zeros(initial_capacity, dtype=np.int64)
+        self.size = 0
+        os.makedirs(encodings_path, exist_ok=True)
+
+    def _encoding_file(self, visitor_id):
+        return os.path.join(self.encodings_path, f"visitor_{visitor_id}.npy")
+
+    def _grow(self):
+        capacity = len(self.valid_until) * 2
+        for name in ('encodings', 'norms', 'valid_until', 'visitor_ids'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _expire(self, now):
+        """Drop expired entries by compacting the live rows"""
+        live = self.valid_until[:self.size] > now
+        if live.all():
+            return
+        keep = np.flatnonzero(live)
+        for name in ('encodings', 'norms', 'valid_until', 'visitor_ids'):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.size = len(keep)
+
+    def add(self, visitor_id, encoding, valid_until, persist=True):
+        encoding = np.asarray(encoding, dtype=np.float64)
+        with self.lock:
+            self._expire(time.time())
+            if self.size == len(self.valid_until):
+                self._grow()
+            i = self.size
+            self.encodings[i] = encoding
+            self.norms[i] = encoding @ encoding
+            self.valid_until[i] = valid_until.timestamp()
+            self.visitor_ids[i] = visitor_id
+            self.size += 1
+
+        if persist:
+            np.save(self._encoding_file(visitor_id), encoding.astype(np.float32))
+
+    def find(self, encoding, tolerance=None):
+        """Closest active visitor within tolerance as (visitor_id, distance), or None"""
+        encoding = np.asarray(encoding, dtype=np.float64)
+        tolerance = self.tolerance if tolerance is None else tolerance
+        with self.lock:
+            self._expire(time.time())
+            if self.size == 0:
+                return None
+            # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+            distances = self.norms[:self.size] + encoding @ encoding - 2.0 * (self.encodings[:self.size] @ encoding)
+            best = int(np.argmin(distances))
+            distance = float(np.sqrt(max(distances[best], 0.0)))
+            if distance > tolerance:
+                return None
+            return int(self.visitor_ids[best]), distance
+
+    def __len__(self):
+        with self.lock:
+            self._expire(time.time())
+            return self.size
+
+    def rebuild(self, records_path, max_pass_hours):
+        """Reload still-valid visitors from the daily logs after a restart.
+
+        Logs are read back as far as a pass issued just before midnight could
+        still be valid; expired passes are skipped.
+        """
+        now = datetime.now()
+        loaded = 0
+        for i in range(math.ceil(max_pass_hours / 24) + 1):
+            date = (now - timedelta(days=i)).strftime('%Y-%m-%d')
+            daily_log = os.path.join(records_path, f"daily_visitors_{date}.json")
+            if not os.path.exists(daily_log):
+                continue
+            with open(daily_log, 'r') as f:
+                visitors = json.load(f)
+
+            for visitor in visitors:
+                valid_until = datetime.fromisoformat(visitor['valid_until'])
+                encoding_file = self._encoding_file(visitor['visitor_id'])
+                if valid_until > now and os.path.exists(encoding_file):
+                    self.add(visitor['visitor_id'], np.load(encoding_file), valid_until, persist=False)
+                    loaded += 1
+        return loaded
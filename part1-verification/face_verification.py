@@ -1,6 +1,7 @@
-import face_recognition
-import cv2
 import numpy as np
+import startup
+
+face_recognition = startup.lazy_import('face_recognition')
 
 class FaceVerification:
     def __init__(self):
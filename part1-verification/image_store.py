@@ -0,0 +1,104 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import startup
+
+cv2 = startup.lazy_import('cv2')
+
+class ImageStore:
+    """Content-addressed visitor image storage with async writes and thumbnails"""
+
+    def __init__(self, root_path, jpeg_quality=85, thumbnail_size=128, workers=2):
+        self.images_path = os.path.join(root_path, 'images')
+        self.thumbnails_path = os.path.join(root_path, 'thumbnails')
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_size = thumbnail_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-store')
+        self.lock = threading.Lock()
+        self.in_flight = set()
+        self.stats = {
+            'stored': 0,
+            'deduplicated': 0,
+            'failed': 0,
+            'bytes_written': 0
+        }
+
+    @staticmethod
+    def _sharded(base, key):
+        return os.path.join(base, key[:2], key[2:4], f"{key}.jpg")
+
+    def image_path(self, key):
+        return self._sharded(self.images_path, key)
+
+    def thumbnail_path(self, key):
+        return self._sharded(self.thumbnails_path, key)
+
+    @staticmethod
+    def is_valid_key(key):
+        return re.fullmatch(r'[0-9a-f]{32}', key) is not None
+
+    @staticmethod
+    def content_key(image, source_bytes=None):
+        """Key images by their uploaded bytes, or pixels when no upload exists"""
+        data = source_bytes if source_bytes is not None else image.tobytes()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def store(self, image, source_bytes=None):
+        """Queue an image for storage and return its key immediately"""
+        key = self.content_key(image, source_bytes)
+
+        with self.lock:
+            if key in self.in_flight or os.path.exists(self.image_path(key)):
+                self.stats['deduplicated'] += 1
+                return key
+            self.in_flight.add(key)
+
+        self.executor.submit(self._write, key, image)
+        return key
+
+    def _write_file(self, path, encoded):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+        return len(encoded)
+
+    def _encode(self, image):
+        ok, encoded = cv2.imencode('.jpg', image, [
+            cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1
+        ])
+        if not ok:
+            raise ValueError('JPEG encoding failed')
+        return encoded.tobytes()
+
+    def _thumbnail(self, image):
+        height, width = image.shape[:2]
+        scale = self.thumbnail_size / max(height, width)
+        if scale >= 1:
+            return image
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _write(self, key, image):
+        try:
+            written = self._write_file(self.thumbnail_path(key), self._encode(self._thumbnail(image)))
+            # Full image last: its existence marks the key as stored
+            written += self._write_file(self.image_path(key), self._encode(image))
+            with self.lock:
+                self.stats['stored'] += 1
+                self.stats['bytes_written'] += written
+        except Exception as e:
+            print(f"Error storing image {key}: {e}")
+            with self.lock:
+                self.stats['failed'] += 1
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, pending=len(self.in_flight))
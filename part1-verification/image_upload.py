@@ -0,0 +1,132 @@
+import base64
+import os
+import queue
+import threading
+import numpy as np
+import startup
+
+cv2 = startup.lazy_import('cv2')
+
+# Largest face image accepted on any upload path
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+MIN_BUFFER_BYTES = 256 * 1024
+# Upload buffers kept for reuse; roughly the number of concurrent uploads
+UPLOAD_BUFFER_POOL_SIZE = int(os.getenv('UPLOAD_BUFFER_POOL_SIZE', '8'))
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+class BufferPool:
+    """Bounded LIFO pool of reusable upload buffers.
+
+    The threaded server runs every request on a fresh thread, so buffers
+    are checked out per upload and returned afterwards rather than kept per
+    thread. LIFO hands out the most recently used buffer; when the pool is
+    empty a new one is allocated, and buffers returned to a full pool are
+    dropped.
+    """
+
+    def __init__(self, max_buffers=UPLOAD_BUFFER_POOL_SIZE, min_bytes=MIN_BUFFER_BYTES):
+        self.buffers = queue.LifoQueue(max_buffers)
+        self.min_bytes = min_bytes
+        self.lock = threading.Lock()
+        self.stats = {'reused': 0, 'allocated': 0, 'dropped': 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def checkout(self, size_hint):
+        try:
+            buffer = self.buffers.get_nowait()
+        except queue.Empty:
+            buffer = None
+        if buffer is not None and len(buffer) >= size_hint:
+            self._count('reused')
+            return buffer
+        # A pooled buffer that is too small is replaced by a larger one
+        self._count('allocated')
+        return bytearray(max(size_hint, self.min_bytes))
+
+    def release(self, buffer):
+        try:
+            self.buffers.put_nowait(buffer)
+        except queue.Full:
+            self._count('dropped')
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, pooled=self.buffers.qsize())
+
+
+buffer_pool = BufferPool()
+
+
+def _readinto(stream, view):
+    if hasattr(stream, 'readinto'):
+        return stream.readinto(view)
+    chunk = stream.read(len(view))
+    view[:len(chunk)] = chunk
+    return len(chunk)
+
+
+def read_into_buffer(stream, content_length=None, max_bytes=MAX_IMAGE_BYTES, pool=buffer_pool):
+    """Stream an upload into a buffer checked out of the pool.
+
+    Returns a memoryview over the bytes read; hand it to release_buffer()
+    once the request is done with it.
+    """
+    if content_length is not None and content_length > max_bytes:
+        raise ImageTooLargeError(f'Image exceeds {max_bytes} bytes')
+
+    # One spare byte lets a full buffer detect an oversized upload
+    buffer = pool.checkout(min((content_length or READ_CHUNK_BYTES) + 1, max_bytes + 1))
+    size = 0
+    try:
+        while True:
+            if size == len(buffer):
+                if size > max_bytes:
+                    raise ImageTooLargeError(f'Image exceeds {max_bytes} bytes')
+                grown = pool.checkout(min(len(buffer) * 2, max_bytes + 1))
+                grown[:size] = buffer[:size]
+                pool.release(buffer)
+                buffer = grown
+
+            with memoryview(buffer) as view:
+                read = _readinto(stream, view[size:])
+            if not read:
+                break
+            size += read
+            if size > max_bytes:
+                raise ImageTooLargeError(f'Image exceeds {max_bytes} bytes')
+    except BaseException:
+        pool.release(buffer)
+        raise
+
+    return memoryview(buffer)[:size]
+
+
+def release_buffer(view, pool=buffer_pool):
+    """Return the buffer behind a read_into_buffer() view to the pool"""
+    buffer = view.obj
+    view.release()
+    pool.release(buffer)
+
+
+def decode_image(data):
+    """Decode JPEG/PNG bytes (bytes, bytearray or memoryview) without copying"""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError('Could not decode image')
+    return image
+
+
+def decode_data_url(data_url):
+    """Legacy path: base64 data URL embedded in JSON"""
+    image_data = base64.b64decode(data_url.split(',')[1])
+    if len(image_data) > MAX_IMAGE_BYTES:
+        raise ImageTooLargeError(f'Image exceeds {MAX_IMAGE_BYTES} bytes')
+    return decode_image(image_data), image_data
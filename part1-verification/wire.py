@@ -0,0 +1,86 @@
+import json
+import os
+from flask import request
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON is always available
+    msgpack = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+
+# Body encoding for requests this service sends to the others: 'json' or
+# 'msgpack'. Receivers that cannot decode it answer 415 and the request is
+# resent as JSON.
+WIRE_FORMAT = os.getenv('WIRE_FORMAT', 'json')
+
+FORMAT_TYPES = {'json': JSON_TYPE, 'msgpack': MSGPACK_TYPE}
+
+
+class UnsupportedMediaType(ValueError):
+    """Request body in an encoding this service cannot decode"""
+
+
+class MalformedBody(ValueError):
+    """Request body that does not decode in its declared encoding"""
+
+
+def _json_encode(payload):
+    return json.dumps(payload, separators=(',', ':'), default=str).encode()
+
+
+# content type -> (encode(payload) -> bytes, decode(bytes) -> payload)
+CODECS = {JSON_TYPE: (_json_encode, json.loads)}
+if msgpack is not None:
+    CODECS[MSGPACK_TYPE] = (lambda payload: msgpack.packb(payload, default=str),
+                            lambda body: msgpack.unpackb(body, raw=False))
+    CODECS['application/x-msgpack'] = CODECS[MSGPACK_TYPE]
+
+
+def register(content_type, encode, decode, name=None):
+    """Accept (and allow sending) bodies of another content type"""
+    CODECS[content_type] = (encode, decode)
+    if name:
+        FORMAT_TYPES[name] = content_type
+
+
+def supported_types():
+    return sorted(CODECS)
+
+
+def encode(payload, wire_format=None):
+    """(body, content type) for payload; falls back to JSON for unknown formats"""
+    content_type = FORMAT_TYPES.get(wire_format or WIRE_FORMAT, wire_format or WIRE_FORMAT)
+    if content_type not in CODECS:
+        content_type = JSON_TYPE
+    return CODECS[content_type][0](payload), content_type
+
+
+def read_body():
+    """Decode the current request's body according to its Content-Type.
+
+    Raises UnsupportedMediaType (answer 415) or MalformedBody (answer 400).
+    """
+    mimetype = request.mimetype
+    if not mimetype or mimetype == JSON_TYPE or mimetype.endswith('+json'):
+        mimetype = JSON_TYPE
+    codec = CODECS.get(mimetype)
+    if codec is None:
+        raise UnsupportedMediaType(f"Unsupported content type {mimetype}; send one of {', '.join(supported_types())}")
+    try:
+        return codec[1](request.get_data())
+    except Exception as e:
+        raise MalformedBody(f"Invalid {mimetype} body: {e or type(e).__name__}") from e
+
+
+def post(url, payload, timeout=5, wire_format=None, session=None):
+    """POST payload in the configured wire format, retrying as JSON on 415"""
+    import requests
+    sender = session or requests
+    body, content_type = encode(payload, wire_format)
+    response = sender.post(url, data=body, headers={'Content-Type': content_type}, timeout=timeout)
+    if response.status_code == 415 and content_type != JSON_TYPE:
+        body, content_type = encode(payload, 'json')
+        response = sender.post(url, data=body, headers={'Content-Type': content_type}, timeout=timeout)
+    return response
@@ -0,0 +1,169 @@
+import numpy as np
+import threading
+from collections import deque
+
+PSI_BINS = 10
+PSI_EPSILON = 1e-4
+
+# Calendar features shift by construction as time passes, so they are not
+# meaningful drift signals
+PSI_EXCLUDED_FEATURES = ('hour', 'day_of_week')
+
+
+def build_reference(X, columns, bins=PSI_BINS):
+    """Quantile bin edges and proportions of each training feature"""
+    X = np.asarray(X, dtype=float)
+    reference = {}
+    for i, column in enumerate(columns):
+        if column in PSI_EXCLUDED_FEATURES:
+            continue
+        values = X[:, i]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1))[1:-1])
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        reference[column] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / max(len(values), 1)).tolist()
+        }
+    return reference
+
+
+def population_stability_index(expected, actual):
+    expected = np.clip(np.asarray(expected, dtype=float), PSI_EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=float), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class ErrorWindow:
+    """Rolling prediction error statistics over the last N pairs"""
+
+    def __init__(self, size):
+        self.errors = deque(maxlen=size)
+        self.total_abs = 0.0
+        self.total_sq = 0.0
+        self.count = 0
+
+    def add(self, error):
+        if len(self.errors) == self.errors.maxlen:
+            evicted = self.errors[0]
+            self.total_abs -= abs(evicted)
+            self.total_sq -= evicted * evicted
+        self.errors.append(error)
+        self.total_abs += abs(error)
+        self.total_sq += error * error
+        self.count += 1
+
+    def stats(self):
+        n = len(self.errors)
+        if not n:
+            return {'samples': 0, 'total_samples': self.count}
+        return {
+            'samples': n,
+            'total_samples': self.count,
+            'mae': self.total_abs / n,
+            'rmse': float(np.sqrt(max(self.total_sq / n, 0.0))),
+            'bias': float(np.mean(self.errors))
+        }
+
+
+class DriftMonitor:
+    """Joins predictions with the next actual reading per sensor and tracks
+    rolling error and feature drift (PSI) in constant memory"""
+
+    def __init__(self, window_size=200, decay=0.99, psi_threshold=0.2,
+                 error_ratio_threshold=1.5, min_samples=30):
+        self.window_size = window_size
+        self.decay = decay
+        self.psi_threshold = psi_threshold
+        self.error_ratio_threshold = error_ratio_threshold
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.set_reference({}, None, None)
+
+    def set_reference(self, reference, columns, baseline_rmse):
+        """Reset live statistics against a newly deployed model"""
+        with self.lock:
+            self.reference = reference or {}
+            self.columns = [c for c in (columns or []) if c in self.reference]
+            self.baseline_rmse = baseline_rmse
+            self.edges = [np.asarray(self.reference[c]['edges']) for c in self.columns]
+            self.expected = [np.asarray(self.reference[c]['proportions']) for c in self.columns]
+            self.counts = [np.zeros(len(e) + 1) for e in self.edges]
+            self.observed = 0
+            self.pending = {}  # sensor_id -> (timestamp, predicted temperature)
+            self.overall = ErrorWindow(self.window_size)
+            self.per_sensor = {}
+
+    def record_prediction(self, sensor_id, timestamp, predicted_temperature):
+        """Remember a sensor's forecast until its next reading arrives"""
+        with self.lock:
+            self.pending[sensor_id] = (timestamp, float(predicted_temperature))
+
+    def observe(self, reading, features=None):
+        """Score the pending forecast for this sensor and update feature bins"""
+        sensor_id = reading.get('sensor_id', 'unknown')
+        with self.lock:
+            pending = self.pending.pop(sensor_id, None)
+            if pending is not None and 'temperature' in reading:
+                error = float(reading['temperature']) - pending[1]
+                self.overall.add(error)
+                if sensor_id not in self.per_sensor:
+                    self.per_sensor[sensor_id] = ErrorWindow(self.window_size)
+                self.per_sensor[sensor_id].add(error)
+
+            if features is not None and self.columns:
+                # Exponentially decayed bin counts keep memory fixed
+                self.observed += 1
+                for i, column in enumerate(self.columns):
+                    self.counts[i] *= self.decay
+                    self.counts[i][np.searchsorted(self.edges[i], features.get(column, 0.0), side='right')] += 1
+
+    def feature_psi(self):
+        with self.lock:
+            psi = {}
+            for i, column in enumerate(self.columns):
+                total = self.counts[i].sum()
+                if total > 0:
+                    psi[column] = population_stability_index(self.expected[i], self.counts[i] / total)
+            return psi
+
+    def drift_status(self):
+        """Whether error or feature drift has crossed its threshold"""
+        psi = self.feature_psi()
+        errors = self.overall.stats()
+        reasons = []
+
+        if self.observed >= self.min_samples and psi:
+            worst = max(psi, key=psi.get)
+            if psi[worst] > self.psi_threshold:
+                reasons.append(f"PSI {psi[worst]:.3f} on {worst} exceeds {self.psi_threshold}")
+
+        if self.baseline_rmse and errors['samples'] >= self.min_samples:
+            ratio = errors['rmse'] / self.baseline_rmse
+            if ratio > self.error_ratio_threshold:
+                reasons.append(f"RMSE {errors['rmse']:.3f} is {ratio:.2f}x training RMSE")
+
+        return {'drift_detected': bool(reasons), 'reasons': reasons}
+
+    def should_retrain(self):
+        return self.drift_status()['drift_detected']
+
+    def get_stats(self):
+        psi = self.feature_psi()
+        with self.lock:
+            per_sensor = {sensor_id: window.stats() for sensor_id, window in self.per_sensor.items()}
+            overall = self.overall.stats()
+            observed = self.observed
+        return {
+            'prediction_error': overall,
+            'prediction_error_by_sensor': per_sensor,
+            'baseline_rmse': self.baseline_rmse,
+            'feature_psi': psi,
+            'max_psi': max(psi.values()) if psi else 0.0,
+            'observed_readings': observed,
+            'thresholds': {
+                'psi': self.psi_threshold,
+                'error_ratio': self.error_ratio_threshold,
+                'min_samples': self.min_samples
+            },
+            **self.drift_status()
+        }
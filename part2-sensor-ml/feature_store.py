@@ -0,0 +1,229 @@
+import numpy as np
+import threading
+from collections import deque
+from datetime import datetime
+
+# Raw parameters and defaults used when a reading is missing a value
+BASE_PARAMETERS = {
+    'temperature': 75.0,
+    'pressure': 120.0,
+    'viscosity': 35.0,
+    'flow_rate': 45.0,
+    'contamination_level': 2.0
+}
+
+ROLLING_PARAMETERS = ['temperature', 'pressure', 'viscosity']
+LAG_PARAMETERS = ['temperature']
+
+ROLLING_WINDOW = 10
+EWM_ALPHAS = [0.1, 0.3]
+LAGS = [1, 2, 3]
+
+
+def _alpha_name(alpha):
+    return str(alpha).replace('.', '')
+
+
+def feature_columns():
+    """Ordered list of feature names produced by the feature store"""
+    columns = list(BASE_PARAMETERS) + ['hour', 'day_of_week',
+                                       'temp_pressure_ratio', 'viscosity_flow_ratio']
+    for param in ROLLING_PARAMETERS:
+        columns.append(f'{param}_mean_{ROLLING_WINDOW}')
+        columns.append(f'{param}_std_{ROLLING_WINDOW}')
+        for alpha in EWM_ALPHAS:
+            columns.append(f'{param}_ewm_{_alpha_name(alpha)}')
+    for param in LAG_PARAMETERS:
+        for lag in LAGS:
+            columns.append(f'{param}_lag_{lag}')
+        columns.append(f'{param}_delta')
+    return columns
+
+
+class RollingWindow:
+    """O(1) rolling mean/std, EWMAs and lags over one parameter stream"""
+
+    def __init__(self, window=ROLLING_WINDOW, alphas=EWM_ALPHAS, lags=LAGS):
+        self.window = window
+        self.alphas = list(alphas)
+        self.values = deque(maxlen=max(window, max(lags) if lags else 1))
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.ewm = [None] * len(self.alphas)
+
+    def _step(self, x):
+        """Statistics with x appended, without mutating the window"""
+        evicted = self.values[-self.window] if len(self.values) >= self.window else None
+        total = self.total + x
+        total_sq = self.total_sq + x * x
+        n = min(len(self.values), self.window) + 1
+        if evicted is not None:
+            total -= evicted
+            total_sq -= evicted * evicted
+            n = self.window
+
+        mean = total / n
+        std = np.sqrt(max((total_sq - total * total / n) / (n - 1), 0.0)) if n > 1 else 0.0
+        ewm = [x if prev is None else (1 - a) * prev + a * x
+               for a, prev in zip(self.alphas, self.ewm)]
+        return total, total_sq, mean, std, ewm
+
+    def lag(self, k, x):
+        """Value k readings back, or x when history is too short"""
+        return self.values[-k] if len(self.values) >= k else x
+
+    def peek(self, x):
+        _, _, mean, std, ewm = self._step(x)
+        return mean, std, ewm
+
+    def push(self, x):
+        self.total, self.total_sq, mean, std, self.ewm = self._step(x)
+        self.values.append(x)
+        return mean, std, list(self.ewm)
+
+    def restore(self, tail, ewm):
+        """Reset the window from recent values and known EWMA state"""
+        self.values.clear()
+        self.values.extend(float(v) for v in tail)
+        recent = list(self.values)[-self.window:]
+        self.total = float(sum(recent))
+        self.total_sq = float(sum(v * v for v in recent))
+        self.ewm = [float(v) for v in ewm]
+
+
+class FeatureStore:
+    """Incremental per-sensor feature store keyed by sensor_id"""
+
+    def __init__(self):
+        self.windows = {}  # sensor_id -> {parameter: RollingWindow}
+        self.latest = {}   # sensor_id -> (reading, features)
+        self.lock = threading.Lock()
+
+    def _sensor_windows(self, sensor_id):
+        if sensor_id not in self.windows:
+            self.windows[sensor_id] = {
+                param: RollingWindow(lags=LAGS if param in LAG_PARAMETERS else [])
+                for param in ROLLING_PARAMETERS
+            }
+        return self.windows[sensor_id]
+
+    @staticmethod
+    def _point_features(reading):
+        values = {p: float(reading.get(p, default)) for p, default in BASE_PARAMETERS.items()}
+        timestamp = reading.get('timestamp')
+        ts = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+
+        features = dict(values)
+        features['hour'] = ts.hour
+        features['day_of_week'] = ts.weekday()
+        features['temp_pressure_ratio'] = values['temperature'] / values['pressure']
+        features['viscosity_flow_ratio'] = values['viscosity'] / values['flow_rate']
+        return features
+
+    def _features(self, reading, commit):
+        features = self._point_features(reading)
+        windows = self._sensor_windows(reading.get('sensor_id', 'unknown'))
+
+        for param in ROLLING_PARAMETERS:
+            window = windows[param]
+            x = features[param]
+            if param in LAG_PARAMETERS:
+                for lag in LAGS:
+                    features[f'{param}_lag_{lag}'] = window.lag(lag, x)
+                features[f'{param}_delta'] = x - features[f'{param}_lag_1']
+
+            mean, std, ewm = window.push(x) if commit else window.peek(x)
+            features[f'{param}_mean_{ROLLING_WINDOW}'] = mean
+            features[f'{param}_std_{ROLLING_WINDOW}'] = std
+            for alpha, value in zip(EWM_ALPHAS, ewm):
+                features[f'{param}_ewm_{_alpha_name(alpha)}'] = value
+
+        return features
+
+    def ingest(self, reading):
+        """Add a reading to its sensor's windows and return its features"""
+        with self.lock:
+            features = self._features(reading, commit=True)
+            self.latest[reading.get('sensor_id', 'unknown')] = (reading, features)
+            return features
+
+    def features_for(self, reading):
+        """Features for a reading without changing stored state.
+
+        The latest ingested reading of a sensor returns its cached features;
+        any other reading is treated as the next one in that sensor's stream.
+        """
+        with self.lock:
+            cached = self.latest.get(reading.get('sensor_id', 'unknown'))
+            if cached and cached[0].get('timestamp') == reading.get('timestamp'):
+                return dict(cached[1])
+            return self._features(reading, commit=False)
+
+    def latest_reading(self, sensor_id):
+        """Most recently ingested reading for a sensor"""
+        cached = self.latest.get(sensor_id)
+        return cached[0] if cached else None
+
+    def sensors(self):
+        return list(self.latest)
+
+    @staticmethod
+    def compute_history(df):
+        """Vectorized features over a history frame, ordered per sensor by time.
+
+        Produces the same values the incremental path yields when readings are
+        ingested in timestamp order.
+        """
+        import pandas as pd
+
+        df = df.copy()
+        if 'sensor_id' not in df:
+            df['sensor_id'] = 'unknown'
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values(['sensor_id', 'timestamp'], kind='mergesort').reset_index(drop=True)
+
+        for param, default in BASE_PARAMETERS.items():
+            if param not in df:
+                df[param] = default
+            df[param] = df[param].astype(float).fillna(default)
+
+        df['hour'] = df['timestamp'].dt.hour
+        df['day_of_week'] = df['timestamp'].dt.dayofweek
+        df['temp_pressure_ratio'] = df['temperature'] / df['pressure']
+        df['viscosity_flow_ratio'] = df['viscosity'] / df['flow_rate']
+
+        grouped = df.groupby('sensor_id', sort=False)
+        for param in ROLLING_PARAMETERS:
+            rolling = grouped[param].rolling(ROLLING_WINDOW, min_periods=1)
+            df[f'{param}_mean_{ROLLING_WINDOW}'] = rolling.mean().reset_index(level=0, drop=True)
+            df[f'{param}_std_{ROLLING_WINDOW}'] = rolling.std().reset_index(level=0, drop=True).fillna(0.0)
+            for alpha in EWM_ALPHAS:
+                df[f'{param}_ewm_{_alpha_name(alpha)}'] = grouped[param].transform(
+                    lambda s, a=alpha: s.ewm(alpha=a, adjust=False).mean())
+
+        for param in LAG_PARAMETERS:
+            for lag in LAGS:
+                df[f'{param}_lag_{lag}'] = grouped[param].shift(lag).fillna(df[param])
+            df[f'{param}_delta'] = df[param] - df[f'{param}_lag_1']
+
+        # Target: the same sensor's next temperature
+        df['next_temperature'] = grouped['temperature'].shift(-1)
+        return df
+
+    def warm_start(self, history):
+        """Rebuild per-sensor state from a frame produced by compute_history"""
+        with self.lock:
+            self.windows = {}
+            self.latest = {}
+            for sensor_id, group in history.groupby('sensor_id', sort=False):
+                windows = self._sensor_windows(sensor_id)
+                last = group.iloc[-1]
+                for param in ROLLING_PARAMETERS:
+                    window = windows[param]
+                    window.restore(
+                        group[param].values[-window.values.maxlen:],
+                        [last[f'{param}_ewm_{_alpha_name(a)}'] for a in EWM_ALPHAS]
+                    )
+                reading = {p: float(last[p]) for p in BASE_PARAMETERS}
+                reading.update(timestamp=last['timestamp'].isoformat(), sensor_id=sensor_id)
+                self.latest[sensor_id] = (reading, {c: float(last[c]) for c in feature_columns()})
@@ -0,0 +1,189 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Set METRICS_ENABLED=false to compile instrumentation out: timed() returns
+# the undecorated function and timer() a no-op context
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+START_TIME = time.time()
+
+_families = {}
+_families_lock = threading.Lock()
+_disabled = nullcontext()
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield f"{name}{_label_text(labels)} {self.value}"
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.total += value
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f"{name}_bucket{_label_text(labels + (('le', le),))} {cumulative}"
+        yield f"{name}_sum{_label_text(labels)} {total}"
+        yield f"{name}_count{_label_text(labels)} {cumulative}"
+
+
+class _Family:
+    """A named metric with one child per label set"""
+
+    def __init__(self, kind, name, help_text, make_child):
+        self.kind = kind
+        self.name = name
+        self.help_text = help_text
+        self.make_child = make_child
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self.make_child())
+        return child
+
+    def inc(self, amount=1, **labels):
+        if ENABLED:
+            self.labels(**labels).inc(amount)
+
+    def observe(self, value, **labels):
+        if ENABLED:
+            self.labels(**labels).observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            children = sorted(self.children.items())
+        for labels, child in children:
+            lines.extend(child.samples(self.name, labels))
+        return lines
+
+
+def _family(kind, name, help_text, make_child):
+    with _families_lock:
+        family = _families.get(name)
+        if family is None:
+            family = _families[name] = _Family(kind, name, help_text, make_child)
+        return family
+
+
+def counter(name, help_text):
+    return _family('counter', name, help_text, _CounterChild)
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    buckets = tuple(sorted(buckets))
+    return _family('histogram', name, help_text, lambda: _HistogramChild(buckets))
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+def timer(histogram_family, **labels):
+    """Context manager observing the block's duration in seconds"""
+    if not ENABLED:
+        return _disabled
+    return _Timer(histogram_family.labels(**labels))
+
+
+def timed(name, help_text, buckets=DEFAULT_BUCKETS):
+    """Decorator recording call duration in <name>_seconds and failures in <name>_errors_total"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        child = histogram(f"{name}_seconds", help_text, buckets).labels()
+        errors = counter(f"{name}_errors_total", f"Exceptions raised: {help_text}").labels()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _process_lines():
+    lines = [
+        '# HELP process_start_time_seconds Start time of the process since the epoch',
+        '# TYPE process_start_time_seconds gauge',
+        f'process_start_time_seconds {START_TIME}'
+    ]
+    try:
+        with open('/proc/self/statm') as f:
+            rss_pages = int(f.read().split()[1])
+        lines += [
+            '# HELP process_resident_memory_bytes Resident memory size',
+            '# TYPE process_resident_memory_bytes gauge',
+            f'process_resident_memory_bytes {rss_pages * os.sysconf("SC_PAGE_SIZE")}'
+        ]
+    except (OSError, ValueError):
+        pass
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _families_lock:
+        families = list(_families.values())
+    lines = _process_lines()
+    for family in sorted(families, key=lambda f: f.name):
+        lines.extend(family.render())
+    return '\n'.join(lines) + '\n'
@@ -1,14 +1,48 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, IsolationForest
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler
-import joblib
 import json
 import os
 from datetime import datetime, timedelta
 import glob
+import threading
+from feature_store import FeatureStore, feature_columns
+from model_selection import DEFAULT_MODEL_SPEC, build_model
+from model_artifacts import BUNDLE_FILENAME, save_bundle, load_bundle
+from numpy_scoring import COMPILED_FILENAME, export_compiled, load_compiled
+from prediction_cache import PredictionCache
+from drift_monitor import DriftMonitor, build_reference
+from sensor_synth import SensorSynthesizer
+from sensor_models import SensorModelRegistry
+import sensor_segments
+import metrics
+import startup
+
+joblib = startup.lazy_import('joblib')
+
+# Store the regressor as float32 flat node arrays instead of sklearn trees
+MODEL_COMPACT = os.getenv('MODEL_COMPACT', 'false').lower() == 'true'
+# Memory-map bundle arrays so multiple workers share one copy of the model
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'true').lower() == 'true'
+# 'numpy' serves compiled models without importing scikit-learn; 'sklearn'
+# always loads the full estimators
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'numpy')
+# How long a request waits for a background load before giving up
+MODEL_LOAD_WAIT_SECONDS = 2.0
+# Also train one model per sensor, routed to by predict(); the global model
+# serves sensors with too little history of their own
+PER_SENSOR_MODELS = os.getenv('PER_SENSOR_MODELS', 'true').lower() == 'true'
+# Worker processes for per-sensor training (-1: one per core)
+SENSOR_TRAIN_JOBS = int(os.getenv('SENSOR_TRAIN_JOBS', '-1'))
+
+# AR(1) coefficient of the synthetic bootstrap data
+SYNTHETIC_AUTOCORRELATION = 0.8
+
+def add_engineered_columns(df):
+    """Calendar and ratio columns added to every training frame"""
+    df['hour'] = df['timestamp'].dt.hour
+    df['day_of_week'] = df['timestamp'].dt.dayofweek
+    df['temp_pressure_ratio'] = df['temperature'] / df['pressure']
+    df['viscosity_flow_ratio'] = df['viscosity'] / df['flow_rate']
+    return df
 
 class MLPipeline:
     def __init__(self):
@@ -18,21 +52,27 @@ class MLPipeline:
         self.scaler = None
         self.anomaly_detector = None
         self.model_metadata = {}
+        self.feature_store = FeatureStore()
+        self.loader_thread = None
+        self.loader_lock = threading.Lock()
+        self.prediction_cache = PredictionCache()
+        self.drift_monitor = DriftMonitor()
+        self.sensor_models = SensorModelRegistry(self.models_path, n_jobs=SENSOR_TRAIN_JOBS,
+                                                 backend=MODEL_BACKEND, mmap=MODEL_MMAP)
     
-    def load_sensor_data(self, days_back=7):
+    def load_sensor_data(self, days_back=7, allow_synthetic=True):
         """Load sensor data from the last N days"""
+        import pandas as pd
+        
         all_data = []
         
         for i in range(days_back):
             date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            filename = os.path.join(self.sensor_data_path, f"sensor_data_{date}.json")
-            
-            if os.path.exists(filename):
-                with open(filename, 'r') as f:
-                    daily_data = json.load(f)
-                    all_data.extend(daily_data)
+            all_data.extend(sensor_segments.load_day(self.sensor_data_path, date))
         
         if not all_data:
+            if not allow_synthetic:
+                return None
             # Generate some initial training data if no data exists
             return self.generate_synthetic_training_data()
         
@@ -40,71 +80,66 @@ class MLPipeline:
         df = pd.DataFrame(all_data)
         df['timestamp'] = pd.to_datetime(df['timestamp'])
         
-        # Feature engineering
-        df['hour'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.dayofweek
-        df['temp_pressure_ratio'] = df['temperature'] / df['pressure']
-        df['viscosity_flow_ratio'] = df['viscosity'] / df['flow_rate']
-        
-        return df
+        return add_engineered_columns(df)
     
     def generate_synthetic_training_data(self, n_samples=1000):
         """Generate synthetic training data for initial model"""
-        np.random.seed(42)
+        # Same distribution as the live generator, with per-sensor
+        # autocorrelation so the rolling features carry signal
+        synthesizer = SensorSynthesizer(seed=42, autocorrelation=SYNTHETIC_AUTOCORRELATION)
+        return add_engineered_columns(synthesizer.frame(n_samples))
+    
+    def prepare_features(self, df, with_sensor_ids=False):
+        """Prepare per-sensor rolling features for ML model"""
+        history = FeatureStore.compute_history(df)
         
-        data = []
-        for i in range(n_samples):
-            base_temp = 75 + np.random.normal(0, 8)
-            base_pressure = 120 + np.random.normal(0, 15)
-            base_viscosity = 35 + np.random.normal(0, 5)
-            
-            # Add correlations
-            if base_temp > 80:
-                base_viscosity *= 0.9
-                base_pressure *= 1.1
-            
-            timestamp = datetime.now() - timedelta(
-                days=np.random.randint(1, 30),
-                hours=np.random.randint(0, 24),
-                minutes=np.random.randint(0, 60)
-            )
-            
-            data.append({
-                'timestamp': timestamp.isoformat(),
-                'sensor_id': f"OIL_SENSOR_{np.random.randint(1, 6)}",
-                'temperature': round(base_temp, 2),
-                'pressure': round(base_pressure, 2),
-                'viscosity': round(base_viscosity, 2),
-                'flow_rate': round(45 + np.random.normal(0, 8), 2),
-                'contamination_level': round(np.random.uniform(0.1, 10.0), 2)
-            })
+        # Target: predict each sensor's next temperature; the last reading
+        # of every sensor has no target yet
+        history = history.dropna(subset=['next_temperature'])
+        history = history.sort_values('timestamp', kind='mergesort')
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['hour'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.dayofweek
-        df['temp_pressure_ratio'] = df['temperature'] / df['pressure']
-        df['viscosity_flow_ratio'] = df['viscosity'] / df['flow_rate']
+        columns = feature_columns()
+        X = history[columns].fillna(0)
+        y = history['next_temperature']
         
-        return df
+        if with_sensor_ids:
+            return X, y, columns, history['sensor_id'].values
+        return X, y, columns
     
-    def prepare_features(self, df):
-        """Prepare features for ML model"""
-        feature_columns = [
-            'temperature', 'pressure', 'viscosity', 'flow_rate', 
-            'contamination_level', 'hour', 'day_of_week',
-            'temp_pressure_ratio', 'viscosity_flow_ratio'
-        ]
+    def ingest_reading(self, reading):
+        """Update the online feature store and drift statistics with a new
+        reading, then forecast that sensor's next temperature"""
+        features = self.feature_store.ingest(reading)
+        self.drift_monitor.observe(reading, features)
         
-        X = df[feature_columns].fillna(0)
-        
-        # Target: predict next temperature based on current conditions
-        y = df['temperature'].shift(-1).fillna(df['temperature'].mean())
+        prediction = self.predict(reading)
+        if 'predicted_temperature' in prediction:
+            self.drift_monitor.record_prediction(
+                reading.get('sensor_id', 'unknown'),
+                reading.get('timestamp'),
+                prediction['predicted_temperature']
+            )
+        return features
+    
+    def warm_feature_store(self, days_back=1):
+        """Rebuild online feature state from recent persisted readings"""
+        df = self.load_sensor_data(days_back=days_back, allow_synthetic=False)
+        if df is None or df.empty:
+            return False
         
-        return X, y, feature_columns
+        self.feature_store.warm_start(FeatureStore.compute_history(df))
+        return True
     
-    def train_model(self):
+    @metrics.timed('ml_train_model', 'Model training time including artifact export')
+    def train_model(self, model_spec=None):
         """Train ML model with current data"""
+        # Training is the only path that needs scikit-learn
+        from sklearn.ensemble import IsolationForest
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, r2_score
+        from sklearn.preprocessing import StandardScaler
+        
+        model_spec = model_spec or self.model_metadata.get('model_spec') or DEFAULT_MODEL_SPEC
         try:
             print("Loading sensor data...")
             df = self.load_sensor_data()
@@ -119,7 +154,7 @@ class MLPipeline:
             print(f"Training with {len(df)} data points...")
             
             # Prepare features
-            X, y, feature_columns = self.prepare_features(df)
+            X, y, feature_columns, sensor_ids = self.prepare_features(df, with_sensor_ids=True)
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
@@ -127,57 +162,66 @@ class MLPipeline:
             )
             
             # Scale features
-            self.scaler = StandardScaler()
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
             # Train regression model for temperature prediction
-            self.model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42,
-                n_jobs=-1
-            )
-            self.model.fit(X_train_scaled, y_train)
+            model = build_model(model_spec)
+            model.fit(X_train_scaled, y_train)
             
             # Train anomaly detection model
-            self.anomaly_detector = IsolationForest(
+            anomaly_detector = IsolationForest(
                 contamination=0.1,
                 random_state=42
             )
-            self.anomaly_detector.fit(X_train_scaled)
+            anomaly_detector.fit(X_train_scaled)
             
             # Evaluate model
-            y_pred = self.model.predict(X_test_scaled)
+            y_pred = model.predict(X_test_scaled)
             mse = mean_squared_error(y_test, y_pred)
             r2 = r2_score(y_test, y_pred)
             
             # Save model metadata
-            self.model_metadata = {
+            model_metadata = {
                 'training_timestamp': datetime.now().isoformat(),
                 'data_points': len(df),
                 'features': feature_columns,
+                'model_spec': model_spec,
                 'mse': float(mse),
                 'r2_score': float(r2),
+                'feature_reference': build_reference(X_train.values, feature_columns),
                 'model_version': f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             }
             
-            # Save models
-            model_file = os.path.join(self.models_path, 'temperature_prediction_model.joblib')
-            scaler_file = os.path.join(self.models_path, 'scaler.joblib')
-            anomaly_file = os.path.join(self.models_path, 'anomaly_detector.joblib')
+            # Save all components as one versioned bundle
+            bundle_file = os.path.join(self.models_path, BUNDLE_FILENAME)
             metadata_file = os.path.join(self.models_path, 'model_metadata.json')
             
-            joblib.dump(self.model, model_file)
-            joblib.dump(self.scaler, scaler_file)
-            joblib.dump(self.anomaly_detector, anomaly_file)
+            manifest = save_bundle(bundle_file, model, scaler, anomaly_detector,
+                                   model_metadata, compact=MODEL_COMPACT)
+            model_metadata['bundle'] = manifest
+            
+            # Export the scikit-learn-free scoring artifact for serving
+            compiled_file = os.path.join(self.models_path, COMPILED_FILENAME)
+            compiled_manifest = export_compiled(compiled_file, model, scaler, anomaly_detector, model_metadata,
+                                                dtype=np.float32 if MODEL_COMPACT else np.float64)
+            
+            # Hot-swap in what a restart would load: the compiled scorer rather
+            # than the sklearn forest (whose n_jobs=-1 costs ~30 ms per row)
+            if MODEL_BACKEND == 'numpy' and compiled_manifest is not None:
+                compiled = load_compiled(compiled_file, mmap=MODEL_MMAP)
+                self.swap_model(compiled['model'], compiled['scaler'], compiled.get('anomaly_detector'),
+                                dict(model_metadata, compiled=compiled_manifest))
+            else:
+                self.swap_model(model, scaler, anomaly_detector, model_metadata)
             
             with open(metadata_file, 'w') as f:
                 json.dump(self.model_metadata, f, indent=2)
             
             print(f"Model trained successfully! R² Score: {r2:.4f}")
             
-            return {
+            result = {
                 'success': True,
                 'message': 'Model trained successfully',
                 'metrics': {
@@ -188,6 +232,22 @@ class MLPipeline:
                 'model_version': self.model_metadata['model_version']
             }
             
+            if PER_SENSOR_MODELS:
+                # The new global model is already serving; a per-sensor
+                # failure is reported here rather than failing the run
+                try:
+                    result['sensor_models'] = self.sensor_models.train(
+                        X.values, y.values, sensor_ids, feature_columns, model_spec,
+                        model_metadata['model_version'], compact=MODEL_COMPACT
+                    )
+                except Exception as e:
+                    print(f"Error training per-sensor models: {e}")
+                    result['sensor_models'] = {
+                        'success': False,
+                        'message': f'Per-sensor training failed: {str(e)}'
+                    }
+            return result
+            
         except Exception as e:
             print(f"Error training model: {e}")
             return {
@@ -198,81 +258,163 @@ class MLPipeline:
     def load_model(self):
         """Load trained model from disk"""
         try:
-            model_file = os.path.join(self.models_path, 'temperature_prediction_model.joblib')
-            scaler_file = os.path.join(self.models_path, 'scaler.joblib')
-            anomaly_file = os.path.join(self.models_path, 'anomaly_detector.joblib')
-            metadata_file = os.path.join(self.models_path, 'model_metadata.json')
+            bundle_file = os.path.join(self.models_path, BUNDLE_FILENAME)
+            compiled_file = os.path.join(self.models_path, COMPILED_FILENAME)
             
-            if all(os.path.exists(f) for f in [model_file, scaler_file, metadata_file]):
-                self.model = joblib.load(model_file)
-                self.scaler = joblib.load(scaler_file)
-                
-                if os.path.exists(anomaly_file):
-                    self.anomaly_detector = joblib.load(anomaly_file)
-                
-                with open(metadata_file, 'r') as f:
-                    self.model_metadata = json.load(f)
-                
+            if PER_SENSOR_MODELS:
+                self.sensor_models.load()
+            
+            if MODEL_BACKEND == 'numpy' and os.path.exists(compiled_file):
+                compiled = load_compiled(compiled_file, mmap=MODEL_MMAP)
+                self.swap_model(
+                    compiled['model'],
+                    compiled['scaler'],
+                    compiled.get('anomaly_detector'),
+                    dict(compiled['metadata'], compiled=compiled['manifest'])
+                )
                 return True
-            else:
-                # Train initial model if none exists
-                result = self.train_model()
-                return result.get('success', False)
+            
+            if os.path.exists(bundle_file):
+                bundle = load_bundle(bundle_file, mmap=MODEL_MMAP)
+                self.swap_model(
+                    bundle.get('compact_model') or bundle['model'],
+                    bundle['scaler'],
+                    bundle.get('anomaly_detector'),
+                    dict(bundle['metadata'], bundle=bundle['manifest'])
+                )
+                return True
+            
+            if self.load_legacy_model():
+                # Migrate to the bundle format so the next start is a single load
+                save_bundle(bundle_file, self.model, self.scaler, self.anomaly_detector,
+                            self.model_metadata, compact=MODEL_COMPACT)
+                return True
+            
+            # Train initial model if none exists
+            result = self.train_model()
+            return result.get('success', False)
                 
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
     
+    def load_legacy_model(self):
+        """Load models saved as separate joblib files by older versions"""
+        model_file = os.path.join(self.models_path, 'temperature_prediction_model.joblib')
+        scaler_file = os.path.join(self.models_path, 'scaler.joblib')
+        anomaly_file = os.path.join(self.models_path, 'anomaly_detector.joblib')
+        metadata_file = os.path.join(self.models_path, 'model_metadata.json')
+        
+        if not all(os.path.exists(f) for f in [model_file, scaler_file, metadata_file]):
+            return False
+        
+        anomaly_detector = None
+        if os.path.exists(anomaly_file):
+            anomaly_detector = joblib.load(anomaly_file)
+        
+        with open(metadata_file, 'r') as f:
+            model_metadata = json.load(f)
+        
+        self.swap_model(joblib.load(model_file), joblib.load(scaler_file),
+                        anomaly_detector, model_metadata)
+        return True
+    
+    def swap_model(self, model, scaler, anomaly_detector, model_metadata):
+        """Replace the serving model and drop predictions made by the old one"""
+        self.model_metadata = model_metadata
+        self.anomaly_detector = anomaly_detector
+        self.scaler = scaler
+        self.model = model
+        self.prediction_cache.clear()
+        
+        # Live error and feature drift are measured against the new model
+        mse = model_metadata.get('mse')
+        self.drift_monitor.set_reference(
+            model_metadata.get('feature_reference'),
+            model_metadata.get('features'),
+            float(np.sqrt(mse)) if mse is not None else None
+        )
+    
+    def start_background_load(self):
+        """Load (or train, if none exists) the model in a background thread"""
+        with self.loader_lock:
+            if self.loader_thread is None or not self.loader_thread.is_alive():
+                self.loader_thread = threading.Thread(target=self.load_model, daemon=True)
+                self.loader_thread.start()
+            return self.loader_thread
+    
+    def is_loading(self):
+        return self.loader_thread is not None and self.loader_thread.is_alive()
+    
+    @metrics.timed('ml_predict', 'Single-reading prediction time')
     def predict(self, sensor_data):
         """Make prediction using trained model"""
         if self.model is None or self.scaler is None:
-            if not self.load_model():
+            self.start_background_load().join(timeout=MODEL_LOAD_WAIT_SECONDS)
+            if self.model is None or self.scaler is None:
+                if self.is_loading():
+                    return {'error': 'Model is loading, try again shortly'}
                 return {'error': 'No trained model available'}
         
         try:
-            # Prepare features
-            features = np.array([[
-                sensor_data.get('temperature', 75),
-                sensor_data.get('pressure', 120),
-                sensor_data.get('viscosity', 35),
-                sensor_data.get('flow_rate', 45),
-                sensor_data.get('contamination_level', 2),
-                datetime.now().hour,
-                datetime.now().weekday(),
-                sensor_data.get('temperature', 75) / sensor_data.get('pressure', 120),
-                sensor_data.get('viscosity', 35) / sensor_data.get('flow_rate', 45)
-            ]])
+            # Route to the sensor's own model when it has one
+            model, scaler, anomaly_detector, metadata = self.model, self.scaler, self.anomaly_detector, self.model_metadata
+            scope = 'global'
+            sensor_model = self.sensor_models.get(sensor_data.get('sensor_id')) if PER_SENSOR_MODELS else None
+            if sensor_model is not None:
+                model, scaler = sensor_model['model'], sensor_model['scaler']
+                anomaly_detector, metadata = sensor_model['anomaly_detector'], sensor_model['metadata']
+                scope = 'sensor'
+            
+            # Prepare features from the sensor's rolling state
+            features = self.feature_store.features_for(sensor_data)
+            columns = metadata.get('features') or feature_columns()
+            features = np.array([[features.get(c, 0) for c in columns]])
+            
+            # Repeated polls of the same reading are served from the cache
+            model_version = metadata.get('model_version', 'unknown')
+            cache_key = self.prediction_cache.make_key(model_version, features)
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
             # Scale features
-            features_scaled = self.scaler.transform(features)
+            features_scaled = scaler.transform(features)
             
             # Make prediction
-            prediction = self.model.predict(features_scaled)[0]
+            prediction = model.predict(features_scaled)[0]
             
             # Check for anomaly
             anomaly_score = -1
             is_anomaly = False
-            if self.anomaly_detector is not None:
-                anomaly_score = self.anomaly_detector.decision_function(features_scaled)[0]
-                is_anomaly = self.anomaly_detector.predict(features_scaled)[0] == -1
+            if anomaly_detector is not None:
+                anomaly_score = anomaly_detector.decision_function(features_scaled)[0]
+                is_anomaly = anomaly_detector.predict(features_scaled)[0] == -1
             
-            return {
+            result = {
                 'predicted_temperature': float(prediction),
                 'anomaly_score': float(anomaly_score),
                 'is_anomaly': bool(is_anomaly),
-                'model_version': self.model_metadata.get('model_version', 'unknown')
+                'model_version': model_version,
+                'model_scope': scope
             }
+            self.prediction_cache.put(cache_key, result)
+            
+            return result
             
         except Exception as e:
             return {'error': f'Prediction failed: {str(e)}'}
     
     def get_model_info(self):
         """Get information about current model"""
-        if not self.model_metadata:
-            self.load_model()
+        if not self.model_metadata and not self.is_loading():
+            self.start_background_load()
         
         return {
             'model_loaded': self.model is not None,
+            'model_loading': self.is_loading(),
             'metadata': self.model_metadata,
-            'models_available': os.path.exists(os.path.join(self.models_path, 'temperature_prediction_model.joblib'))
+            'prediction_cache': self.prediction_cache.get_stats(),
+            'sensor_models': self.sensor_models.get_info(),
+            'models_available': os.path.exists(os.path.join(self.models_path, BUNDLE_FILENAME))
         }
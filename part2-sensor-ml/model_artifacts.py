@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+from numpy_scoring import CompactForest
+import startup
+
+joblib = startup.lazy_import('joblib')
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILENAME = 'model_bundle.joblib'
+
+
+def save_bundle(path, model, scaler, anomaly_detector, metadata, compact=False):
+    """Write all model components to one versioned file with a manifest.
+
+    With compact=True a random forest regressor is stored as float32 flat
+    node arrays only, which are smaller and can be memory-mapped on load.
+    """
+    components = {
+        'model': model,
+        'scaler': scaler,
+        'anomaly_detector': anomaly_detector
+    }
+    if compact and hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        # The flat arrays replace the sklearn regressor in the file
+        components['compact_model'] = CompactForest.from_forest(model)
+        components['model'] = None
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': metadata.get('model_version', 'unknown'),
+        'created': datetime.now().isoformat(),
+        'components': sorted(k for k, v in components.items() if v is not None),
+        'compact': 'compact_model' in components
+    }
+
+    # Write to a temporary file and swap so readers never see a partial bundle
+    tmp_path = f"{path}.tmp"
+    joblib.dump({'manifest': manifest, 'metadata': metadata, **components}, tmp_path)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_bundle(path, mmap=True):
+    """Load a bundle, memory-mapping its NumPy arrays when requested"""
+    bundle = joblib.load(path, mmap_mode='r' if mmap else None)
+    manifest = bundle.get('manifest', {})
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format: {manifest.get('format_version')}")
+    return bundle
@@ -0,0 +1,259 @@
+import numpy as np
+import json
+import os
+import time
+import hashlib
+import glob
+import itertools
+import importlib
+import threading
+from datetime import datetime, timedelta
+import sensor_segments
+import startup
+
+joblib = startup.lazy_import('joblib')
+
+# scikit-learn is imported only when a model is built, keeping it out of
+# processes that just serve predictions
+MODEL_FAMILIES = {
+    'random_forest': ('sklearn.ensemble', 'RandomForestRegressor'),
+    'hist_gradient_boosting': ('sklearn.ensemble', 'HistGradientBoostingRegressor'),
+    'ridge': ('sklearn.linear_model', 'Ridge'),
+    'linear': ('sklearn.linear_model', 'LinearRegression')
+}
+
+# Hyperparameter grids evaluated by the selection job
+PARAM_GRIDS = {
+    'random_forest': {'n_estimators': [50, 100], 'max_depth': [6, 10, None]},
+    'hist_gradient_boosting': {'learning_rate': [0.05, 0.1], 'max_depth': [None, 6], 'max_iter': [200]},
+    'ridge': {'alpha': [0.1, 1.0, 10.0]},
+    'linear': {}
+}
+
+# Model used by train_model when no selection has been applied
+DEFAULT_MODEL_SPEC = {
+    'family': 'random_forest',
+    'params': {'n_estimators': 100, 'max_depth': 10}
+}
+
+
+def build_model(spec, n_jobs=-1):
+    """Instantiate an estimator from a {'family', 'params'} spec"""
+    module_name, class_name = MODEL_FAMILIES[spec['family']]
+    family = getattr(importlib.import_module(module_name), class_name)
+    params = dict(spec.get('params', {}))
+    if spec['family'] in ('random_forest', 'hist_gradient_boosting'):
+        params.setdefault('random_state', 42)
+    if spec['family'] == 'random_forest':
+        params.setdefault('n_jobs', n_jobs)
+    return family(**params)
+
+
+def candidate_specs(families=None):
+    """Expand the parameter grids into a list of model specs"""
+    if families is not None:
+        if isinstance(families, str) or not isinstance(families, (list, tuple)):
+            raise ValueError('families must be a list of model family names')
+        unknown = [f for f in families if f not in PARAM_GRIDS]
+        if unknown:
+            raise ValueError(f"Unknown model families {unknown}; choose from {sorted(PARAM_GRIDS)}")
+    specs = []
+    for family in families or PARAM_GRIDS:
+        grid = PARAM_GRIDS[family]
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            specs.append({'family': family, 'params': dict(zip(keys, values))})
+    return specs
+
+
+def _evaluate_fold(spec, cache_file, train_idx, test_idx):
+    """Fit one candidate on one fold; runs inside a worker process"""
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = joblib.load(cache_file, mmap_mode='r')
+    X_train, y_train = X[train_idx], y[train_idx]
+    X_test, y_test = X[test_idx], y[test_idx]
+
+    model = make_pipeline(StandardScaler(), build_model(spec, n_jobs=1))
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    # Single-row latency is what the online predict path pays
+    row = X_test[:1]
+    timings = []
+    for _ in range(20):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'mse': float(mean_squared_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'fit_seconds': fit_seconds,
+        'batch_latency_us_per_row': batch_seconds / len(test_idx) * 1e6,
+        'single_latency_ms': float(np.median(timings) * 1000)
+    }
+
+
+class ModelSelectionJob:
+    """Time-series cross-validated comparison of model families and grids"""
+
+    def __init__(self, ml_pipeline, n_splits=5, n_jobs=-1):
+        self.ml_pipeline = ml_pipeline
+        self.n_splits = n_splits
+        self.n_jobs = n_jobs
+        self.cache_path = os.path.join(ml_pipeline.models_path, 'cv_cache')
+        self.results_file = os.path.join(ml_pipeline.models_path, 'model_selection.json')
+        self.lock = threading.Lock()
+        self.thread = None
+        self.state = {'state': 'idle'}
+
+    def _data_fingerprint(self, days_back):
+        """Identify the training history by its source files"""
+        digest = hashlib.sha1(str(days_back).encode())
+        for i in range(days_back):
+            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+            for filename in sensor_segments.day_files(self.ml_pipeline.sensor_data_path, date):
+                stat = os.stat(filename)
+                digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:16]
+
+    def load_cv_data(self, days_back=7):
+        """Load feature matrix ordered by time, reusing the on-disk fold cache"""
+        os.makedirs(self.cache_path, exist_ok=True)
+        cache_file = os.path.join(self.cache_path, f"cv_{self._data_fingerprint(days_back)}.joblib")
+
+        if not os.path.exists(cache_file):
+            df = self.ml_pipeline.load_sensor_data(days_back=days_back)
+            # Rows come back in time order, so folds never train on the future
+            X, y, _ = self.ml_pipeline.prepare_features(df)
+            X = np.ascontiguousarray(X.values, dtype=np.float64)
+            y = np.ascontiguousarray(y.values, dtype=np.float64)
+
+            for old in glob.glob(os.path.join(self.cache_path, 'cv_*.joblib')):
+                os.remove(old)
+            joblib.dump((X, y), cache_file)
+
+        return cache_file
+
+    def run(self, families=None, days_back=7, max_latency_ms=None):
+        """Evaluate all candidates in parallel and persist a comparison report"""
+        from sklearn.model_selection import TimeSeriesSplit
+
+        start = time.perf_counter()
+        cache_file = self.load_cv_data(days_back)
+        X, y = joblib.load(cache_file, mmap_mode='r')
+
+        if len(y) < (self.n_splits + 1) * 10:
+            return {
+                'success': False,
+                'message': f'Insufficient data for {self.n_splits}-fold time-series CV',
+                'data_points': int(len(y))
+            }
+
+        folds = list(TimeSeriesSplit(n_splits=self.n_splits).split(X))
+        specs = candidate_specs(families)
+
+        fold_results = joblib.Parallel(n_jobs=self.n_jobs)(
+            joblib.delayed(_evaluate_fold)(spec, cache_file, train_idx, test_idx)
+            for spec in specs
+            for train_idx, test_idx in folds
+        )
+
+        results = []
+        for i, spec in enumerate(specs):
+            scores = fold_results[i * len(folds):(i + 1) * len(folds)]
+            mse = [s['mse'] for s in scores]
+            results.append({
+                'spec': spec,
+                'cv_mse': float(np.mean(mse)),
+                'cv_mse_std': float(np.std(mse)),
+                'cv_r2': float(np.mean([s['r2'] for s in scores])),
+                'fit_seconds': float(np.mean([s['fit_seconds'] for s in scores])),
+                'batch_latency_us_per_row': float(np.mean([s['batch_latency_us_per_row'] for s in scores])),
+                'single_latency_ms': float(np.median([s['single_latency_ms'] for s in scores]))
+            })
+        results.sort(key=lambda r: r['cv_mse'])
+
+        report = {
+            'success': True,
+            'timestamp': datetime.now().isoformat(),
+            'data_points': int(len(y)),
+            'n_splits': self.n_splits,
+            'candidates': len(specs),
+            'elapsed_seconds': time.perf_counter() - start,
+            'results': results,
+            'selected': self.select(results, max_latency_ms)
+        }
+
+        with open(self.results_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        return report
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, families=None, days_back=7, max_latency_ms=None, apply=False):
+        """Run the selection on a background thread; returns False if one is already running.
+
+        With apply, the production model is retrained with the selected
+        candidate once the comparison succeeds. Invalid options raise
+        ValueError before anything starts.
+        """
+        candidate_specs(families)
+        if days_back < 1:
+            raise ValueError('days_back must be at least 1')
+        options = {'families': families, 'days_back': days_back, 'max_latency_ms': max_latency_ms, 'apply': apply}
+        with self.lock:
+            if self.is_running():
+                return False
+            self.state = {'state': 'running', 'started_at': datetime.now().isoformat(), 'options': options}
+            self.thread = threading.Thread(target=self._run_in_background, args=(options,),
+                                           name='model-selection', daemon=True)
+            self.thread.start()
+        return True
+
+    def _run_in_background(self, options):
+        result = {}
+        try:
+            report = self.run(options['families'], options['days_back'], options['max_latency_ms'])
+            if report.get('success'):
+                result = {'state': 'completed', 'selected': report['selected'],
+                          'elapsed_seconds': report['elapsed_seconds']}
+                if options['apply']:
+                    result['training'] = self.ml_pipeline.train_model(model_spec=report['selected'])
+            else:
+                result = {'state': 'failed', 'error': report.get('message')}
+        except Exception as e:
+            print(f"Model selection failed: {e}")
+            result = {'state': 'failed', 'error': str(e)}
+        with self.lock:
+            self.state.update(result, finished_at=datetime.now().isoformat())
+
+    def get_status(self):
+        with self.lock:
+            return dict(self.state)
+
+    @staticmethod
+    def select(results, max_latency_ms=None):
+        """Most accurate candidate whose single-row latency fits the budget"""
+        eligible = [r for r in results
+                    if max_latency_ms is None or r['single_latency_ms'] <= max_latency_ms]
+        if not eligible:
+            eligible = sorted(results, key=lambda r: r['single_latency_ms'])[:1]
+        return min(eligible, key=lambda r: r['cv_mse'])['spec'] if eligible else None
+
+    def last_report(self):
+        if os.path.exists(self.results_file):
+            with open(self.results_file, 'r') as f:
+                return json.load(f)
+        return None
@@ -0,0 +1,247 @@
+import numpy as np
+import os
+from datetime import datetime
+import startup
+
+joblib = startup.lazy_import('joblib')
+
+COMPILED_FORMAT_VERSION = 1
+COMPILED_FILENAME = 'model_compiled.joblib'
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def average_path_length(n):
+    """Expected path length of an unsuccessful BST search over n samples"""
+    n = np.asarray(n, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    large = n > 2
+    result[large] = 2.0 * (np.log(n[large] - 1.0) + EULER_GAMMA) - 2.0 * (n[large] - 1.0) / n[large]
+    return result
+
+
+class CompactForest:
+    """Tree ensemble stored as flat node arrays.
+
+    All trees are concatenated into one set of arrays with absolute child
+    indices, so the artifact holds a handful of plain NumPy arrays that
+    joblib can memory-map and share between worker processes.
+    """
+
+    def __init__(self, left, right, feature, threshold, value, roots, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_trees(cls, trees, leaf_values, feature_maps=None, dtype=np.float32):
+        """Flatten sklearn tree structures with precomputed per-node values"""
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for i, tree in enumerate(trees):
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            tree_features = np.where(is_leaf, 0, tree.feature)
+            if feature_maps is not None:
+                tree_features = np.asarray(feature_maps[i])[tree_features]
+
+            # Leaves point at themselves so traversal can run a fixed number of steps
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            feature.append(tree_features)
+            threshold.append(tree.threshold)
+            value.append(leaf_values[i])
+            roots.append(offset)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(dtype),
+            value=np.concatenate(value).astype(dtype),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth
+        )
+
+    @classmethod
+    def from_forest(cls, forest, dtype=np.float32):
+        """Flatten a fitted sklearn forest of regression trees"""
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        values = [tree.value.reshape(tree.node_count, -1)[:, 0] for tree in trees]
+        return cls.from_trees(trees, values, dtype=dtype)
+
+    def leaves(self, X):
+        """Leaf node index per (tree, sample)"""
+        # sklearn trees compare float32 inputs against their thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict(self, X):
+        """Mean of the trees' leaf values"""
+        return self.value[self.leaves(X)].astype(np.float64).mean(axis=0)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.left, self.right, self.feature,
+                                      self.threshold, self.value, self.roots))
+
+
+class CompiledScaler:
+    """StandardScaler.transform as two arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        n = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n)
+        return cls(np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64))
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+
+class CompiledLinear:
+    """Linear regressor as coefficient vector and intercept"""
+
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = float(intercept)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+class CompiledIsolationForest:
+    """IsolationForest decision_function/predict over a CompactForest.
+
+    Each node stores depth + c(n_node_samples), so a sample's total path
+    length is the sum of its leaf values across trees.
+    """
+
+    def __init__(self, forest, denominator, offset):
+        self.forest = forest
+        self.denominator = float(denominator)
+        self.offset = float(offset)
+
+    @classmethod
+    def from_isolation_forest(cls, detector, dtype=np.float64):
+        trees = [estimator.tree_ for estimator in detector.estimators_]
+        values = []
+        for tree in trees:
+            depth = np.zeros(tree.node_count)
+            for node in range(tree.node_count):
+                for child in (tree.children_left[node], tree.children_right[node]):
+                    if child != -1:
+                        depth[child] = depth[node] + 1
+            values.append(depth + average_path_length(tree.n_node_samples))
+
+        feature_maps = None
+        if detector._max_features != detector.n_features_in_:
+            feature_maps = detector.estimators_features_
+
+        forest = CompactForest.from_trees(trees, values, feature_maps=feature_maps, dtype=dtype)
+        denominator = len(trees) * average_path_length([detector._max_samples])[0]
+        return cls(forest, denominator, detector.offset_)
+
+    def score_samples(self, X):
+        depths = self.forest.value[self.forest.leaves(X)].astype(np.float64).sum(axis=0)
+        if self.denominator == 0:
+            return -np.ones(len(depths))
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+def compile_regressor(model, dtype=np.float64):
+    """Compile a fitted regressor, or None when its family is unsupported"""
+    if isinstance(model, CompactForest):
+        return model
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        return CompactForest.from_forest(model, dtype=dtype)
+    if hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        return CompiledLinear(np.asarray(model.coef_, dtype=np.float64).ravel(),
+                              np.ravel(model.intercept_)[0])
+    return None
+
+
+def export_compiled(path, model, scaler, anomaly_detector, metadata, dtype=np.float64):
+    """Compile trained components into a scikit-learn-free artifact.
+
+    Returns the manifest, or None (removing any stale artifact) when the
+    regressor cannot be compiled and serving must use the sklearn bundle.
+    """
+    regressor = compile_regressor(model, dtype=dtype)
+    if regressor is None or scaler is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    detector = None
+    if anomaly_detector is not None:
+        detector = CompiledIsolationForest.from_isolation_forest(anomaly_detector)
+
+    manifest = {
+        'format_version': COMPILED_FORMAT_VERSION,
+        'model_version': metadata.get('model_version', 'unknown'),
+        'created': datetime.now().isoformat(),
+        'regressor': type(regressor).__name__
+    }
+
+    tmp_path = f"{path}.tmp"
+    joblib.dump({
+        'manifest': manifest,
+        'metadata': metadata,
+        'scaler': CompiledScaler.from_scaler(scaler),
+        'model': regressor,
+        'anomaly_detector': detector
+    }, tmp_path)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_compiled(path, mmap=True):
+    """Load a compiled artifact; never imports scikit-learn"""
+    compiled = joblib.load(path, mmap_mode='r' if mmap else None)
+    manifest = compiled.get('manifest', {})
+    if manifest.get('format_version') != COMPILED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled model format: {manifest.get('format_version')}")
+    return compiled
+
+
+if __name__ == '__main__':
+    # Compile the current bundle in place: python numpy_scoring.py [models_path]
+    import sys
+    from model_artifacts import BUNDLE_FILENAME, load_bundle
+
+    models_path = sys.argv[1] if len(sys.argv) > 1 else '/app/models'
+    bundle = load_bundle(os.path.join(models_path, BUNDLE_FILENAME), mmap=False)
+    manifest = export_compiled(
+        os.path.join(models_path, COMPILED_FILENAME),
+        bundle.get('compact_model') or bundle['model'],
+        bundle['scaler'],
+        bundle.get('anomaly_detector'),
+        bundle['metadata']
+    )
+    print(manifest or 'Model family cannot be compiled; serving will use scikit-learn')
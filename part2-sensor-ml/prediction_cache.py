@@ -0,0 +1,69 @@
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """LRU cache with TTL for model predictions.
+
+    Entries are keyed by model version and the feature vector rounded to a
+    fixed number of decimals, so repeated polls of the same reading hit.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=60.0, decimals=3):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self.entries = OrderedDict()  # key -> (expires_at, result)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_key(self, model_version, features):
+        quantized = np.round(np.asarray(features, dtype=float).ravel(), self.decimals)
+        return (model_version, quantized.tobytes())
+
+    def get(self, key):
+        """Cached result for key, or None on miss/expiry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, dict(result))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries, e.g. when a new model is swapped in"""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,240 @@
+import numpy as np
+import json
+import os
+import threading
+from datetime import datetime
+
+class ThresholdRule:
+    """Single alert rule evaluated over batches of sensor readings"""
+
+    CONDITIONS = ('above', 'below', 'rate_above')
+
+    def __init__(self, name, parameter, threshold, unit='', condition='above',
+                 sensor_thresholds=None, hysteresis=0.0, duration_seconds=0.0,
+                 suppression_seconds=0.0, label=None):
+        if condition not in self.CONDITIONS:
+            raise ValueError(f"Unknown rule condition: {condition}")
+
+        self.name = name
+        self.parameter = parameter
+        self.threshold = float(threshold)
+        self.unit = unit
+        self.condition = condition
+        self.sensor_thresholds = {k: float(v) for k, v in (sensor_thresholds or {}).items()}
+        self.hysteresis = float(hysteresis)
+        self.duration_seconds = float(duration_seconds)
+        self.suppression_seconds = float(suppression_seconds)
+        self.label = label or parameter.replace('_', ' ').capitalize()
+
+    @classmethod
+    def from_dict(cls, config):
+        """Build a rule from a config dictionary"""
+        return cls(**config)
+
+    def to_dict(self):
+        """Serialize rule configuration"""
+        return {
+            'name': self.name,
+            'parameter': self.parameter,
+            'threshold': self.threshold,
+            'unit': self.unit,
+            'condition': self.condition,
+            'sensor_thresholds': self.sensor_thresholds,
+            'hysteresis': self.hysteresis,
+            'duration_seconds': self.duration_seconds,
+            'suppression_seconds': self.suppression_seconds,
+            'label': self.label
+        }
+
+    def thresholds_for(self, sensor_ids):
+        """Vector of thresholds, one per reading, honouring per-sensor overrides"""
+        thresholds = np.full(len(sensor_ids), self.threshold)
+        for sensor_id, threshold in self.sensor_thresholds.items():
+            thresholds[sensor_ids == sensor_id] = threshold
+        return thresholds
+
+    def format_violation(self, value, threshold):
+        """Human readable violation message"""
+        if self.condition == 'above':
+            return f"{self.label}: {value}{self.unit} (> {threshold}{self.unit})"
+        if self.condition == 'below':
+            return f"{self.label}: {value}{self.unit} (< {threshold}{self.unit})"
+        return f"{self.label} rate: {value:.2f}{self.unit}/min (> {threshold}{self.unit}/min)"
+
+
+class _RuleState:
+    """Per (rule, sensor) alarm state"""
+
+    __slots__ = ('active', 'pending_since', 'last_alert', 'last_value', 'last_time')
+
+    def __init__(self):
+        self.active = False
+        self.pending_since = None
+        self.last_alert = None
+        self.last_value = None
+        self.last_time = None
+
+
+class RuleEngine:
+    """Evaluate threshold rules over batches of readings with hysteresis,
+    debouncing and alert suppression"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.state = {}  # (rule name, sensor_id) -> _RuleState
+        self.stats = {rule.name: self._empty_stats() for rule in self.rules}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _empty_stats():
+        return {'evaluated': 0, 'violations': 0, 'alerts': 0, 'suppressed': 0}
+
+    @classmethod
+    def from_file(cls, path, default_rules):
+        """Load rules from a JSON file, falling back to the given defaults"""
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    config = json.load(f)
+                return cls([ThresholdRule.from_dict(r) for r in config.get('rules', [])])
+            except (ValueError, TypeError) as e:
+                print(f"Invalid alert rules file {path}: {e}")
+        return cls(default_rules)
+
+    def _get_state(self, rule, sensor_id):
+        key = (rule.name, sensor_id)
+        if key not in self.state:
+            self.state[key] = _RuleState()
+        return self.state[key]
+
+    def _rates(self, rule, values, times, groups):
+        """Absolute rate of change per minute within each sensor's stream"""
+        rates = np.zeros(len(values))
+        for sensor_id, idx in groups:
+            state = self._get_state(rule, sensor_id)
+            prev_values = np.concatenate(([np.nan if state.last_value is None else state.last_value], values[idx[:-1]]))
+            prev_times = np.concatenate(([np.nan if state.last_time is None else state.last_time], times[idx[:-1]]))
+            dt = times[idx] - prev_times
+            with np.errstate(divide='ignore', invalid='ignore'):
+                group_rates = np.abs(values[idx] - prev_values) / dt * 60.0
+            rates[idx] = np.where(np.isfinite(group_rates) & (dt > 0), group_rates, 0.0)
+
+            state.last_value = float(values[idx[-1]])
+            state.last_time = float(times[idx[-1]])
+        return rates
+
+    def evaluate(self, readings):
+        """Evaluate all rules over a batch of readings.
+
+        Returns a list of alert dictionaries (one per reading that fired at
+        least one rule) in the same shape as the legacy per-reading alerts.
+        """
+        if not readings:
+            return []
+
+        n = len(readings)
+        sensor_ids = np.array([r.get('sensor_id', 'unknown') for r in readings])
+        now = datetime.now().isoformat()
+        times = np.array([r.get('timestamp') or now for r in readings], dtype='datetime64[us]')
+        times = times.astype('int64') / 1e6
+
+        # Group reading indices per sensor, ordered by time
+        order = np.lexsort((times, sensor_ids))
+        sorted_ids = sensor_ids[order]
+        boundaries = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+        groups = [(str(sensor_ids[idx[0]]), idx) for idx in np.split(order, boundaries)]
+
+        columns = {}
+        fired = [[] for _ in range(n)]
+
+        with self.lock:
+            for rule in self.rules:
+                if rule.parameter not in columns:
+                    columns[rule.parameter] = np.array(
+                        [r.get(rule.parameter, np.nan) for r in readings], dtype=float)
+                values = columns[rule.parameter]
+                thresholds = rule.thresholds_for(sensor_ids)
+
+                if rule.condition == 'rate_above':
+                    values = self._rates(rule, values, times, groups)
+
+                if rule.condition == 'below':
+                    trigger = values < thresholds
+                    clear = values >= thresholds + rule.hysteresis
+                else:
+                    trigger = values > thresholds
+                    clear = values <= thresholds - rule.hysteresis
+
+                stats = self.stats.setdefault(rule.name, self._empty_stats())
+                stats['evaluated'] += n
+                stats['violations'] += int(trigger.sum())
+
+                for sensor_id, idx in groups:
+                    key = (rule.name, sensor_id)
+                    state = self.state.get(key)
+                    idle = state is None or (not state.active and state.pending_since is None)
+                    if idle and not trigger[idx].any():
+                        continue
+                    state = self._get_state(rule, sensor_id)
+
+                    for i in idx[trigger[idx] | clear[idx]]:
+                        t = times[i]
+                        if not trigger[i]:
+                            state.active = False
+                            state.pending_since = None
+                            continue
+
+                        if state.active:
+                            stats['suppressed'] += 1
+                            continue
+                        if state.pending_since is None:
+                            state.pending_since = t
+                        if t - state.pending_since < rule.duration_seconds:
+                            stats['suppressed'] += 1
+                            continue
+
+                        state.active = True
+                        if (state.last_alert is not None
+                                and t - state.last_alert < rule.suppression_seconds):
+                            stats['suppressed'] += 1
+                            continue
+
+                        state.last_alert = t
+                        stats['alerts'] += 1
+                        value = round(float(values[i]), 2)
+                        fired[i].append(rule.format_violation(value, float(thresholds[i])))
+
+        alerts = []
+        for i, violations in enumerate(fired):
+            if violations:
+                alerts.append({
+                    'timestamp': readings[i].get('timestamp', now),
+                    'sensor_id': readings[i].get('sensor_id', 'unknown'),
+                    'violations': violations,
+                    'all_parameters': readings[i]
+                })
+        return alerts
+
+    def get_active_alarms(self):
+        """List (rule, sensor) pairs currently in alarm"""
+        with self.lock:
+            return [
+                {'rule': rule_name, 'sensor_id': sensor_id}
+                for (rule_name, sensor_id), state in self.state.items()
+                if state.active
+            ]
+
+    def get_stats(self):
+        """Rule configuration plus evaluation and suppression counters"""
+        with self.lock:
+            totals = self._empty_stats()
+            for stats in self.stats.values():
+                for key in totals:
+                    totals[key] += stats[key]
+
+            return {
+                'rules': [rule.to_dict() for rule in self.rules],
+                'stats': {name: dict(stats) for name, stats in self.stats.items()},
+                'totals': totals,
+                'active_alarms': sum(1 for state in self.state.values() if state.active)
+            }
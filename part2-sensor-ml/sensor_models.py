@@ -0,0 +1,209 @@
+import numpy as np
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+from model_selection import build_model
+from model_artifacts import save_bundle, load_bundle
+from numpy_scoring import export_compiled, load_compiled
+from drift_monitor import build_reference
+import startup
+
+joblib = startup.lazy_import('joblib')
+
+# A sensor needs this many training rows for its own model; sensors with
+# fewer are served by the global model
+MIN_SENSOR_SAMPLES = 50
+REGISTRY_DIRNAME = 'sensors'
+REGISTRY_FILENAME = 'registry.json'
+
+
+def _sensor_filename(sensor_id):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(sensor_id))
+
+
+def _train_sensor(sensor_id, rows, cache_file, feature_columns, model_spec, model_version,
+                  output_path, compact):
+    """Fit, evaluate and export one sensor's model; runs inside a worker process"""
+    from sklearn.ensemble import IsolationForest
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    start = time.perf_counter()
+    X, y = joblib.load(cache_file, mmap_mode='r')
+    X, y = X[rows], y[rows]
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # One core per sensor: the pool provides the parallelism
+    model = build_model(model_spec, n_jobs=1)
+    model.fit(X_train_scaled, y_train)
+    anomaly_detector = IsolationForest(contamination=0.1, random_state=42, n_jobs=1)
+    anomaly_detector.fit(X_train_scaled)
+
+    y_pred = model.predict(X_test_scaled)
+    mse = mean_squared_error(y_test, y_pred)
+    metadata = {
+        'sensor_id': sensor_id,
+        'training_timestamp': datetime.now().isoformat(),
+        'data_points': int(len(rows)),
+        'features': feature_columns,
+        'model_spec': model_spec,
+        'mse': float(mse),
+        'r2_score': float(r2_score(y_test, y_pred)),
+        'feature_reference': build_reference(X_train, feature_columns),
+        'model_version': f"{model_version}:{sensor_id}"
+    }
+
+    name = _sensor_filename(sensor_id)
+    compiled_file = os.path.join(output_path, f"{name}.compiled.joblib")
+    bundle_file = os.path.join(output_path, f"{name}.bundle.joblib")
+    save_bundle(bundle_file, model, scaler, anomaly_detector, metadata, compact=compact)
+    compiled = export_compiled(compiled_file, model, scaler, anomaly_detector, metadata,
+                               dtype=np.float32 if compact else np.float64)
+
+    return {
+        'sensor_id': sensor_id,
+        'bundle': os.path.basename(bundle_file),
+        'compiled': os.path.basename(compiled_file) if compiled is not None else None,
+        'data_points': metadata['data_points'],
+        'mse': metadata['mse'],
+        'r2_score': metadata['r2_score'],
+        'fit_seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+class SensorModelRegistry:
+    """One model per sensor, trained concurrently on a process pool.
+
+    Training data is written once as a joblib file that every worker
+    memory-maps read-only, so the pool shares a single copy. Each sensor's
+    model is exported like the global one (bundle plus compiled scorer) and
+    listed in registry.json; predict() falls back to the global model for
+    sensors without an entry.
+    """
+
+    def __init__(self, models_path, n_jobs=-1, min_samples=MIN_SENSOR_SAMPLES, backend='numpy', mmap=True):
+        self.models_path = models_path
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.mmap = mmap
+        self.min_samples = min_samples
+        self.models = {}  # sensor_id -> {'model', 'scaler', 'anomaly_detector', 'metadata'}
+        self.index = {}
+        self.lock = threading.Lock()
+        # Training runs write the same per-sensor artifacts; one at a time
+        self.train_lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.models_path, REGISTRY_DIRNAME)
+
+    def train(self, X, y, sensor_ids, feature_columns, model_spec, model_version, compact=False):
+        """Train every sensor with enough rows in parallel and swap them in"""
+        with self.train_lock:
+            return self._train(X, y, sensor_ids, feature_columns, model_spec, model_version, compact)
+
+    def _train(self, X, y, sensor_ids, feature_columns, model_spec, model_version, compact):
+        os.makedirs(self.path, exist_ok=True)
+        start = time.perf_counter()
+
+        sensor_ids = np.asarray(sensor_ids)
+        groups = {}
+        for sensor_id in np.unique(sensor_ids).tolist():
+            rows = np.flatnonzero(sensor_ids == sensor_id)
+            if len(rows) >= self.min_samples:
+                groups[sensor_id] = rows
+        if not groups:
+            return {'success': False, 'message': f'No sensor has {self.min_samples} training rows'}
+
+        n_jobs = min(os.cpu_count() if self.n_jobs < 0 else self.n_jobs, len(groups))
+        # Each run memory-maps its own copy of the training data, so a run in
+        # another worker process never reads or deletes this one's
+        fd, cache_file = tempfile.mkstemp(prefix='training_data_', suffix='.joblib', dir=self.path)
+        os.close(fd)
+        try:
+            joblib.dump((np.ascontiguousarray(X, dtype=np.float64),
+                         np.ascontiguousarray(y, dtype=np.float64)), cache_file)
+            results = joblib.Parallel(n_jobs=n_jobs)(
+                joblib.delayed(_train_sensor)(sensor_id, rows, cache_file, feature_columns, model_spec,
+                                              model_version, self.path, compact)
+                for sensor_id, rows in groups.items()
+            )
+        finally:
+            os.remove(cache_file)
+
+        index = {
+            'model_version': model_version,
+            'training_timestamp': datetime.now().isoformat(),
+            'training_seconds': round(time.perf_counter() - start, 3),
+            'n_jobs': n_jobs,
+            'sensors': {result['sensor_id']: result for result in results}
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix=REGISTRY_FILENAME, suffix='.tmp', dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, REGISTRY_FILENAME))
+
+        self.load()
+        return {
+            'success': True,
+            'sensors': len(results),
+            'training_seconds': index['training_seconds'],
+            'n_jobs': n_jobs,
+            'sum_fit_seconds': round(sum(r['fit_seconds'] for r in results), 3)
+        }
+
+    def load(self):
+        """Load every sensor listed in the registry; returns the number loaded"""
+        index_file = os.path.join(self.path, REGISTRY_FILENAME)
+        if not os.path.exists(index_file):
+            return 0
+        with open(index_file, 'r') as f:
+            index = json.load(f)
+
+        models = {}
+        for sensor_id, entry in index.get('sensors', {}).items():
+            try:
+                if self.backend == 'numpy' and entry.get('compiled'):
+                    artifact = load_compiled(os.path.join(self.path, entry['compiled']), mmap=self.mmap)
+                    model = artifact['model']
+                else:
+                    artifact = load_bundle(os.path.join(self.path, entry['bundle']), mmap=self.mmap)
+                    model = artifact.get('compact_model') or artifact['model']
+                models[sensor_id] = {
+                    'model': model,
+                    'scaler': artifact['scaler'],
+                    'anomaly_detector': artifact.get('anomaly_detector'),
+                    'metadata': artifact['metadata']
+                }
+            except Exception as e:
+                print(f"Error loading model for {sensor_id}: {e}")
+
+        with self.lock:
+            self.models = models
+            self.index = index
+        return len(models)
+
+    def get(self, sensor_id):
+        return self.models.get(sensor_id)
+
+    def get_info(self):
+        index = self.index
+        return {
+            'model_version': index.get('model_version'),
+            'training_timestamp': index.get('training_timestamp'),
+            'training_seconds': index.get('training_seconds'),
+            'sensors': {
+                sensor_id: {k: entry[k] for k in ('data_points', 'mse', 'r2_score', 'fit_seconds')}
+                for sensor_id, entry in index.get('sensors', {}).items()
+            },
+            'loaded': sorted(self.models)
+        }
@@ -1,5 +1,4 @@
-from flask import Flask, jsonify, request
-import pandas as pd
+from flask import Flask, Response, jsonify, request
 import numpy as np
 import json
 import os
@@ -8,10 +7,21 @@ import threading
 import time
 import schedule
 from ml_pipeline import MLPipeline
+from rule_engine import RuleEngine, ThresholdRule
+from model_selection import ModelSelectionJob
+from sensor_query import (MAX_QUERY_DAYS, MIN_LTTB_POINTS, QUERY_FIELDS, SensorHistory,
+                          bucket_aggregate, downsample, parse_time)
+import metrics
+import profiler
+import sensor_segments
+import startup
+import wire
 import requests
 
 app = Flask(__name__)
+app.register_blueprint(profiler.blueprint)
 ml_pipeline = MLPipeline()
+model_selection_job = ModelSelectionJob(ml_pipeline)
 
 SENSOR_DATA_PATH = "/app/sensor-data"
 MODELS_PATH = "/app/models"
@@ -27,11 +37,51 @@ TEMPERATURE_THRESHOLD = 85.0  # Celsius
 PRESSURE_THRESHOLD = 150.0    # PSI
 VISCOSITY_THRESHOLD = 50.0    # cSt
 
+# Alert rules (hysteresis, debounce and suppression) - override with a JSON file
+ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE', '/app/alert_rules.json')
+ALERT_SUPPRESSION_SECONDS = 300
+
+# Drift-triggered retraining never runs more often than this
+RETRAIN_MIN_INTERVAL_SECONDS = 600
+
+DEFAULT_ALERT_RULES = [
+    ThresholdRule('temperature_high', 'temperature', TEMPERATURE_THRESHOLD, '°C',
+                  hysteresis=2.0, suppression_seconds=ALERT_SUPPRESSION_SECONDS, label='Temperature'),
+    ThresholdRule('pressure_high', 'pressure', PRESSURE_THRESHOLD, ' PSI',
+                  hysteresis=5.0, suppression_seconds=ALERT_SUPPRESSION_SECONDS, label='Pressure'),
+    ThresholdRule('viscosity_high', 'viscosity', VISCOSITY_THRESHOLD, ' cSt',
+                  hysteresis=2.0, suppression_seconds=ALERT_SUPPRESSION_SECONDS, label='Viscosity')
+]
+
+rule_engine = RuleEngine.from_file(ALERT_RULES_FILE, DEFAULT_ALERT_RULES)
+
+THRESHOLD_ALERTS_TOTAL = metrics.counter('sensor_threshold_alerts_total', 'Threshold alerts raised')
+
+# Parsed daily files for range queries; past days are read once
+sensor_history = SensorHistory(SENSOR_DATA_PATH)
+# Un-aggregated range queries are downsampled beyond this many points
+MAX_RAW_POINTS = 5000
+
+def load_model():
+    """Load (or train) the model; the loader thread is shared with predict()"""
+    ml_pipeline.start_background_load().join()
+    return ml_pipeline.model is not None
+
+# Feature windows and the model load off the request path; /health answers
+# immediately and /ready reports progress
+readiness = startup.Readiness('sensor-ml-system')
+# warm_feature_store() is False when there are no readings yet, which is not a failure
+readiness.step('feature_store', lambda: ml_pipeline.warm_feature_store() or True)
+readiness.step('model', load_model)
+
 class SensorDataGenerator:
     """Simulate sensor data generation"""
     
     def __init__(self):
         self.running = True
+        self.last_retrain = 0.0
+        self.today_count = (None, 0)  # (date, readings in that day's file)
+        self.write_lock = threading.Lock()
     
     def generate_sensor_reading(self):
         """Generate realistic oil parameter data"""
@@ -63,23 +113,48 @@ class SensorDataGenerator:
             'contamination_level': round(np.random.uniform(0.1, 5.0), 2)
         }
     
+    @metrics.timed('sensor_save_sensor_data', 'Daily sensor file write time')
     def save_sensor_data(self, data):
-        """Save sensor data to daily file"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        filename = os.path.join(SENSOR_DATA_PATH, f"sensor_data_{today}.json")
-        
-        # Read existing data or create new list
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = []
+        """Save a reading, or a list of readings, to the daily file.
         
-        existing_data.append(data)
-        
-        with open(filename, 'w') as f:
-            json.dump(existing_data, f, indent=2)
+        The generator thread and /ingest request threads both land here, so
+        writes to the daily file are serialized by write_lock.
+        """
+        readings = data if isinstance(data, list) else [data]
+        today = datetime.now().strftime('%Y-%m-%d')
+        with self.write_lock:
+            if sensor_segments.STORAGE_FORMAT == 'segment':
+                return self.append_sensor_segment(today, readings)
+            
+            filename = os.path.join(SENSOR_DATA_PATH, f"sensor_data_{today}.json")
+            
+            # Read existing data or create new list
+            if os.path.exists(filename):
+                with open(filename, 'r') as f:
+                    existing_data = json.load(f)
+            else:
+                existing_data = []
+            
+            existing_data.extend(readings)
+            
+            # Swap in a complete file so readers never see a partial write
+            tmp_path = f"{filename}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(existing_data, f, indent=2)
+            os.replace(tmp_path, filename)
+            
+            self.today_count = (today, len(existing_data))
+            return filename
+    
+    def append_sensor_segment(self, today, readings):
+        """Append readings to today's binary segment instead of rewriting a JSON list.
         
+        Callers hold write_lock.
+        """
+        filename = os.path.join(SENSOR_DATA_PATH, f"sensor_data_{today}.seg")
+        sensor_segments.append_segment(filename, readings)
+        if self.today_count[0] == today:
+            self.today_count = (today, self.today_count[1] + len(readings))
         return filename
     
     def run_data_generation(self):
@@ -87,13 +162,12 @@ class SensorDataGenerator:
         while self.running:
             try:
                 data = self.generate_sensor_reading()
-                filename = self.save_sensor_data(data)
-                
-                # Check for threshold violations
-                self.check_thresholds(data)
+                self.process_batch([data])
                 
-                # Trigger ML pipeline every 10 readings
-                if len(self.get_today_readings()) % 10 == 0:
+                # Retrain only when live error or feature drift crosses its threshold
+                if (ml_pipeline.drift_monitor.should_retrain()
+                        and time.time() - self.last_retrain > RETRAIN_MIN_INTERVAL_SECONDS):
+                    self.last_retrain = time.time()
                     self.trigger_ml_pipeline()
                 
                 time.sleep(30)  # Generate data every 30 seconds
@@ -102,49 +176,50 @@ class SensorDataGenerator:
                 print(f"Error in data generation: {e}")
                 time.sleep(30)
     
+    def process_batch(self, readings, persist=True):
+        """Ingest path shared by the generator, /ingest and replays: persist,
+        update features and drift, then evaluate alert rules"""
+        if persist:
+            self.save_sensor_data(readings)
+        for reading in readings:
+            ml_pipeline.ingest_reading(reading)
+        
+        # Check for threshold violations
+        return self.check_thresholds_batch(readings)
+    
+    def get_today_count(self):
+        """Number of readings persisted today, without re-reading the file"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if self.today_count[0] != today:
+            self.today_count = (today, sensor_history.count(today))
+        return self.today_count[1]
+    
     def get_today_readings(self):
         """Get today's sensor readings"""
         today = datetime.now().strftime('%Y-%m-%d')
-        filename = os.path.join(SENSOR_DATA_PATH, f"sensor_data_{today}.json")
-        
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                return json.load(f)
-        return []
+        return sensor_segments.load_day(SENSOR_DATA_PATH, today)
     
     def check_thresholds(self, data):
         """Check if sensor data exceeds thresholds"""
-        threshold_violations = []
-        
-        if data['temperature'] > TEMPERATURE_THRESHOLD:
-            threshold_violations.append(f"Temperature: {data['temperature']}°C (> {TEMPERATURE_THRESHOLD}°C)")
-        
-        if data['pressure'] > PRESSURE_THRESHOLD:
-            threshold_violations.append(f"Pressure: {data['pressure']} PSI (> {PRESSURE_THRESHOLD} PSI)")
-        
-        if data['viscosity'] > VISCOSITY_THRESHOLD:
-            threshold_violations.append(f"Viscosity: {data['viscosity']} cSt (> {VISCOSITY_THRESHOLD} cSt)")
+        return self.check_thresholds_batch([data])
+    
+    def check_thresholds_batch(self, readings):
+        """Evaluate alert rules over a batch of readings and raise alerts"""
+        alerts = rule_engine.evaluate(readings)
+        if alerts:
+            THRESHOLD_ALERTS_TOTAL.inc(len(alerts))
         
-        if threshold_violations:
-            alert_data = {
-                'timestamp': data['timestamp'],
-                'sensor_id': data['sensor_id'],
-                'violations': threshold_violations,
-                'all_parameters': data
-            }
-            
+        for alert_data in alerts:
             self.notify_robots_threshold_violation(alert_data)
             self.save_alert(alert_data)
+        
+        return alerts
     
     def notify_robots_threshold_violation(self, alert_data):
         """Notify robot system of threshold violations"""
         try:
             robot_url = os.getenv('ROBOT_SYSTEM_URL', 'http://18.143.157.100:5003')
-            response = requests.post(
-                f'{robot_url}/threshold_alert',
-                json=alert_data,
-                timeout=5
-            )
+            response = wire.post(f'{robot_url}/threshold_alert', alert_data, timeout=5)
             print(f"Notified robots of threshold violation: {response.status_code}")
         except requests.exceptions.RequestException as e:
             print(f"Failed to notify robots: {e}")
@@ -179,8 +254,19 @@ def index():
         'status': 'running',
         'endpoints': [
             '/sensor_data - Get latest sensor data',
+            '/sensor_data/latest - Latest reading per sensor',
+            '/sensor_data/query - Bucketed or LTTB-downsampled history',
             '/model_info - Get current model information',
             '/train_model - Manually trigger model training',
+            '/model_selection - Compare model families with time-series CV (POST starts a run)',
+            '/model_selection/status - Progress of the last model selection run',
+            '/predict - Predict next temperature for a sensor',
+            '/ingest - Ingest posted readings (single or batch; JSON, MessagePack or packed records)',
+            '/drift - Get live prediction error and feature drift',
+            '/alert_rules - Get alert rules and suppression statistics',
+            '/metrics - Prometheus-style metrics',
+            '/ready - Readiness and start-up progress',
+            '/admin/profiler - Sampling profiler (requires ADMIN_TOKEN)',
             '/health - Health check'
         ]
     })
@@ -189,12 +275,13 @@ def index():
 def get_sensor_data():
     """Get latest sensor data"""
     try:
-        readings = sensor_generator.get_today_readings()
-        if readings:
-            latest_reading = readings[-1]
+        latest = latest_by_sensor()
+        if latest:
+            latest_reading = max(latest.values(), key=lambda r: r.get('timestamp', ''))
             return jsonify({
                 'latest_reading': latest_reading,
-                'total_readings_today': len(readings),
+                'latest_by_sensor': latest,
+                'total_readings_today': sensor_generator.get_today_count(),
                 'thresholds': {
                     'temperature': TEMPERATURE_THRESHOLD,
                     'pressure': PRESSURE_THRESHOLD,
@@ -209,6 +296,79 @@ def get_sensor_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def latest_by_sensor():
+    """Latest reading of every sensor from the online feature store"""
+    store = ml_pipeline.feature_store
+    return {sensor_id: store.latest_reading(sensor_id) for sensor_id in store.sensors()}
+
+@app.route('/sensor_data/latest')
+def get_latest_sensor_data():
+    """Latest reading per sensor (or for ?sensor_id=) from memory"""
+    try:
+        sensor_id = request.args.get('sensor_id')
+        if sensor_id:
+            reading = ml_pipeline.feature_store.latest_reading(sensor_id)
+            if reading is None:
+                return jsonify({'error': f'No readings for {sensor_id}'}), 404
+            return jsonify({sensor_id: reading})
+        return jsonify(latest_by_sensor())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sensor_data/query')
+def query_sensor_data():
+    """Aggregated history for charting.
+    
+    Query parameters: sensor_id (default: every sensor), fields (comma
+    separated, default temperature), start/end (ISO, default the last 24
+    hours), and either bucket_seconds for min/max/mean/count per bucket or
+    points for an LTTB downsample. Without either, raw points are returned,
+    downsampled to MAX_RAW_POINTS if there are more.
+    """
+    try:
+        end = parse_time(request.args.get('end'), datetime.now())
+        start = parse_time(request.args.get('start'), end - timedelta(hours=24))
+        if start >= end:
+            return jsonify({'error': 'start must be before end'}), 400
+        if end - start > timedelta(days=MAX_QUERY_DAYS):
+            return jsonify({'error': f'Range is limited to {MAX_QUERY_DAYS} days'}), 400
+        
+        fields = request.args.get('fields', 'temperature').split(',')
+        unknown = [f for f in fields if f not in QUERY_FIELDS]
+        if unknown:
+            return jsonify({'error': f'Unknown fields: {unknown}', 'fields': list(QUERY_FIELDS)}), 400
+        
+        bucket_seconds = request.args.get('bucket_seconds', type=int)
+        points = request.args.get('points', type=int)
+        if bucket_seconds is not None and bucket_seconds <= 0:
+            return jsonify({'error': 'bucket_seconds must be positive'}), 400
+        if points is not None:
+            if points < MIN_LTTB_POINTS:
+                return jsonify({'error': f'points must be at least {MIN_LTTB_POINTS}'}), 400
+            points = min(points, MAX_RAW_POINTS)
+        
+        data = sensor_history.query(start, end, request.args.get('sensor_id'), fields)
+        series = {}
+        for sensor_id in np.unique(data['sensor_id']).tolist():
+            mask = data['sensor_id'] == sensor_id
+            timestamps = data['timestamp'][mask]
+            if bucket_seconds:
+                series[sensor_id] = {f: bucket_aggregate(timestamps, data[f][mask], bucket_seconds) for f in fields}
+            else:
+                series[sensor_id] = {f: downsample(timestamps, data[f][mask], points or MAX_RAW_POINTS) for f in fields}
+        
+        return jsonify({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'method': 'buckets' if bucket_seconds else ('lttb' if points else 'raw'),
+            'raw_points': int(len(data['timestamp'])),
+            'series': series
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/model_info')
 def get_model_info():
     """Get current ML model information"""
@@ -227,15 +387,140 @@ def train_model():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/model_selection', methods=['GET', 'POST'])
+def model_selection():
+    """Start a run in the background (POST) or fetch the last comparison report (GET)"""
+    try:
+        if request.method == 'GET':
+            report = model_selection_job.last_report()
+            if report is None:
+                return jsonify({'message': 'No model selection run yet'}), 404
+            return jsonify(report)
+        
+        # The comparison fits dozens of models; it runs on its own thread
+        # and optionally retrains the production model when done
+        options = request.get_json(silent=True) or {}
+        try:
+            max_latency_ms = options.get('max_latency_ms')
+            started = model_selection_job.start(
+                families=options.get('families'),
+                days_back=int(options.get('days_back', 7)),
+                max_latency_ms=float(max_latency_ms) if max_latency_ms is not None else None,
+                apply=bool(options.get('apply'))
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid model selection options: {e}'}), 400
+        status = dict(model_selection_job.get_status(), status_url='/model_selection/status')
+        if not started:
+            return jsonify(dict(status, message='Model selection already running')), 409
+        return jsonify(status), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/model_selection/status')
+def model_selection_status():
+    """State of the last model selection run; GET /model_selection has its report"""
+    return jsonify(model_selection_job.get_status())
+
+@app.route('/predict', methods=['GET', 'POST'])
+def predict():
+    """Predict next temperature for a posted reading or a sensor's latest reading"""
+    try:
+        if request.method == 'POST':
+            reading = request.get_json()
+        else:
+            sensor_id = request.args.get('sensor_id', 'OIL_SENSOR_1')
+            reading = ml_pipeline.feature_store.latest_reading(sensor_id)
+            if reading is None:
+                return jsonify({'error': f'No readings for {sensor_id}'}), 404
+        
+        result = ml_pipeline.predict(reading)
+        result['sensor_id'] = reading.get('sensor_id')
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def reading_error(reading):
+    """Why a posted reading cannot be stored, or None if it can"""
+    if not isinstance(reading, dict) or 'sensor_id' not in reading or 'timestamp' not in reading:
+        return 'Each reading needs sensor_id and timestamp'
+    if not isinstance(reading['sensor_id'], str):
+        return f"sensor_id must be a string: {reading['sensor_id']!r}"
+    try:
+        datetime.fromisoformat(reading['timestamp'])
+    except (TypeError, ValueError):
+        return f"timestamp is not an ISO 8601 time: {reading['timestamp']!r}"
+    for field in sensor_segments.READING_FIELDS:
+        value = reading.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+            return f"{field} must be a number: {value!r}"
+    return None
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Ingest one posted reading or a list of readings (used by sensor_synth replay).
+    
+    Bodies may be JSON, MessagePack or packed sensor records, by Content-Type.
+    """
+    try:
+        payload = wire.read_body()
+        readings = payload if isinstance(payload, list) else [payload]
+        # Validate the whole batch before anything is persisted
+        for i, reading in enumerate(readings):
+            error = reading_error(reading)
+            if error:
+                return jsonify({'error': f'Reading {i}: {error}'}), 400
+        
+        persist = request.args.get('persist', 'true').lower() == 'true'
+        alerts = sensor_generator.process_batch(readings, persist=persist)
+        return jsonify({'success': True, 'ingested': len(readings), 'alerts': len(alerts)})
+    except wire.UnsupportedMediaType as e:
+        return jsonify({'error': str(e), 'supported': wire.supported_types()}), 415
+    except wire.MalformedBody as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/drift')
+def get_drift():
+    """Get live prediction error and feature drift statistics"""
+    try:
+        return jsonify(ml_pipeline.drift_monitor.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/alert_rules')
+def get_alert_rules():
+    """Get alert rule configuration and suppression statistics"""
+    try:
+        return jsonify(rule_engine.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus-style metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ready')
+def ready():
+    """Readiness probe with start-up progress"""
+    return readiness.response()
+
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy', 'service': 'sensor-ml-system'})
+    return jsonify({'status': 'healthy', 'service': 'sensor-ml-system', 'ready': readiness.is_ready()})
 
 def run_sensor_generation():
     """Run sensor data generation in background"""
     sensor_generator.run_data_generation()
 
 if __name__ == '__main__':
+    # Restore per-sensor feature windows from today's readings, then load the model
+    readiness.start()
+    
     # Start sensor data generation in background thread
     sensor_thread = threading.Thread(target=run_sensor_generation, daemon=True)
     sensor_thread.start()
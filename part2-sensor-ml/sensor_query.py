@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+import sensor_segments
+
+QUERY_FIELDS = ('temperature', 'pressure', 'viscosity', 'flow_rate', 'contamination_level')
+# Parsed daily files kept in memory (a little over a month)
+MAX_CACHED_DAYS = 35
+# Longest range a single query may span
+MAX_QUERY_DAYS = 90
+# LTTB always keeps the first and last points plus one per bucket
+MIN_LTTB_POINTS = 3
+
+
+class SensorHistory:
+    """Columnar, per-day cache of the persisted daily sensor files.
+
+    Each day is parsed once into NumPy arrays and reused until its files
+    change, so a range query over past weeks only re-reads today's file.
+    Binary segments are read straight into columns.
+    """
+
+    def __init__(self, sensor_data_path, max_days=MAX_CACHED_DAYS):
+        self.sensor_data_path = sensor_data_path
+        self.max_days = max_days
+        self.days = OrderedDict()  # date -> (file signature, columns)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _parse(readings):
+        readings = [r for r in readings if 'timestamp' in r]
+        columns = {
+            'timestamp': np.array([r['timestamp'] for r in readings], dtype='datetime64[us]'),
+            'sensor_id': np.array([r.get('sensor_id', 'unknown') for r in readings], dtype=object)
+        }
+        for field in QUERY_FIELDS:
+            columns[field] = np.array([r.get(field, np.nan) for r in readings], dtype=np.float64)
+        return columns
+
+    @staticmethod
+    def _load(filename):
+        if filename.endswith('.seg'):
+            return sensor_segments.to_columns(sensor_segments.read_segment(filename))
+        with open(filename, 'r') as f:
+            return SensorHistory._parse(json.load(f))
+
+    def day(self, date):
+        """Columns for one 'YYYY-MM-DD' day, or None if nothing was recorded"""
+        filenames = sensor_segments.day_files(self.sensor_data_path, date)
+        try:
+            stats = [os.stat(filename) for filename in filenames]
+        except OSError:
+            return None
+        if not stats:
+            return None
+        signature = tuple((f, stat.st_mtime_ns, stat.st_size) for f, stat in zip(filenames, stats))
+
+        with self.lock:
+            cached = self.days.get(date)
+            if cached is not None and cached[0] == signature:
+                self.days.move_to_end(date)
+                return cached[1]
+
+        parts = [self._load(filename) for filename in filenames]
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+
+        with self.lock:
+            self.days[date] = (signature, columns)
+            self.days.move_to_end(date)
+            while len(self.days) > self.max_days:
+                self.days.popitem(last=False)
+        return columns
+
+    def query(self, start, end, sensor_id=None, fields=QUERY_FIELDS):
+        """Readings with start <= timestamp < end, ordered by time"""
+        parts = []
+        date = start.date()
+        while date <= end.date():
+            columns = self.day(date.strftime('%Y-%m-%d'))
+            if columns is not None:
+                parts.append(columns)
+            date += timedelta(days=1)
+
+        names = ('timestamp', 'sensor_id') + tuple(fields)
+        if not parts:
+            return {name: np.array([], dtype='datetime64[us]' if name == 'timestamp' else np.float64)
+                    for name in names}
+
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in names}
+        mask = (merged['timestamp'] >= np.datetime64(start, 'us')) & (merged['timestamp'] < np.datetime64(end, 'us'))
+        if sensor_id is not None:
+            mask &= merged['sensor_id'] == sensor_id
+        return {name: values[mask] for name, values in merged.items()}
+
+    def count(self, date):
+        columns = self.day(date)
+        return 0 if columns is None else len(columns['timestamp'])
+
+
+def bucket_aggregate(timestamps, values, bucket_seconds):
+    """Min, max, mean and count per fixed time bucket over time-ordered values"""
+    valid = ~np.isnan(values)
+    timestamps, values = timestamps[valid], values[valid]
+    if len(values) == 0:
+        return {'timestamp': [], 'min': [], 'max': [], 'mean': [], 'count': []}
+
+    seconds = timestamps.astype('datetime64[s]').astype(np.int64)
+    buckets = seconds // bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    means = np.add.reduceat(values, starts) / counts
+
+    bucket_times = (buckets[starts] * bucket_seconds).astype('datetime64[s]')
+    return {
+        'timestamp': np.datetime_as_string(bucket_times).tolist(),
+        'min': np.round(np.minimum.reduceat(values, starts), 3).tolist(),
+        'max': np.round(np.maximum.reduceat(values, starts), 3).tolist(),
+        'mean': np.round(means, 3).tolist(),
+        'count': counts.tolist()
+    }
+
+
+def lttb(x, y, threshold):
+    """Indices of the Largest-Triangle-Three-Buckets downsample of (x, y).
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the next bucket's average.
+    """
+    if threshold < MIN_LTTB_POINTS:
+        raise ValueError(f'LTTB needs at least {MIN_LTTB_POINTS} points, got {threshold}')
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the following bucket (the last point for the final bucket)
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = stop if i + 2 < len(edges) else n - 1
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(timestamps, values, points):
+    """LTTB downsample of one field to at most `points` points"""
+    valid = ~np.isnan(values)
+    timestamps, values = timestamps[valid], values[valid]
+    x = timestamps.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    keep = lttb(x, values, points)
+    return {
+        'timestamp': np.datetime_as_string(timestamps[keep], unit='s').tolist(),
+        'value': values[keep].tolist()
+    }
+
+
+def parse_time(value, default):
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
@@ -0,0 +1,148 @@
+import json
+import os
+import struct
+import numpy as np
+import wire
+
+# Daily sensor files: 'json' (one JSON list per day, rewritten on every
+# save) or 'segment' (fixed-size binary records appended to a .seg file)
+STORAGE_FORMAT = os.getenv('SENSOR_STORAGE_FORMAT', 'json')
+
+READINGS_TYPE = 'application/vnd.oil-sensor-readings'
+READING_FIELDS = ('temperature', 'pressure', 'viscosity', 'flow_rate', 'contamination_level')
+MAX_SENSOR_ID_BYTES = 24
+
+# One reading per record: microseconds since the epoch, NUL-padded sensor id
+# and the measured values; missing values are NaN
+RECORD_DTYPE = np.dtype(
+    [('timestamp', '<i8'), ('sensor_id', f'S{MAX_SENSOR_ID_BYTES}')]
+    + [(field, '<f8') for field in READING_FIELDS]
+)
+# magic, layout version, record size
+HEADER = struct.Struct('<4sHH')
+MAGIC = b'OILS'
+LAYOUT_VERSION = 1
+
+
+def _header():
+    return HEADER.pack(MAGIC, LAYOUT_VERSION, RECORD_DTYPE.itemsize)
+
+
+def _check_header(buffer):
+    if len(buffer) < HEADER.size:
+        raise ValueError('Truncated sensor segment header')
+    magic, version, record_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != LAYOUT_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unsupported sensor segment layout: {magic!r} v{version}, {record_size}-byte records")
+
+
+def to_records(readings):
+    """Pack reading dicts into a structured array of RECORD_DTYPE"""
+    records = np.zeros(len(readings), dtype=RECORD_DTYPE)
+    if not readings:
+        return records
+    sensor_ids = [str(r.get('sensor_id', 'unknown')).encode() for r in readings]
+    if max(map(len, sensor_ids)) > MAX_SENSOR_ID_BYTES:
+        raise ValueError(f"Sensor ids longer than {MAX_SENSOR_ID_BYTES} bytes cannot be packed")
+
+    timestamps = np.array([r['timestamp'] for r in readings], dtype='datetime64[us]')
+    records['timestamp'] = timestamps.astype(np.int64)
+    records['sensor_id'] = sensor_ids
+    for field in READING_FIELDS:
+        records[field] = [r.get(field, np.nan) for r in readings]
+    return records
+
+
+def to_columns(records):
+    """Column arrays in the shape SensorHistory keeps for each day"""
+    columns = {
+        'timestamp': records['timestamp'].astype('datetime64[us]'),
+        'sensor_id': np.char.decode(records['sensor_id']).astype(object)
+    }
+    for field in READING_FIELDS:
+        columns[field] = records[field].astype(np.float64)
+    return columns
+
+
+def from_records(records):
+    """Reading dicts back from records; NaN values are left out"""
+    timestamps = records['timestamp'].astype('datetime64[us]')
+    unit = 's' if not (records['timestamp'] % 1_000_000).any() else 'us'
+    names = ('timestamp', 'sensor_id') + READING_FIELDS
+    columns = [np.datetime_as_string(timestamps, unit=unit).tolist(),
+               np.char.decode(records['sensor_id']).tolist()]
+    columns += [records[field].tolist() for field in READING_FIELDS]
+
+    if not any(np.isnan(records[field]).any() for field in READING_FIELDS):
+        return [dict(zip(names, row)) for row in zip(*columns)]
+    return [{name: value for name, value in zip(names, row) if value == value} for row in zip(*columns)]
+
+
+def encode_readings(readings):
+    """Wire body for a reading or list of readings"""
+    if isinstance(readings, dict):
+        readings = [readings]
+    return _header() + to_records(readings).tobytes()
+
+
+def decode_readings(body):
+    _check_header(body)
+    count = (len(body) - HEADER.size) // RECORD_DTYPE.itemsize
+    return from_records(np.frombuffer(body, dtype=RECORD_DTYPE, count=count, offset=HEADER.size))
+
+
+wire.register(READINGS_TYPE, encode_readings, decode_readings, name='readings')
+
+
+def day_files(sensor_data_path, date):
+    """Existing daily files for a 'YYYY-MM-DD' date, JSON first"""
+    base = os.path.join(sensor_data_path, f"sensor_data_{date}")
+    return [f"{base}{ext}" for ext in ('.json', '.seg') if os.path.exists(f"{base}{ext}")]
+
+
+def read_segment(path):
+    """Records of a segment file, memory-mapped; a torn trailing record is ignored"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        _check_header(f.read(HEADER.size))
+    count = (size - HEADER.size) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def segment_count(path):
+    return max(0, (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize)
+
+
+def append_segment(path, readings):
+    """Append readings to a segment file; returns the records now in it.
+
+    Not safe for concurrent writers: the sensor service serializes appends
+    with its daily-file write lock.
+    """
+    body = to_records(readings).tobytes()
+    with open(path, 'ab') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER.size:
+            f.truncate(0)
+            f.write(_header())
+        else:
+            # Drop a record torn by a crash mid-append so new records stay aligned
+            intact = HEADER.size + (size - HEADER.size) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+            if intact != size:
+                f.truncate(intact)
+        f.write(body)
+    return segment_count(path)
+
+
+def load_day(sensor_data_path, date):
+    """All readings recorded on a date as dicts, whichever format holds them"""
+    readings = []
+    for filename in day_files(sensor_data_path, date):
+        if filename.endswith('.seg'):
+            readings.extend(from_records(read_segment(filename)))
+        else:
+            with open(filename, 'r') as f:
+                readings.extend(json.load(f))
+    return readings
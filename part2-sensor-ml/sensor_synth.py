@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import sensor_segments
+import wire
+
+READING_COLUMNS = ['temperature', 'pressure', 'viscosity', 'flow_rate', 'contamination_level']
+
+# Live distribution of SensorDataGenerator.generate_sensor_reading
+BASE_MEANS = {'temperature': 75.0, 'pressure': 120.0, 'viscosity': 35.0, 'flow_rate': 45.0}
+BASE_STDS = {'temperature': 5.0, 'pressure': 10.0, 'viscosity': 3.0, 'flow_rate': 5.0}
+CONTAMINATION_RANGE = (0.1, 5.0)
+FAULT_RANGES = {'temperature': (15, 25), 'pressure': (30, 50), 'viscosity': (20, 30)}
+# Most readings a replay hands the sink at once (one /ingest request)
+MAX_REPLAY_BATCH = 500
+
+
+def sensor_name(index):
+    return f"OIL_SENSOR_{index + 1}"
+
+
+class SensorSynthesizer:
+    """Vectorized, seeded generator of correlated oil sensor readings.
+
+    Reproduces the live generator's distribution: the same means and spreads,
+    viscosity and pressure shifts when temperature exceeds 80 °C, and single-
+    parameter spikes at `fault_rate`. Readings are laid out on a regular
+    per-sensor time grid, round-robin across sensors. With `autocorrelation`
+    > 0, each sensor's temperature, pressure and viscosity follow an AR(1)
+    process with the same marginal spread, so lag features carry signal.
+    """
+
+    def __init__(self, n_sensors=5, seed=None, fault_rate=0.1, interval_seconds=30, autocorrelation=0.0):
+        self.n_sensors = n_sensors
+        self.fault_rate = fault_rate
+        self.interval_seconds = interval_seconds
+        self.autocorrelation = autocorrelation
+        self.rng = np.random.default_rng(seed)
+        self.sensor_ids = np.array([sensor_name(i) for i in range(n_sensors)], dtype=object)
+
+    def _noise(self, n):
+        """Standard normal noise, AR(1)-filtered per sensor if configured"""
+        if not self.autocorrelation:
+            return self.rng.standard_normal(n)
+        from scipy.signal import lfilter
+
+        phi = self.autocorrelation
+        steps = -(-n // self.n_sensors)
+        shocks = self.rng.standard_normal((steps, self.n_sensors)) * np.sqrt(1 - phi * phi)
+        # Start each sensor in its stationary distribution
+        shocks[0] /= np.sqrt(1 - phi * phi)
+        return lfilter([1.0], [1.0, -phi], shocks, axis=0).ravel()[:n]
+
+    def generate(self, n, end=None):
+        """Columns for n readings ending at `end` (default now), as NumPy arrays"""
+        end = np.datetime64(end or datetime.now(), 's')
+        index = np.arange(n)
+        steps = -(-n // self.n_sensors)
+        offsets = (steps - 1 - index // self.n_sensors) * self.interval_seconds
+        columns = {
+            'timestamp': end - offsets.astype('timedelta64[s]'),
+            'sensor_index': index % self.n_sensors
+        }
+
+        for param in ('temperature', 'pressure', 'viscosity'):
+            columns[param] = BASE_MEANS[param] + BASE_STDS[param] * self._noise(n)
+        columns['flow_rate'] = BASE_MEANS['flow_rate'] + BASE_STDS['flow_rate'] * self.rng.standard_normal(n)
+        columns['contamination_level'] = self.rng.uniform(*CONTAMINATION_RANGE, n)
+
+        # Higher temperature thins the oil and raises pressure
+        hot = columns['temperature'] > 80
+        columns['viscosity'][hot] *= 0.95
+        columns['pressure'][hot] *= 1.05
+
+        # Fault injection: one parameter spikes, each with equal probability
+        faulty = self.rng.random(n) < self.fault_rate
+        kind = self.rng.integers(0, 3, n)
+        for k, param in enumerate(('temperature', 'pressure', 'viscosity')):
+            mask = faulty & (kind == k)
+            columns[param][mask] += self.rng.uniform(*FAULT_RANGES[param], mask.sum())
+        columns['fault'] = faulty
+
+        for param in READING_COLUMNS:
+            columns[param] = np.round(columns[param], 2)
+        return columns
+
+    def frame(self, n, end=None):
+        """Readings as a DataFrame with the same columns as the daily files"""
+        import pandas as pd
+
+        columns = self.generate(n, end)
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(columns['timestamp']),
+            'sensor_id': self.sensor_ids[columns['sensor_index']],
+            **{param: columns[param] for param in READING_COLUMNS}
+        })
+
+    def readings(self, n, end=None):
+        """Readings as dicts, the shape produced by generate_sensor_reading"""
+        columns = self.generate(n, end)
+        timestamps = np.datetime_as_string(columns['timestamp'], unit='s')
+        sensor_ids = self.sensor_ids[columns['sensor_index']]
+        values = [columns[param].tolist() for param in READING_COLUMNS]
+        return [
+            dict(zip(READING_COLUMNS, row), timestamp=timestamp, sensor_id=sensor_id)
+            for timestamp, sensor_id, *row in zip(timestamps.tolist(), sensor_ids.tolist(), *values)
+        ]
+
+
+class Replayer:
+    """Streams recorded readings into a sink at `speed`x their original pace.
+
+    Readings due within the same `batch_seconds` tick are delivered together,
+    at most `max_batch` per call. speed=0 replays as fast as the sink accepts. Unless keep_timestamps is
+    set, each reading is restamped with its delivery time so the service
+    sees live data.
+    """
+
+    def __init__(self, readings, sink, speed=1.0, batch_seconds=0.05, keep_timestamps=False,
+                 max_batch=MAX_REPLAY_BATCH):
+        self.readings = sorted(readings, key=lambda r: r['timestamp'])
+        self.sink = sink
+        self.speed = speed
+        self.batch_seconds = batch_seconds
+        self.max_batch = max_batch
+        self.keep_timestamps = keep_timestamps
+        self.stop_event = threading.Event()
+        self.stats = {'sent': 0, 'batches': 0, 'errors': 0, 'max_lag_seconds': 0.0}
+
+    def _offsets(self):
+        times = np.array([np.datetime64(r['timestamp']) for r in self.readings], dtype='datetime64[ms]')
+        offsets = (times - times[0]).astype(np.float64) / 1000
+        return offsets / self.speed if self.speed > 0 else np.zeros(len(offsets))
+
+    def run(self, max_seconds=None):
+        if not self.readings:
+            return dict(self.stats)
+
+        offsets = self._offsets()
+        start = time.perf_counter()
+        i = 0
+        while i < len(self.readings) and not self.stop_event.is_set():
+            now = time.perf_counter() - start
+            if max_seconds is not None and now >= max_seconds:
+                break
+            if offsets[i] > now:
+                time.sleep(min(offsets[i] - now, self.batch_seconds))
+                continue
+
+            j = int(np.searchsorted(offsets, now + self.batch_seconds, side='right'))
+            j = min(j, i + self.max_batch)
+            batch = self.readings[i:j]
+            if not self.keep_timestamps:
+                stamp = datetime.now().isoformat()
+                batch = [dict(r, timestamp=stamp) for r in batch]
+
+            self.stats['max_lag_seconds'] = max(self.stats['max_lag_seconds'], float(now - offsets[i]))
+            try:
+                self.sink(batch)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Replay sink error: {e}")
+            self.stats['sent'] += len(batch)
+            self.stats['batches'] += 1
+            i = j
+
+        elapsed = time.perf_counter() - start
+        return dict(self.stats, elapsed_seconds=round(elapsed, 3),
+                    readings_per_second=round(self.stats['sent'] / elapsed, 1) if elapsed else None)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def http_sink(url, timeout=10, wire_format=None):
+    """POST each batch to a sensor service's /ingest endpoint"""
+    import requests
+    session = requests.Session()
+
+    def sink(batch):
+        wire.post(f"{url.rstrip('/')}/ingest", batch, timeout, wire_format, session).raise_for_status()
+    return sink
+
+
+def load_recorded(sensor_data_path, days_back):
+    """Readings from the daily sensor files of the last N days"""
+    readings = []
+    for i in range(days_back):
+        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+        readings.extend(sensor_segments.load_day(sensor_data_path, date))
+    return readings
+
+
+def write_readings(path, synthesizer, n):
+    """Write n synthetic readings as .npz columns, .csv, daily-file .json or .seg segment"""
+    if path.endswith('.npz'):
+        columns = synthesizer.generate(n)
+        columns['sensor_id'] = synthesizer.sensor_ids[columns.pop('sensor_index')].astype(str)
+        np.savez_compressed(path, **columns)
+    elif path.endswith('.csv'):
+        synthesizer.frame(n).to_csv(path, index=False)
+    elif path.endswith('.seg'):
+        if os.path.exists(path):
+            os.remove(path)
+        sensor_segments.append_segment(path, synthesizer.readings(n))
+    else:
+        with open(path, 'w') as f:
+            json.dump(synthesizer.readings(n), f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthesize or replay oil sensor readings')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    synth = commands.add_parser('synth', help='generate seeded synthetic readings')
+    synth.add_argument('--rows', type=int, default=1_000_000)
+    synth.add_argument('--sensors', type=int, default=5)
+    synth.add_argument('--seed', type=int, default=42)
+    synth.add_argument('--fault-rate', type=float, default=0.1)
+    synth.add_argument('--autocorrelation', type=float, default=0.0)
+    synth.add_argument('--output', help='.npz, .csv, .json or .seg; omit to only measure throughput')
+
+    replay = commands.add_parser('replay', help='stream history into the ingest path')
+    replay.add_argument('--input', help='JSON readings file or .seg segment; defaults to the recorded daily files')
+    replay.add_argument('--sensor-data-path', default='/app/sensor-data')
+    replay.add_argument('--days', type=int, default=1)
+    replay.add_argument('--speed', type=float, default=60.0, help='multiple of real time; 0 = unthrottled')
+    replay.add_argument('--max-seconds', type=float)
+    replay.add_argument('--keep-timestamps', action='store_true')
+    replay.add_argument('--max-batch', type=int, default=MAX_REPLAY_BATCH, help='most readings per sink call')
+    replay.add_argument('--url', default='http://localhost:5002', help="sensor service, or 'local' to ingest in-process")
+    replay.add_argument('--wire-format', choices=['json', 'msgpack', 'readings'],
+                        help='request body encoding; readings = packed sensor records (default: WIRE_FORMAT)')
+    args = parser.parse_args()
+
+    if args.command == 'synth':
+        synthesizer = SensorSynthesizer(args.sensors, args.seed, args.fault_rate,
+                                        autocorrelation=args.autocorrelation)
+        start = time.perf_counter()
+        if args.output:
+            write_readings(args.output, synthesizer, args.rows)
+        else:
+            synthesizer.generate(args.rows)
+        elapsed = time.perf_counter() - start
+        print(json.dumps({'rows': args.rows, 'seconds': round(elapsed, 3),
+                          'rows_per_second': round(args.rows / elapsed)}))
+    else:
+        if args.input and args.input.endswith('.seg'):
+            readings = sensor_segments.from_records(sensor_segments.read_segment(args.input))
+        elif args.input:
+            with open(args.input, 'r') as f:
+                readings = json.load(f)
+        else:
+            readings = load_recorded(args.sensor_data_path, args.days)
+
+        if args.url == 'local':
+            from sensor_monitor import sensor_generator
+            sink = sensor_generator.process_batch
+        else:
+            sink = http_sink(args.url, wire_format=args.wire_format)
+
+        print(f"Replaying {len(readings)} readings at {args.speed}x")
+        result = Replayer(readings, sink, args.speed, keep_timestamps=args.keep_timestamps,
+                          max_batch=args.max_batch).run(args.max_seconds)
+        print(json.dumps(result, indent=2))
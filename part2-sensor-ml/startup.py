@@ -0,0 +1,131 @@
+import importlib
+import os
+import threading
+import time
+import traceback
+from flask import jsonify
+
+# 'lazy' runs initialization steps on a background thread so health checks
+# answer immediately; 'eager' runs them inline in start(), before serving
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'lazy')
+PROCESS_START = time.time()
+
+# module name -> seconds spent importing it through lazy_import
+IMPORT_SECONDS = {}
+_import_lock = threading.RLock()
+_lazy_modules = {}
+
+
+class _LazyModule:
+    """Stands in for a module until one of its attributes is first used"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _import_lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_SECONDS[self._name] = round(time.perf_counter() - start, 4)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Module proxy that defers `import name` until first attribute access"""
+    with _import_lock:
+        module = _lazy_modules.get(name)
+        if module is None:
+            module = _lazy_modules[name] = _LazyModule(name)
+        return module
+
+
+def preload(*modules):
+    """Import lazy modules now, e.g. from a background initialization step"""
+    for module in modules:
+        module._load()
+
+
+class Readiness:
+    """Named initialization steps run once, in order, off the request path.
+
+    Handlers that need a step call wait(name) with a short timeout and
+    answer 503 while it is still running; start() is implied by the
+    first wait().
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.steps = []  # [(name, fn)]
+        self.state = {}  # name -> {'state', 'seconds', 'error'}
+        self.done = {}   # name -> threading.Event
+        self.lock = threading.Lock()
+        self.thread = None
+        self.ready_at = None
+
+    def step(self, name, fn):
+        self.steps.append((name, fn))
+        self.state[name] = {'state': 'pending', 'seconds': None, 'error': None}
+        self.done[name] = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name=f'{self.service}-startup', daemon=True)
+            if STARTUP_MODE == 'lazy':
+                self.thread.start()
+        if STARTUP_MODE != 'lazy':
+            self._run()
+
+    def _run(self):
+        for name, fn in self.steps:
+            self.state[name]['state'] = 'running'
+            start = time.perf_counter()
+            try:
+                result = fn()
+                self.state[name]['state'] = 'failed' if result is False else 'ready'
+            except Exception as e:
+                self.state[name].update(state='failed', error=str(e))
+                print(f"Startup step {name} failed: {e}")
+                traceback.print_exc()
+            self.state[name]['seconds'] = round(time.perf_counter() - start, 3)
+            self.done[name].set()
+        self.ready_at = time.time()
+
+    def wait(self, name, timeout=None):
+        """True once step `name` has finished successfully"""
+        self.start()
+        self.done[name].wait(timeout)
+        return self.state[name]['state'] == 'ready'
+
+    def is_ready(self):
+        return all(step['state'] == 'ready' for step in self.state.values())
+
+    def status(self):
+        finished = sum(1 for event in self.done.values() if event.is_set())
+        return {
+            'service': self.service,
+            'ready': self.is_ready(),
+            'mode': STARTUP_MODE,
+            'progress': round(finished / len(self.steps), 3) if self.steps else 1.0,
+            'seconds_since_start': round(time.time() - PROCESS_START, 3),
+            'seconds_to_ready': round(self.ready_at - PROCESS_START, 3) if self.ready_at else None,
+            'steps': {name: dict(self.state[name]) for name, _ in self.steps},
+            'imports': dict(IMPORT_SECONDS)
+        }
+
+    def response(self):
+        """/ready body: 200 once every step is ready, 503 with progress before"""
+        status = self.status()
+        return jsonify(status), 200 if status['ready'] else 503
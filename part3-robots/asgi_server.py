@@ -0,0 +1,89 @@
+import asyncio
+import socketio
+import uvicorn
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from broadcast import ALL_ROOM, topic_rooms
+
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    """Runs each WSGI request on the event loop's thread pool.
+
+    asgiref runs WSGI apps thread-sensitively, which funnels every Flask
+    request through a single shared thread; requests waiting on the state
+    loop or on disk would then queue behind each other.
+    """
+
+    # asgiref's method, minus its @sync_to_async wrapper
+    _run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False)(body)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+def create_asgi_app(flask_app, robot_system, client_manager=None, cors_allowed_origins='*'):
+    """Serve Socket.IO from an asyncio server and the Flask routes over WSGI.
+
+    Each idle dashboard connection costs a coroutine rather than a thread.
+    Broadcasts raised on the robot state loop thread are handed over to the
+    event loop, so the event loop itself never blocks on state or file I/O.
+    """
+    sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins=cors_allowed_origins,
+                               client_manager=client_manager)
+    event_loop = {}
+
+    def emit(event, data=None, **kwargs):
+        loop = event_loop.get('loop')
+        if loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(sio.emit(event, data, **kwargs), loop)
+
+    async def on_startup():
+        event_loop['loop'] = asyncio.get_running_loop()
+        robot_system.set_emitter(emit)
+
+    def topics(sid):
+        return sorted(r for r in sio.rooms(sid) if r != sid)
+
+    @sio.event
+    async def connect(sid, environ):
+        await sio.enter_room(sid, ALL_ROOM)
+        await sio.emit('connected', {'status': 'Connected to Robot System'}, to=sid)
+
+    @sio.on('subscribe')
+    async def subscribe(sid, data):
+        await sio.leave_room(sid, ALL_ROOM)
+        for room in topic_rooms(data.get('floors', []), data.get('robots', [])):
+            await sio.enter_room(sid, room)
+        await sio.emit('subscribed', {'rooms': topics(sid)}, to=sid)
+
+    @sio.on('unsubscribe')
+    async def unsubscribe(sid, data):
+        for room in topic_rooms(data.get('floors', []), data.get('robots', [])):
+            await sio.leave_room(sid, room)
+        if not topics(sid):
+            await sio.enter_room(sid, ALL_ROOM)
+        await sio.emit('subscribed', {'rooms': topics(sid)}, to=sid)
+
+    @sio.event
+    async def disconnect(sid):
+        pass
+
+    @sio.on('request_dashboard_update')
+    async def request_dashboard_update(sid, data=None):
+        snapshot = robot_system.snapshot_cache
+        if snapshot is None:
+            # Rebuilding waits on the state loop; keep that off the event loop
+            snapshot = await asyncio.to_thread(robot_system.snapshot)
+        await sio.emit('dashboard_data', snapshot['dashboard'], to=sid)
+
+    return socketio.ASGIApp(sio, other_asgi_app=ThreadedWsgiToAsgi(flask_app), on_startup=on_startup)
+
+
+def serve(flask_app, robot_system, host='0.0.0.0', port=5000, client_manager=None):
+    uvicorn.run(create_asgi_app(flask_app, robot_system, client_manager), host=host, port=port, log_level='warning')
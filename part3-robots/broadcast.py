@@ -0,0 +1,211 @@
+"""Socket.IO broadcast backends and per-topic rooms.
+
+BROADCAST_BACKEND selects how emits reach clients connected to other
+robot-controller workers:
+
+    local  in-process only (single worker)
+    redis  Redis pub/sub at BROADCAST_URL (default redis://redis:6379/0)
+    unix   a local broker on the Unix socket at BROADCAST_URL; start it with
+           `python broadcast.py broker`
+
+Clients start in the 'all' room and receive every event. Sending
+`subscribe` with floors and/or robots moves a client to topic rooms so it
+only gets updates for what it displays.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import threading
+import time
+import socketio
+from engineio import json
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+ALL_ROOM = 'all'
+
+DEFAULT_URLS = {
+    'redis': 'redis://redis:6379/0',
+    'unix': '/tmp/robot-broadcast.sock'
+}
+
+FRAME_HEADER = struct.Struct('!I')
+ROLE_PUBLISHER = b'P'
+ROLE_SUBSCRIBER = b'S'
+RECONNECT_SECONDS = 1
+
+
+def floor_room(floor):
+    return f"floor:{floor}"
+
+
+def robot_room(robot_id):
+    return f"robot:{robot_id}"
+
+
+def topic_rooms(floors=(), robots=()):
+    return [floor_room(f) for f in floors] + [robot_room(r) for r in robots]
+
+
+def create_client_manager(backend, url=None, async_mode=False, write_only=False):
+    """Socket.IO client manager for a backend; None means the in-process default"""
+    if backend in (None, '', 'local'):
+        return None
+    url = url or DEFAULT_URLS.get(backend)
+    if backend == 'redis':
+        manager_class = socketio.AsyncRedisManager if async_mode else socketio.RedisManager
+        return manager_class(url, write_only=write_only)
+    if backend == 'unix':
+        manager_class = AsyncUnixSocketManager if async_mode else UnixSocketManager
+        return manager_class(url, write_only=write_only)
+    raise ValueError(f"Unknown broadcast backend: {backend}")
+
+
+class UnixSocketBroker:
+    """Relays every frame a publisher sends to all connected subscribers"""
+
+    def __init__(self, path):
+        self.path = path
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(64)
+        print(f"Broadcast broker listening on {self.path}")
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        reader = conn.makefile('rb')
+        role = reader.read(1)
+        if role == ROLE_SUBSCRIBER:
+            with self.lock:
+                self.subscribers.add(conn)
+            # Subscribers never send; block until they disconnect
+            reader.read()
+            with self.lock:
+                self.subscribers.discard(conn)
+            conn.close()
+            return
+
+        while True:
+            header = reader.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            frame = header + reader.read(FRAME_HEADER.unpack(header)[0])
+            with self.lock:
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                try:
+                    subscriber.sendall(frame)
+                except OSError:
+                    with self.lock:
+                        self.subscribers.discard(subscriber)
+        conn.close()
+
+
+class UnixSocketManager(socketio.PubSubManager):
+    """Socket.IO pub/sub over a UnixSocketBroker (threading servers)"""
+    name = 'unix'
+
+    def __init__(self, url=DEFAULT_URLS['unix'], channel='socketio', write_only=False, logger=None):
+        self.path = url
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self, role):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.sendall(role)
+        return sock
+
+    def _publish(self, data):
+        payload = json.dumps(data).encode()
+        with self.publish_lock:
+            # Retry once on a fresh connection if the broker restarted
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        self.publisher = self._connect(ROLE_PUBLISHER)
+                    self.publisher.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+                    return
+                except OSError as e:
+                    if self.publisher is not None:
+                        self.publisher.close()
+                    self.publisher = None
+                    if attempt:
+                        print(f"Broadcast publish failed: {e}")
+
+    def _listen(self):
+        while True:
+            try:
+                reader = self._connect(ROLE_SUBSCRIBER).makefile('rb')
+                while True:
+                    header = reader.read(FRAME_HEADER.size)
+                    if len(header) < FRAME_HEADER.size:
+                        break
+                    yield reader.read(FRAME_HEADER.unpack(header)[0])
+            except OSError as e:
+                print(f"Broadcast broker unavailable: {e}")
+            time.sleep(RECONNECT_SECONDS)
+
+
+class AsyncUnixSocketManager(AsyncPubSubManager):
+    """Socket.IO pub/sub over a UnixSocketBroker (asyncio servers)"""
+    name = 'unix'
+
+    def __init__(self, url=DEFAULT_URLS['unix'], channel='socketio', write_only=False, logger=None):
+        self.path = url
+        self.publisher = None
+        self.publish_lock = None
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    async def _connect(self, role):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        writer.write(role)
+        return reader, writer
+
+    async def _publish(self, data):
+        payload = json.dumps(data).encode()
+        if self.publish_lock is None:
+            self.publish_lock = asyncio.Lock()
+        async with self.publish_lock:
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        _, self.publisher = await self._connect(ROLE_PUBLISHER)
+                    self.publisher.write(FRAME_HEADER.pack(len(payload)) + payload)
+                    await self.publisher.drain()
+                    return
+                except OSError as e:
+                    if self.publisher is not None:
+                        self.publisher.close()
+                    self.publisher = None
+                    if attempt:
+                        print(f"Broadcast publish failed: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                reader, _ = await self._connect(ROLE_SUBSCRIBER)
+                while True:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                    yield await reader.readexactly(FRAME_HEADER.unpack(header)[0])
+            except (OSError, asyncio.IncompleteReadError) as e:
+                print(f"Broadcast broker unavailable: {e}")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Socket.IO broadcast broker')
+    parser.add_argument('command', choices=['broker'])
+    parser.add_argument('--socket', default=os.getenv('BROADCAST_URL', DEFAULT_URLS['unix']))
+    args = parser.parse_args()
+    UnixSocketBroker(args.socket).serve_forever()
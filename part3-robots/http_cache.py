@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Encoded representations kept per snapshot version
+MAX_CACHED_BODIES = 64
+
+
+def select_fields(payload, fields):
+    """Keep only the requested top-level keys of a dict payload"""
+    if not fields or not isinstance(payload, dict):
+        return payload
+    return {key: payload[key] for key in fields if key in payload}
+
+
+def parse_fields(value):
+    return tuple(sorted(f for f in (value or '').split(',') if f))
+
+
+def _accepted_encoding():
+    offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offers) or 'identity'
+
+
+def _etag_matches(etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: W/"x" matches "x"
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates
+
+
+class SnapshotResponder:
+    """Serves versioned snapshots as cached, pre-encoded JSON bodies.
+
+    A body is serialized (and compressed) once per snapshot version, view,
+    field selection and content coding; until the version changes every
+    request is a dict lookup. Clients sending the ETag back in
+    If-None-Match get 304 Not Modified with no body.
+    """
+
+    def __init__(self, max_bodies=MAX_CACHED_BODIES):
+        self.max_bodies = max_bodies
+        self.bodies = OrderedDict()  # (version, view, fields, coding) -> (etag, coding, body)
+        self.version = None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    def _encode(self, version, view, fields, coding, build):
+        payload = select_fields(build(), fields)
+        body = json.dumps(payload, separators=(',', ':'), default=str).encode()
+        # Content-derived, so ETags agree across workers and restarts
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        etag = f'"{digest}"'
+
+        if len(body) < MIN_COMPRESS_BYTES:
+            coding = 'identity'
+        if coding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        elif coding == 'gzip':
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        # Each coding is its own representation, so it gets its own strong ETag
+        if coding != 'identity':
+            etag = f'"{digest}-{coding}"'
+        return etag, coding, body
+
+    def respond(self, version, view, build, fields=()):
+        """Response for `view` of snapshot `version`; build() makes the payload on a miss"""
+        coding = _accepted_encoding()
+        key = (version, view, fields, coding)
+        with self.lock:
+            if version != self.version:
+                self.bodies.clear()
+                self.version = version
+            cached = self.bodies.get(key)
+            if cached is not None:
+                self.bodies.move_to_end(key)
+                self.stats['hits'] += 1
+
+        if cached is None:
+            cached = self._encode(version, view, fields, coding, build)
+            with self.lock:
+                self.stats['misses'] += 1
+                if version == self.version:
+                    self.bodies[key] = cached
+                    while len(self.bodies) > self.max_bodies:
+                        self.bodies.popitem(last=False)
+
+        etag, coding, body = cached
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if _etag_matches(etag):
+            with self.lock:
+                self.stats['not_modified'] += 1
+            return Response(status=304, headers=headers)
+
+        response = Response(body, mimetype='application/json', headers=headers)
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+        return response
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, cached_bodies=len(self.bodies), version=self.version)
@@ -0,0 +1,203 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from flask import Blueprint, Response, jsonify, request
+
+# Hard limits so a profile is safe to take under production load
+MAX_PROFILE_SECONDS = 120
+MIN_INTERVAL_MS = 5
+MAX_INTERVAL_MS = 1000
+# Sampling may use at most this share of one core; the interval backs off otherwise
+MAX_OVERHEAD = 0.02
+MAX_STACKS = 20000
+MAX_DEPTH = 128
+
+# (module file, function) of leaf frames of threads that are parked, not
+# working. Matched on the module too so application functions that happen
+# to be called get() or wait() are still sampled.
+IDLE_FRAMES = frozenset({
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'), ('selectors.py', 'select'), ('socketserver.py', 'serve_forever'),
+    ('socket.py', 'accept'), ('socket.py', 'readinto'), ('ssl.py', 'read'), ('ssl.py', 'recv'),
+    ('ssl.py', 'recv_into'), ('thread.py', '_worker')
+})
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack on a timer thread.
+
+    Results are aggregated as collapsed stacks ("thread;outer;...;inner count"),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, max_overhead=MAX_OVERHEAD, max_stacks=MAX_STACKS):
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.labels = {}  # code object -> frame label
+        self.idle_codes = {}  # code object -> whether it parks its thread
+        self._reset(0, 0)
+
+    def _reset(self, seconds, interval):
+        self.counts = {}
+        self.samples = 0
+        self.dropped = 0
+        self.sampling_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.requested_seconds = seconds
+        self.interval = interval
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=10, interval_ms=10, include_idle=False):
+        """Start a bounded profile; returns False if one is already running"""
+        seconds = min(max(float(seconds), 0.1), MAX_PROFILE_SECONDS)
+        interval = min(max(float(interval_ms), MIN_INTERVAL_MS), MAX_INTERVAL_MS) / 1000
+        with self.lock:
+            if self.is_running():
+                return False
+            self._reset(seconds, interval)
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, args=(seconds, include_idle),
+                                           name='sampling-profiler', daemon=True)
+            self.started_at = time.time()
+            self.thread.start()
+        return True
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def wait(self):
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self.labels[code] = label
+        return label
+
+    def _is_idle(self, code):
+        idle = self.idle_codes.get(code)
+        if idle is None:
+            idle = (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+            self.idle_codes[code] = idle
+        return idle
+
+    def _sample(self, own_ident, include_idle):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if not include_idle and self._is_idle(frame.f_code):
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f'thread-{ident}'))
+            key = ';'.join(reversed(stack))
+            if key in self.counts:
+                self.counts[key] += 1
+            elif len(self.counts) < self.max_stacks:
+                self.counts[key] = 1
+            else:
+                self.dropped += 1
+        self.samples += 1
+
+    def _run(self, seconds, include_idle):
+        own_ident = threading.get_ident()
+        requested_interval = self.interval
+        deadline = time.monotonic() + seconds
+        while not self.stop_event.wait(self.interval):
+            start = time.perf_counter()
+            self._sample(own_ident, include_idle)
+            cost = time.perf_counter() - start
+            self.sampling_seconds += cost
+            # Keep the sampler's share of a core under max_overhead
+            self.interval = min(max(requested_interval, cost / self.max_overhead), MAX_INTERVAL_MS / 1000)
+            if time.monotonic() >= deadline:
+                break
+        self.finished_at = time.time()
+
+    def collapsed(self):
+        counts = dict(self.counts)
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def status(self):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            'running': self.is_running(),
+            'requested_seconds': self.requested_seconds,
+            'elapsed_seconds': round(elapsed, 3),
+            'interval_ms': round(self.interval * 1000, 3),
+            'samples': self.samples,
+            'unique_stacks': len(self.counts),
+            'dropped_stacks': self.dropped,
+            'overhead': round(self.sampling_seconds / elapsed, 5) if elapsed else 0.0
+        }
+
+
+profiler = SamplingProfiler()
+
+# Admin routes: /admin/profiler/start, /stop, /status and / (collapsed stacks).
+# Requests must carry X-Admin-Token matching ADMIN_TOKEN; without it the
+# profiler is disabled.
+blueprint = Blueprint('profiler', __name__, url_prefix='/admin/profiler')
+
+
+def collapsed_response():
+    return Response(profiler.collapsed(), mimetype='text/plain')
+
+
+@blueprint.before_request
+def require_admin_token():
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Profiler disabled: ADMIN_TOKEN is not set'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({'error': 'Invalid admin token'}), 403
+
+
+@blueprint.route('/start', methods=['POST'])
+def start_profile():
+    """Start a profile; with "wait": true, block and return the collapsed stacks"""
+    options = request.get_json(silent=True) or {}
+    started = profiler.start(
+        seconds=options.get('seconds', 10),
+        interval_ms=options.get('interval_ms', 10),
+        include_idle=bool(options.get('include_idle', False))
+    )
+    if not started:
+        return jsonify({'success': False, 'message': 'A profile is already running'}), 409
+    if options.get('wait'):
+        profiler.wait()
+        return collapsed_response()
+    return jsonify(dict(profiler.status(), success=True))
+
+
+@blueprint.route('/stop', methods=['POST'])
+def stop_profile():
+    profiler.stop()
+    return collapsed_response()
+
+
+@blueprint.route('/status')
+def profile_status():
+    return jsonify(profiler.status())
+
+
+@blueprint.route('')
+def latest_profile():
+    return collapsed_response()
@@ -1,24 +1,77 @@
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, render_template, request, jsonify
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import json
 import os
-import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
 import numpy as np
+from broadcast import ALL_ROOM, create_client_manager, floor_room, robot_room, topic_rooms
 from dashboard import DashboardManager
+from http_cache import SnapshotResponder, parse_fields
+import metrics
+import profiler
+from state_loop import StateLoop, on_loop
+import startup
+from task_scheduler import TaskScheduler
+from visitor_registry import VisitorRegistry
+import wire
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'sarawak-energy-robots'
-socketio = SocketIO(app, cors_allowed_origins="*")
+app.register_blueprint(profiler.blueprint)
+
+# 'threading' (Flask-SocketIO dev server) or 'asgi' (asyncio, see asgi_server.py)
+SERVER_MODE = os.getenv('ROBOT_SERVER_MODE', 'threading')
+
+# Cross-worker fan-out: 'local', 'redis' or 'unix' (see broadcast.py)
+BROADCAST_BACKEND = os.getenv('BROADCAST_BACKEND', 'local')
+BROADCAST_URL = os.getenv('BROADCAST_URL')
+
+# Extra fan-out workers set this to false so only one process simulates robots
+RUN_SIMULATION = os.getenv('ROBOT_RUN_SIMULATION', 'true').lower() == 'true'
+
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    client_manager=None if SERVER_MODE == 'asgi' else create_client_manager(BROADCAST_BACKEND, BROADCAST_URL)
+)
 
 SHARED_DATA_PATH = "/app/shared-data"
 os.makedirs(SHARED_DATA_PATH, exist_ok=True)
 
 dashboard_manager = DashboardManager()
 
+EMIT_SECONDS = metrics.histogram('robot_socketio_emit_seconds', 'Time to hand a Socket.IO event to the server')
+
+# Repeat security alerts for the same visitor are suppressed within this window
+SECURITY_ALERT_WINDOW_SECONDS = 300
+
+# Result codes returned by bulk sighting checks
+ACCESS_AUTHORIZED = 0
+ACCESS_WRONG_FLOOR = 1
+ACCESS_UNKNOWN_VISITOR = 2
+
+ROBOT_UPDATE_INTERVAL_SECONDS = 15
+# Robots work through their task queues between status updates
+TASK_TICK_SECONDS = 1
+# Floor threshold alerts send robots to unless the alert names one
+OIL_CONTAINER_FLOOR = int(os.getenv('OIL_CONTAINER_FLOOR', '4'))
+MAX_ALERTS = 100
+MAX_SENSOR_ALERTS = 500
+
 class RobotSystem:
+    """Robot fleet state owned by a single writer loop.
+    
+    Methods marked @on_loop run on the loop thread; request handlers read
+    immutable snapshots that are rebuilt only after a change.
+    """
+    
     def __init__(self):
+        self.loop = StateLoop('robot-state')
+        # Daily sensor files are rewritten whole; that happens here, off the state loop
+        self.sensor_writer = StateLoop('robot-sensor-writer')
+        self.set_emitter(socketio.emit)
         self.robots = {
             'robot_1': {
                 'id': 'ROBOT_001',
@@ -42,29 +95,53 @@ class RobotSystem:
             }
         }
         
-        self.authorized_visitors = {}  # visitor_id -> visitor_info
-        self.alerts = []
-        self.sensor_alerts = []
-        self.running = True
-        
-        # Start robot data generation
-        self.start_robot_simulation()
-    
-    def start_robot_simulation(self):
-        """Start robot data simulation in background"""
-        def simulate_robots():
-            while self.running:
-                try:
-                    self.update_robot_status()
-                    self.generate_robot_sensor_data()
-                    time.sleep(15)  # Update every 15 seconds
-                except Exception as e:
-                    print(f"Robot simulation error: {e}")
-                    time.sleep(15)
-        
-        robot_thread = threading.Thread(target=simulate_robots, daemon=True)
-        robot_thread.start()
+        # visitor_id -> visitor_info, evicted once valid_until passes
+        self.authorized_visitors = VisitorRegistry(
+            os.path.join(SHARED_DATA_PATH, 'authorized_visitors.jsonl'), load=False,
+            on_evict=self.visitors_expired
+        )
+        self.alerts = deque(maxlen=MAX_ALERTS)
+        self.sensor_alerts = deque(maxlen=MAX_SENSOR_ALERTS)
+        self.next_alert_id = 1
+        self.security_alert_times = {}  # visitor_id -> last security alert time
+        self.tasks = TaskScheduler(self.robots)
+        self.snapshot_cache = None
+        self.version = 0  # bumped on every change; keys cached response bodies
+        
+        # Nothing runs until start() (or the first command): the visitor log
+        # replay is queued first so every later command sees it
+        self.registry_loaded = self.loop.submit(self.authorized_visitors.load)
+        if RUN_SIMULATION:
+            self.loop.every(ROBOT_UPDATE_INTERVAL_SECONDS, self.simulation_tick)
+            self.loop.every(TASK_TICK_SECONDS, self.run_tasks)
+    
+    def start(self):
+        """Start the state loop: visitor log replay, then robot data generation"""
+        self.sensor_writer.start()
+        self.loop.start()
+    
+    def set_emitter(self, emit):
+        """Route broadcasts through another server, e.g. the ASGI server"""
+        if not metrics.ENABLED:
+            self.emit = emit
+            return
+        
+        def timed_emit(event, *args, **kwargs):
+            with metrics.timer(EMIT_SECONDS, event=event):
+                return emit(event, *args, **kwargs)
+        self.emit = timed_emit
+    
+    def simulation_tick(self):
+        self.update_robot_status()
+        self.generate_robot_sensor_data()
+        self.expire_visitors()
     
+    def changed(self):
+        """Invalidate the cached snapshot; call after every mutation"""
+        self.version += 1
+        self.snapshot_cache = None
+    
+    @on_loop
     def update_robot_status(self):
         """Update robot status and positions"""
         for robot_id, robot in self.robots.items():
@@ -73,7 +150,7 @@ class RobotSystem:
             
             # Occasionally move to different floors
             if np.random.random() < 0.3:  # 30% chance to move
-                robot['current_floor'] = np.random.choice(robot['assigned_floors'])
+                robot['current_floor'] = int(np.random.choice(robot['assigned_floors']))
             
             robot['last_seen'] = datetime.now().isoformat()
             
@@ -81,11 +158,21 @@ class RobotSystem:
             if robot['battery_level'] < 30:
                 self.create_alert(f"Low battery warning for {robot['name']}: {robot['battery_level']:.1f}%", 'warning')
         
-        # Emit real-time updates
-        socketio.emit('robot_status_update', self.robots)
+        self.tasks.sync_robots(self.robots)
+        self.changed()
+        
+        # Emit real-time updates: everything to the 'all' room, and each
+        # robot to clients following it or the floor it is on
+        robots = self.snapshot()['robots']
+        self.emit('robot_status_update', robots, to=ALL_ROOM)
+        for robot_id, robot in robots.items():
+            self.emit('robot_status_update', {robot_id: robot},
+                      to=[robot_room(robot_id), floor_room(robot['current_floor'])])
     
+    @on_loop
     def generate_robot_sensor_data(self):
         """Generate sensor data from robots"""
+        readings = []
         for robot_id, robot in self.robots.items():
             sensor_data = {
                 'robot_id': robot['id'],
@@ -99,35 +186,46 @@ class RobotSystem:
                 'noise_level': round(np.random.uniform(30, 70), 1)  # dB
             }
             
-            # Save sensor data
-            self.save_robot_sensor_data(sensor_data)
+            readings.append(sensor_data)
             
             # Update dashboard
             dashboard_manager.update_robot_data(robot_id, sensor_data)
         
-        # Emit sensor updates
-        socketio.emit('sensor_data_update', {'timestamp': datetime.now().isoformat()})
-    
-    def save_robot_sensor_data(self, data):
-        """Save robot sensor data to file"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        filename = os.path.join(SHARED_DATA_PATH, f"robot_sensors_{today}.json")
+        # Save sensor data on the writer thread; the loop moves on
+        self.sensor_writer.start()
+        self.sensor_writer.submit(self.save_robot_sensor_data, readings)
         
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = []
+        self.changed()
         
-        existing_data.append(data)
-        
-        with open(filename, 'w') as f:
-            json.dump(existing_data, f, indent=2)
+        # Emit sensor updates
+        self.emit('sensor_data_update', {'timestamp': datetime.now().isoformat()})
+    
+    @metrics.timed('robot_save_robot_sensor_data', 'Daily robot sensor file write time')
+    def save_robot_sensor_data(self, readings):
+        """Save a tick's robot sensor readings to file; runs on sensor_writer"""
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            filename = os.path.join(SHARED_DATA_PATH, f"robot_sensors_{today}.json")
+            
+            if os.path.exists(filename):
+                with open(filename, 'r') as f:
+                    existing_data = json.load(f)
+            else:
+                existing_data = []
+            
+            existing_data.extend(readings)
+            
+            tmp_filename = f"{filename}.tmp"
+            with open(tmp_filename, 'w') as f:
+                json.dump(existing_data, f, indent=2)
+            os.replace(tmp_filename, filename)
+        except Exception as e:
+            print(f"Error saving robot sensor data: {e}")
     
+    @on_loop
     def add_authorized_visitor(self, visitor_data):
         """Add authorized visitor from verification system"""
-        visitor_id = visitor_data['visitor_id']
-        self.authorized_visitors[visitor_id] = visitor_data
+        self.authorized_visitors.add(visitor_data)
         
         alert_msg = f"New authorized visitor: {visitor_data['name']} - Floor {visitor_data['destination_floor']}"
         self.create_alert(alert_msg, 'info')
@@ -135,8 +233,26 @@ class RobotSystem:
         print(f"Added authorized visitor: {visitor_data['name']}")
         
         # Emit visitor update
-        socketio.emit('new_visitor', visitor_data)
+        self.emit('new_visitor', visitor_data, to=[ALL_ROOM, floor_room(visitor_data['destination_floor'])])
     
+    @on_loop
+    def expire_visitors(self):
+        """Drop visitors whose passes have expired"""
+        return self.authorized_visitors.evict_expired()
+    
+    def visitors_expired(self, visitor_ids):
+        """Announce passes evicted by the registry.
+        
+        Lookups from request threads evict too, so the announcement is
+        queued on the loop rather than waited for.
+        """
+        self.loop.submit(self._announce_expired, visitor_ids)
+    
+    def _announce_expired(self, visitor_ids):
+        self.changed()
+        self.emit('visitors_expired', {'visitor_ids': visitor_ids})
+    
+    @on_loop
     def handle_threshold_alert(self, alert_data):
         """Handle sensor threshold violations from ML system"""
         self.sensor_alerts.append(alert_data)
@@ -152,120 +268,327 @@ class RobotSystem:
         print(f"Received threshold alert: {violations_str}")
         
         # Emit threshold alert
-        socketio.emit('threshold_alert', alert_data)
+        self.emit('threshold_alert', alert_data)
     
     def simulate_temperature_adjustment(self, alert_data):
-        """Simulate robot adjusting oil container temperature"""
-        maintenance_robot = self.robots['robot_2']
+        """Dispatch the best placed temperature-control robot to the oil container"""
+        self.submit_task('temperature_adjustment', alert_data.get('floor', OIL_CONTAINER_FLOOR), payload={
+            'sensor_id': alert_data['sensor_id'],
+            'target_temperature': 75.0  # Target temperature
+        })
+    
+    @on_loop
+    def submit_task(self, kind, floor, priority=None, payload=None):
+        """Queue a robot task and assign whatever the fleet can take now"""
+        task = self.tasks.submit(kind, floor, priority, payload, now=time.time())
+        if task['status'] == 'rejected':
+            print(f"No robot can take {kind} task on floor {floor}")
+            return task
+        self.assign_tasks()
+        return task
+    
+    @on_loop
+    def submit_tasks(self, tasks):
+        """Queue a batch of {kind, floor, priority?, payload?} tasks with one assignment pass"""
+        # Validate the whole batch first so a bad entry queues nothing
+        for t in tasks:
+            if t['kind'] not in self.tasks.task_types:
+                raise ValueError(f"Unknown task kind: {t['kind']}")
+            int(t['floor'])
+        now = time.time()
+        submitted = [self.tasks.submit(t['kind'], t['floor'], t.get('priority'), t.get('payload'), now=now)
+                     for t in tasks]
+        self.assign_tasks()
+        return submitted
+    
+    def assign_tasks(self):
+        for task in self.tasks.dispatch(time.time()):
+            robot = self.robots[task['robot']]
+            if task['kind'] == 'temperature_adjustment':
+                self.start_temperature_adjustment(robot, task)
+            self.emit('task_assigned', self.task_event(task), to=[ALL_ROOM, robot_room(task['robot'])])
+        self.changed()
+    
+    @on_loop
+    def run_tasks(self):
+        """Complete tasks whose robots have finished and hand out queued ones"""
+        completed = self.tasks.advance(time.time())
+        for task in completed:
+            self.robots[task['robot']]['current_floor'] = task['floor']
+            self.emit('task_completed', self.task_event(task), to=[ALL_ROOM, robot_room(task['robot'])])
+        if completed:
+            self.assign_tasks()
+    
+    @staticmethod
+    def task_event(task):
+        return {
+            'task_id': task['id'],
+            'kind': task['kind'],
+            'floor': task['floor'],
+            'priority': task['priority'],
+            'robot_id': task['robot'],
+            'status': task['status'],
+            'eta': datetime.fromtimestamp(task['eta']).isoformat()
+        }
+    
+    def start_temperature_adjustment(self, robot, task):
+        """Record a robot setting off to adjust oil container temperature"""
+        adjustment_data = {
+            'robot_id': robot['id'],
+            'action': 'temperature_adjustment',
+            'timestamp': datetime.now().isoformat(),
+            'target_temperature': task['payload']['target_temperature'],
+            'sensor_id': task['payload']['sensor_id'],
+            'status': 'adjusting',
+            'task_id': task['id'],
+            'eta': datetime.fromtimestamp(task['eta']).isoformat()
+        }
         
-        if 'temperature_control' in maintenance_robot['capabilities']:
-            adjustment_data = {
-                'robot_id': maintenance_robot['id'],
-                'action': 'temperature_adjustment',
-                'timestamp': datetime.now().isoformat(),
-                'target_temperature': 75.0,  # Target temperature
-                'sensor_id': alert_data['sensor_id'],
-                'status': 'adjusting'
-            }
-            
-            # Save adjustment action
-            adjustment_file = os.path.join(SHARED_DATA_PATH, f"temp_adjustment_{datetime.now().timestamp()}.json")
-            with open(adjustment_file, 'w') as f:
-                json.dump(adjustment_data, f, indent=2)
-            
-            self.create_alert(f"Maintenance robot adjusting oil container temperature", 'info')
-            
-            # Emit adjustment notification
-            socketio.emit('temperature_adjustment', adjustment_data)
+        # Save adjustment action
+        adjustment_file = os.path.join(SHARED_DATA_PATH, f"temp_adjustment_{datetime.now().timestamp()}.json")
+        with open(adjustment_file, 'w') as f:
+            json.dump(adjustment_data, f, indent=2)
+        
+        self.create_alert(f"{robot['name']} adjusting oil container temperature", 'info')
+        
+        # Emit adjustment notification
+        self.emit('temperature_adjustment', adjustment_data, to=[ALL_ROOM, robot_room(task['robot'])])
     
     def check_visitor_floor_access(self, visitor_id, current_floor):
         """Check if visitor is on authorized floor"""
-        if visitor_id not in self.authorized_visitors:
+        visitor = self.authorized_visitors.get(visitor_id)
+        if visitor is None:
             return False, "Unauthorized visitor detected"
         
-        visitor = self.authorized_visitors[visitor_id]
         authorized_floor = visitor['destination_floor']
         
         if current_floor != authorized_floor:
             alert_msg = f"SECURITY ALERT: {visitor['name']} detected on floor {current_floor} (authorized: {authorized_floor})"
-            self.create_alert(alert_msg, 'security')
+            self.raise_security_alert(visitor_id, alert_msg, floor=current_floor)
             return False, alert_msg
         
         return True, "Access authorized"
     
+    @on_loop
+    def raise_security_alert(self, visitor_id, message, now=None, floor=None):
+        """Create a security alert unless one was raised for this visitor recently.
+        
+        With a floor, a security robot is also dispatched there.
+        """
+        now = time.time() if now is None else now
+        last = self.security_alert_times.get(visitor_id)
+        if last is not None and now - last < SECURITY_ALERT_WINDOW_SECONDS:
+            return False
+        
+        self.security_alert_times[visitor_id] = now
+        self.create_alert(message, 'security')
+        if floor is not None:
+            self.submit_task('security_response', floor, payload={'visitor_id': visitor_id})
+        return True
+    
+    def check_visitor_positions(self, visitor_ids, floors):
+        """Check a patrol sweep of (visitor_id, floor) sightings in one pass.
+        
+        Returns one result code per sighting (ACCESS_*) plus counts of
+        security alerts raised and suppressed.
+        """
+        visitor_ids = np.asarray(visitor_ids)
+        floors = np.asarray(floors)
+        if visitor_ids.shape != floors.shape:
+            raise ValueError('visitor_ids and floors must have the same length')
+        
+        # Look each distinct visitor up once, then broadcast back to sightings
+        unique_ids, inverse = np.unique(visitor_ids, return_inverse=True)
+        authorized = self.authorized_visitors.authorized_floors(unique_ids.tolist())
+        known = np.array([floor is not None for floor in authorized], dtype=bool)
+        authorized_floor = np.array([-1 if floor is None else floor for floor in authorized])
+        
+        results = np.full(len(visitor_ids), ACCESS_AUTHORIZED, dtype=np.int8)
+        wrong_floor = known[inverse] & (floors != authorized_floor[inverse])
+        results[wrong_floor] = ACCESS_WRONG_FLOOR
+        results[~known[inverse]] = ACCESS_UNKNOWN_VISITOR
+        
+        # One alert per offending visitor per sweep, deduplicated across sweeps
+        pending_alerts = []
+        for i in np.flatnonzero(np.bincount(inverse[wrong_floor], minlength=len(unique_ids))):
+            visitor = self.authorized_visitors.get(unique_ids[i].item())
+            sighting_floors = np.unique(floors[wrong_floor & (inverse == i)]).tolist()
+            alert_msg = (f"SECURITY ALERT: {visitor['name'] if visitor else unique_ids[i]} detected on "
+                         f"floor {', '.join(map(str, sighting_floors))} (authorized: {authorized_floor[i]})")
+            pending_alerts.append((unique_ids[i].item(), alert_msg, sighting_floors[0]))
+        
+        raised = self.raise_security_alerts(pending_alerts)
+        suppressed = len(pending_alerts) - raised
+        
+        return {
+            'results': results.tolist(),
+            'authorized': int((results == ACCESS_AUTHORIZED).sum()),
+            'wrong_floor': int((results == ACCESS_WRONG_FLOOR).sum()),
+            'unknown': int((results == ACCESS_UNKNOWN_VISITOR).sum()),
+            'alerts_raised': raised,
+            'alerts_suppressed': suppressed
+        }
+    
+    @on_loop
+    def raise_security_alerts(self, pending_alerts):
+        """Raise a sweep's (visitor_id, message, floor) alerts; returns how many were not suppressed"""
+        now = time.time()
+        raised = sum(self.raise_security_alert(visitor_id, message, now, floor)
+                     for visitor_id, message, floor in pending_alerts)
+        self.prune_security_alert_times(now)
+        return raised
+    
+    def prune_security_alert_times(self, now):
+        """Forget alert times older than the suppression window"""
+        cutoff = now - SECURITY_ALERT_WINDOW_SECONDS
+        for visitor_id in [v for v, t in self.security_alert_times.items() if t < cutoff]:
+            del self.security_alert_times[visitor_id]
+    
+    @on_loop
     def create_alert(self, message, alert_type='info'):
         """Create system alert"""
         alert = {
-            'id': len(self.alerts) + 1,
+            'id': self.next_alert_id,
             'timestamp': datetime.now().isoformat(),
             'message': message,
             'type': alert_type,  # info, warning, critical, security
             'acknowledged': False
         }
         
-        self.alerts.append(alert)
+        self.next_alert_id += 1
         
-        # Keep only last 100 alerts
-        if len(self.alerts) > 100:
-            self.alerts = self.alerts[-100:]
+        # The deque keeps only the last MAX_ALERTS alerts
+        self.alerts.append(alert)
+        self.changed()
         
         # Emit alert
-        socketio.emit('new_alert', alert)
+        self.emit('new_alert', alert)
+    
+    @on_loop
+    def acknowledge_alert(self, alert_id):
+        """Mark an alert acknowledged; returns the updated alert or None"""
+        for i, alert in enumerate(self.alerts):
+            if alert['id'] == alert_id:
+                # Alerts are replaced, never mutated, so snapshots can share them
+                alert = dict(alert, acknowledged=True)
+                self.alerts[i] = alert
+                self.changed()
+                self.emit('alert_acknowledged', alert)
+                return alert
+        return None
+    
+    @on_loop
+    def build_snapshot(self):
+        if self.snapshot_cache is not None:
+            return self.snapshot_cache
+        
+        alerts = list(self.alerts)
+        robots = {robot_id: dict(robot) for robot_id, robot in self.robots.items()}
+        unacknowledged = sum(1 for a in alerts if not a['acknowledged'])
+        authorized_visitors = len(self.authorized_visitors)
+        self.snapshot_cache = {
+            'version': self.version,
+            'robots': robots,
+            'alerts': alerts,
+            'unacknowledged_alerts': unacknowledged,
+            'dashboard': {
+                'robots': robots,
+                'authorized_visitors': authorized_visitors,
+                'active_alerts': unacknowledged,
+                'counts': {
+                    'robots': len(robots),
+                    'authorized_visitors': authorized_visitors,
+                    'alerts': len(alerts),
+                    'active_alerts': unacknowledged,
+                    'pending_tasks': self.tasks.pending_count
+                },
+                'recent_alerts': alerts[-10:],  # Last 10 alerts
+                'sensor_data': dict(dashboard_manager.get_latest_sensor_data()),
+                'system_status': 'operational',
+                'last_updated': datetime.now().isoformat()
+            }
+        }
+        return self.snapshot_cache
+    
+    def snapshot(self):
+        """Read-only view of the current state; callers must not mutate it"""
+        snapshot = self.snapshot_cache
+        if snapshot is None:
+            snapshot = self.build_snapshot()
+        return snapshot
     
     def get_dashboard_data(self):
         """Get comprehensive dashboard data"""
-        return {
-            'robots': self.robots,
-            'authorized_visitors': len(self.authorized_visitors),
-            'active_alerts': len([a for a in self.alerts if not a['acknowledged']]),
-            'recent_alerts': self.alerts[-10:],  # Last 10 alerts
-            'sensor_data': dashboard_manager.get_latest_sensor_data(),
-            'system_status': 'operational',
-            'last_updated': datetime.now().isoformat()
-        }
+        return self.snapshot()['dashboard']
+    
+    @on_loop
+    def get_task_status(self):
+        return dict(self.tasks.get_stats(), robot_queues=self.tasks.robot_queues())
 
 # Initialize robot system
 robot_system = RobotSystem()
 
+# The state loop and visitor log replay start off the import path; /health
+# answers immediately and /ready reports progress
+readiness = startup.Readiness('robot-system')
+readiness.step('state_loop', robot_system.start)
+readiness.step('visitor_registry', robot_system.registry_loaded.result)
+
 @app.route('/')
 def dashboard():
     return render_template('dashboard.html')
 
+# Snapshot endpoints accept ?fields=a,b to return only those top-level keys
+# (e.g. ?fields=counts or ?fields=robots) and honour If-None-Match
+snapshot_responder = SnapshotResponder()
+
+def snapshot_response(view, build):
+    snapshot = robot_system.snapshot()
+    fields = parse_fields(request.args.get('fields'))
+    return snapshot_responder.respond(snapshot['version'], view, lambda: build(snapshot), fields)
+
 @app.route('/api/dashboard_data')
 def get_dashboard_data():
     """API endpoint for dashboard data"""
-    return jsonify(robot_system.get_dashboard_data())
+    return snapshot_response('dashboard', lambda snapshot: snapshot['dashboard'])
 
 @app.route('/api/robots')
 def get_robots():
     """Get robot status"""
-    return jsonify(robot_system.robots)
+    return snapshot_response('robots', lambda snapshot: snapshot['robots'])
 
 @app.route('/api/alerts')
 def get_alerts():
     """Get system alerts"""
+    return snapshot_response('alerts', lambda snapshot: {
+        'alerts': snapshot['alerts'],
+        'total': len(snapshot['alerts']),
+        'unacknowledged': snapshot['unacknowledged_alerts']
+    })
+
+@app.route('/api/floor_visitors/<int:floor>')
+def get_floor_visitors(floor):
+    """Get visitors currently authorized on a floor"""
+    visitor_ids = robot_system.authorized_visitors.on_floor(floor)
     return jsonify({
-        'alerts': robot_system.alerts,
-        'total': len(robot_system.alerts),
-        'unacknowledged': len([a for a in robot_system.alerts if not a['acknowledged']])
+        'floor': floor,
+        'visitor_ids': sorted(visitor_ids),
+        'total': len(visitor_ids)
     })
 
 @app.route('/api/acknowledge_alert/<int:alert_id>', methods=['POST'])
 def acknowledge_alert(alert_id):
     """Acknowledge an alert"""
-    for alert in robot_system.alerts:
-        if alert['id'] == alert_id:
-            alert['acknowledged'] = True
-            socketio.emit('alert_acknowledged', alert)
-            return jsonify({'success': True})
+    if robot_system.acknowledge_alert(alert_id) is not None:
+        return jsonify({'success': True})
     
     return jsonify({'success': False, 'message': 'Alert not found'}), 404
 
 @app.route('/new_visitor', methods=['POST'])
 def new_visitor():
-    """Receive new visitor data from verification system"""
+    """Receive new visitor data from verification system (JSON or MessagePack)"""
     try:
-        visitor_data = request.get_json()
+        visitor_data = wire.read_body()
         robot_system.add_authorized_visitor(visitor_data)
         
         # Create trigger file for Jenkins
@@ -274,14 +597,18 @@ def new_visitor():
             f.write(f"Robot pipeline triggered by new visitor at {datetime.now().isoformat()}")
         
         return jsonify({'success': True, 'message': 'Visitor authorized'})
+    except wire.UnsupportedMediaType as e:
+        return jsonify({'success': False, 'error': str(e), 'supported': wire.supported_types()}), 415
+    except wire.MalformedBody as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/threshold_alert', methods=['POST'])
 def threshold_alert():
-    """Receive threshold alerts from sensor ML system"""
+    """Receive threshold alerts from sensor ML system (JSON or MessagePack)"""
     try:
-        alert_data = request.get_json()
+        alert_data = wire.read_body()
         robot_system.handle_threshold_alert(alert_data)
         
         # Create trigger file for Jenkins
@@ -290,6 +617,34 @@ def threshold_alert():
             f.write(f"Robot threshold response triggered at {datetime.now().isoformat()}")
         
         return jsonify({'success': True, 'message': 'Alert processed'})
+    except wire.UnsupportedMediaType as e:
+        return jsonify({'success': False, 'error': str(e), 'supported': wire.supported_types()}), 415
+    except wire.MalformedBody as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/tasks', methods=['GET'])
+def get_tasks():
+    """Task queue depth, per-robot queues and completion latency"""
+    return jsonify(robot_system.get_task_status())
+
+@app.route('/api/tasks', methods=['POST'])
+def submit_tasks():
+    """Queue robot tasks.
+    
+    Accepts one {"kind": ..., "floor": ..., "priority": ...} task or
+    {"tasks": [...]} to submit a batch with a single assignment pass.
+    """
+    try:
+        data = request.get_json()
+        tasks = robot_system.submit_tasks(data['tasks'] if 'tasks' in data else [data])
+        return jsonify({
+            'success': True,
+            'tasks': [{'task_id': t['id'], 'status': t['status'], 'robot_id': t.get('robot')} for t in tasks]
+        })
+    except (KeyError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -310,16 +665,78 @@ def check_visitor_access():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/check_visitor_positions', methods=['POST'])
+def check_visitor_positions():
+    """Check a batch of patrol sightings.
+    
+    Accepts either columnar {"visitor_ids": [...], "floors": [...]} or
+    {"sightings": [[visitor_id, floor], ...]}.
+    """
+    try:
+        data = request.get_json()
+        if 'sightings' in data:
+            sightings = data['sightings']
+            visitor_ids = [s[0] for s in sightings]
+            floors = [s[1] for s in sightings]
+        else:
+            visitor_ids = data.get('visitor_ids', [])
+            floors = data.get('floors', [])
+        
+        result = robot_system.check_visitor_positions(visitor_ids, floors)
+        result['codes'] = {
+            'authorized': ACCESS_AUTHORIZED,
+            'wrong_floor': ACCESS_WRONG_FLOOR,
+            'unknown_visitor': ACCESS_UNKNOWN_VISITOR
+        }
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus-style metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ready')
+def ready():
+    """Readiness probe with start-up progress"""
+    return readiness.response()
+
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy', 'service': 'robot-system'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'robot-system',
+        'ready': readiness.is_ready(),
+        'state_loop': robot_system.loop.get_stats(),
+        'sensor_writer': robot_system.sensor_writer.get_stats(),
+        'snapshot_cache': snapshot_responder.get_stats()
+    })
 
 # WebSocket events
 @socketio.on('connect')
 def handle_connect():
     print('Client connected to robot system')
+    join_room(ALL_ROOM)
     emit('connected', {'status': 'Connected to Robot System'})
 
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Receive updates only for the given floors and robots"""
+    leave_room(ALL_ROOM)
+    for room in topic_rooms(data.get('floors', []), data.get('robots', [])):
+        join_room(room)
+    emit('subscribed', {'rooms': sorted(r for r in rooms() if r != request.sid)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    for room in topic_rooms(data.get('floors', []), data.get('robots', [])):
+        leave_room(room)
+    # Back to every update once no topics are left
+    if not [r for r in rooms() if r != request.sid]:
+        join_room(ALL_ROOM)
+    emit('subscribed', {'rooms': sorted(r for r in rooms() if r != request.sid)})
+
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected from robot system')
@@ -329,4 +746,10 @@ def handle_dashboard_update():
     emit('dashboard_data', robot_system.get_dashboard_data())
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+    readiness.start()
+    if SERVER_MODE == 'asgi':
+        from asgi_server import serve
+        serve(app, robot_system, host='0.0.0.0', port=5000,
+              client_manager=create_client_manager(BROADCAST_BACKEND, BROADCAST_URL, async_mode=True))
+    else:
+        socketio.run(app, host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,123 @@
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# How long a request thread waits for the loop before giving up
+COMMAND_TIMEOUT_SECONDS = 10
+
+
+class StateLoop:
+    """Single writer thread that owns a service's mutable state.
+
+    Commands are queued and run one at a time on the loop thread, so the
+    state they touch needs no locks. Periodic jobs run on the same thread
+    between commands. Commands issued from the loop thread itself run inline.
+    Commands may be queued before start(); the first call() starts the loop
+    if nobody has. A stopped loop can be started again on a fresh thread.
+    """
+
+    def __init__(self, name='state-loop'):
+        self.queue = queue.Queue()
+        self.timers = []  # [next_run, interval, fn]
+        self.name = name
+        self.running = False
+        self.start_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.stats = {
+            'commands': 0,
+            'timer_runs': 0,
+            'errors': 0,
+            'max_queue_depth': 0
+        }
+
+    def start(self):
+        with self.start_lock:
+            if self.running and self.thread.is_alive():
+                return
+            if self.thread.ident is not None:
+                # Let a stopping thread drain out before replacing it
+                if self.thread.is_alive() and not self.in_loop():
+                    self.thread.join()
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.running = True
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.queue.put(None)
+
+    def in_loop(self):
+        return threading.current_thread() is self.thread
+
+    def every(self, interval_seconds, fn):
+        """Run fn on the loop now and then every interval_seconds"""
+        self.timers.append([time.monotonic(), interval_seconds, fn])
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on the loop; returns a Future"""
+        future = Future()
+        if self.in_loop():
+            self._execute(fn, args, kwargs, future)
+            return future
+
+        self.queue.put((fn, args, kwargs, future))
+        depth = self.queue.qsize()
+        if depth > self.stats['max_queue_depth']:
+            self.stats['max_queue_depth'] = depth
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn on the loop and wait for its result"""
+        if not self.running:
+            self.start()
+        return self.submit(fn, *args, **kwargs).result(COMMAND_TIMEOUT_SECONDS)
+
+    def _execute(self, fn, args, kwargs, future):
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.stats['errors'] += 1
+            if future is None:
+                print(f"State loop error in {getattr(fn, '__name__', fn)}: {e}")
+            else:
+                future.set_exception(e)
+            return
+        if future is not None:
+            future.set_result(result)
+
+    def _run_due_timers(self):
+        """Run due periodic jobs; returns seconds until the next one"""
+        if not self.timers:
+            return None
+        now = time.monotonic()
+        for timer in self.timers:
+            if timer[0] <= now:
+                self._execute(timer[2], (), {}, None)
+                self.stats['timer_runs'] += 1
+                timer[0] = now + timer[1]
+        return max(0.0, min(timer[0] for timer in self.timers) - time.monotonic())
+
+    def _run(self):
+        while self.running:
+            timeout = self._run_due_timers()
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is None:
+                continue
+            self.stats['commands'] += 1
+            self._execute(*item)
+
+    def get_stats(self):
+        return dict(self.stats, queue_depth=self.queue.qsize(), running=self.running)
+
+
+def on_loop(method):
+    """Run a method on its owner's `loop`, waiting for the result"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.loop.call(method, self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,211 @@
+import heapq
+import itertools
+from collections import deque
+import numpy as np
+import metrics
+
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+# kind -> capability a robot needs, default priority, seconds of work on site
+TASK_TYPES = {
+    'temperature_adjustment': {'capability': 'temperature_control', 'priority': PRIORITY_CRITICAL, 'service_seconds': 120},
+    'security_response': {'capability': 'security_patrol', 'priority': PRIORITY_HIGH, 'service_seconds': 60},
+    'access_check': {'capability': 'access_control', 'priority': PRIORITY_HIGH, 'service_seconds': 30},
+    'visitor_escort': {'capability': 'visitor_tracking', 'priority': PRIORITY_NORMAL, 'service_seconds': 90},
+    'equipment_check': {'capability': 'equipment_monitoring', 'priority': PRIORITY_LOW, 'service_seconds': 45}
+}
+
+SECONDS_PER_FLOOR = 20
+# Robots below this battery level take no new tasks
+MIN_DISPATCH_BATTERY = 25
+# Cost (in seconds) added for a flat battery, scaled linearly from full
+BATTERY_PENALTY_SECONDS = 60
+# Cost added per task already queued on a robot, on top of its backlog time
+QUEUE_PENALTY_SECONDS = 5
+# Cost added for sending a robot outside its assigned floors
+OFF_FLOOR_PENALTY_SECONDS = 90
+# Tasks queued per robot; the rest wait in the shared priority queue so
+# urgent arrivals can still overtake them
+MAX_ROBOT_QUEUE = 8
+MAX_PENDING_TASKS = 10000
+# Recent latencies kept for percentiles in get_stats()
+LATENCY_WINDOW = 10000
+
+TASK_BUCKETS = (0.001, 0.01, 0.1, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+TASK_WAIT_SECONDS = metrics.histogram('robot_task_wait_seconds', 'Time from task submission to robot assignment',
+                                      TASK_BUCKETS)
+TASK_LATENCY_SECONDS = metrics.histogram('robot_task_latency_seconds', 'Time from task submission to completion',
+                                         TASK_BUCKETS)
+TASKS_TOTAL = metrics.counter('robot_tasks_total', 'Robot tasks by outcome')
+
+
+class TaskScheduler:
+    """Priority queue of robot tasks assigned to the cheapest capable robot.
+
+    A task's cost on a robot is the time until that robot could finish it
+    (its queued backlog, travel from the floor its queue ends on, and the
+    work itself) plus penalties for low battery, queue length and working
+    off its assigned floors. Robot state lives in NumPy arrays so scoring a
+    task against the whole fleet is a handful of vector operations.
+
+    Not thread-safe: the robot system drives it from its state loop.
+    """
+
+    def __init__(self, robots, task_types=TASK_TYPES, max_robot_queue=MAX_ROBOT_QUEUE,
+                 max_pending=MAX_PENDING_TASKS, seconds_per_floor=SECONDS_PER_FLOOR):
+        self.task_types = task_types
+        self.seconds_per_floor = seconds_per_floor
+        self.max_robot_queue = max_robot_queue
+        self.max_pending = max_pending
+        self.pending = {t['capability']: [] for t in task_types.values()}  # capability -> heap of (priority, task_id, task)
+        self.pending_count = 0
+        self.sequence = itertools.count(1)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {'submitted': 0, 'assigned': 0, 'completed': 0, 'rejected': 0}
+
+        self.robot_ids = list(robots)
+        n = len(self.robot_ids)
+        self.queues = {robot_id: deque() for robot_id in self.robot_ids}
+        self.queue_len = np.zeros(n, dtype=np.int64)
+        self.busy_until = np.zeros(n)
+        self.tail_floor = np.zeros(n, dtype=np.int64)  # floor each robot's queue ends on
+        self.battery = np.zeros(n)
+        self.capable = {
+            capability: np.array([capability in robots[r]['capabilities'] for r in self.robot_ids])
+            for capability in {t['capability'] for t in task_types.values()}
+        }
+        self.covers = {}  # floor -> robots assigned to it
+        for i, robot_id in enumerate(self.robot_ids):
+            for floor in robots[robot_id]['assigned_floors']:
+                self.covers.setdefault(floor, np.zeros(n, dtype=bool))[i] = True
+        self.sync_robots(robots)
+
+    def sync_robots(self, robots):
+        """Pick up battery levels, and floors of robots with nothing queued"""
+        for i, robot_id in enumerate(self.robot_ids):
+            robot = robots[robot_id]
+            self.battery[i] = robot['battery_level']
+            if not self.queues[robot_id]:
+                self.tail_floor[i] = robot['current_floor']
+
+    def submit(self, kind, floor, priority=None, payload=None, now=0.0):
+        """Queue a task; returns it, with status 'rejected' if no robot could ever take it"""
+        task_type = self.task_types.get(kind)
+        if task_type is None:
+            raise ValueError(f"Unknown task kind: {kind}")
+
+        task = {
+            'id': next(self.sequence),
+            'kind': kind,
+            'floor': int(floor),
+            'priority': task_type['priority'] if priority is None else int(priority),
+            'payload': payload,
+            'created': now,
+            'status': 'pending'
+        }
+        self.stats['submitted'] += 1
+        capability = task_type['capability']
+        if not self.capable[capability].any() or self.pending_count >= self.max_pending:
+            task['status'] = 'rejected'
+            self.stats['rejected'] += 1
+            TASKS_TOTAL.inc(kind=kind, outcome='rejected')
+            return task
+
+        heapq.heappush(self.pending[capability], (task['priority'], task['id'], task))
+        self.pending_count += 1
+        return task
+
+    def _available(self, capability):
+        return (self.capable[capability]
+                & (self.battery >= MIN_DISPATCH_BATTERY)
+                & (self.queue_len < self.max_robot_queue))
+
+    def _cost(self, task, available, now):
+        floor = task['floor']
+        cost = (np.maximum(self.busy_until - now, 0)
+                + np.abs(self.tail_floor - floor) * self.seconds_per_floor
+                + (100 - self.battery) / 100 * BATTERY_PENALTY_SECONDS
+                + self.queue_len * QUEUE_PENALTY_SECONDS)
+        covers = self.covers.get(floor)
+        cost += OFF_FLOOR_PENALTY_SECONDS if covers is None else np.where(covers, 0, OFF_FLOOR_PENALTY_SECONDS)
+        return np.where(available, cost, np.inf)
+
+    def dispatch(self, now):
+        """Assign pending tasks in priority order; returns the assigned tasks.
+
+        Each assignment updates the chosen robot's backlog before the next
+        task is scored, so a burst spreads across the fleet instead of
+        piling onto whichever robot looked best at the start. Pending tasks
+        are kept in one heap per capability, so tasks waiting on busy
+        robots are never rescanned.
+        """
+        assigned = []
+        open_heaps = {capability: heap for capability, heap in self.pending.items() if heap}
+        while open_heaps:
+            capability = min(open_heaps, key=lambda c: open_heaps[c][0][:2])
+            available = self._available(capability)
+            if not available.any():
+                # Queues only grow during a pass, so this capability stays blocked
+                del open_heaps[capability]
+                continue
+
+            heap = open_heaps[capability]
+            task = heapq.heappop(heap)[2]
+            self.pending_count -= 1
+            if not heap:
+                del open_heaps[capability]
+
+            i = int(np.argmin(self._cost(task, available, now)))
+            robot_id = self.robot_ids[i]
+            service_seconds = self.task_types[task['kind']]['service_seconds']
+            start = max(self.busy_until[i], now)
+            travel = abs(int(self.tail_floor[i]) - task['floor']) * self.seconds_per_floor
+            task.update(status='assigned', robot=robot_id, assigned=now, eta=start + travel + service_seconds)
+
+            self.queues[robot_id].append(task)
+            self.queue_len[i] += 1
+            self.busy_until[i] = task['eta']
+            self.tail_floor[i] = task['floor']
+
+            self.stats['assigned'] += 1
+            TASK_WAIT_SECONDS.observe(now - task['created'], kind=task['kind'])
+            TASKS_TOTAL.inc(kind=task['kind'], outcome='assigned')
+            assigned.append(task)
+        return assigned
+
+    def advance(self, now):
+        """Complete every queued task whose ETA has passed; returns them"""
+        completed = []
+        for i, robot_id in enumerate(self.robot_ids):
+            queue = self.queues[robot_id]
+            while queue and queue[0]['eta'] <= now:
+                task = queue.popleft()
+                self.queue_len[i] -= 1
+                task.update(status='completed', completed=task['eta'])
+
+                latency = task['eta'] - task['created']
+                self.latencies.append(latency)
+                self.stats['completed'] += 1
+                TASK_LATENCY_SECONDS.observe(latency, kind=task['kind'])
+                TASKS_TOTAL.inc(kind=task['kind'], outcome='completed')
+                completed.append(task)
+        return completed
+
+    def robot_queues(self):
+        return {robot_id: [task['id'] for task in queue] for robot_id, queue in self.queues.items()}
+
+    def get_stats(self):
+        latencies = np.fromiter(self.latencies, dtype=np.float64)
+        percentiles = {}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            percentiles = {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+        return dict(
+            self.stats,
+            pending=self.pending_count,
+            queued={robot_id: len(queue) for robot_id, queue in self.queues.items()},
+            latency_seconds=percentiles
+        )
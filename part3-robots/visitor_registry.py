@@ -0,0 +1,139 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+class VisitorRegistry:
+    """Authorized visitors indexed by ID and floor, expiring at valid_until.
+
+    A min-heap of expiry times evicts passes in O(log n); floor lookups are
+    a dict access. Additions are appended to a JSON-lines log that is
+    replayed (and compacted) on start-up. Every eviction, including the
+    lazy ones done by lookups, is reported to on_evict(visitor_ids).
+    """
+
+    def __init__(self, log_path, load=True, on_evict=None):
+        self.log_path = log_path
+        self.by_id = {}      # visitor_id -> visitor_data
+        self.by_floor = {}   # floor -> set of visitor_ids
+        self.expiry_heap = []  # (valid_until timestamp, sequence, visitor_id)
+        self.heap_keys = {}    # visitor_id -> (valid_until timestamp, sequence) of its live heap entry
+        # Ties on valid_until are broken by insertion order, never by the
+        # IDs, which may mix ints and strings
+        self.sequence = itertools.count()
+        self.on_evict = on_evict
+        self.lock = threading.RLock()
+        if load:
+            self.load()
+
+    @staticmethod
+    def _expiry(visitor_data):
+        valid_until = visitor_data.get('valid_until')
+        if not valid_until:
+            return float('inf')
+        return datetime.fromisoformat(valid_until).timestamp()
+
+    def _insert(self, visitor_data):
+        visitor_id = visitor_data['visitor_id']
+        self._remove(visitor_id)
+
+        expires_at = self._expiry(visitor_data)
+        floor = visitor_data.get('destination_floor')
+        self.by_id[visitor_id] = visitor_data
+        self.by_floor.setdefault(floor, set()).add(visitor_id)
+        key = (expires_at, next(self.sequence))
+        self.heap_keys[visitor_id] = key
+        heapq.heappush(self.expiry_heap, key + (visitor_id,))
+
+    def _remove(self, visitor_id):
+        visitor = self.by_id.pop(visitor_id, None)
+        if visitor is None:
+            return None
+        floor_visitors = self.by_floor.get(visitor.get('destination_floor'))
+        if floor_visitors is not None:
+            floor_visitors.discard(visitor_id)
+            if not floor_visitors:
+                del self.by_floor[visitor.get('destination_floor')]
+        self.heap_keys.pop(visitor_id, None)
+        return visitor
+
+    def evict_expired(self, now=None):
+        """Remove every pass whose valid_until has passed; returns the evicted IDs"""
+        now = time.time() if now is None else now
+        evicted = []
+        with self.lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                expires_at, sequence, visitor_id = heapq.heappop(self.expiry_heap)
+                # Skip stale heap entries left behind by re-registration
+                if self.heap_keys.get(visitor_id) == (expires_at, sequence):
+                    self._remove(visitor_id)
+                    evicted.append(visitor_id)
+            if evicted and self.on_evict is not None:
+                self.on_evict(evicted)
+        return evicted
+
+    def add(self, visitor_data):
+        with self.lock:
+            self._insert(visitor_data)
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(visitor_data) + '\n')
+
+    def get(self, visitor_id):
+        """Visitor data if the pass is still valid, else None"""
+        with self.lock:
+            self.evict_expired()
+            return self.by_id.get(visitor_id)
+
+    def authorized_floors(self, visitor_ids):
+        """Authorized floor per visitor ID (None if unknown or expired)"""
+        with self.lock:
+            self.evict_expired()
+            floors = []
+            for visitor_id in visitor_ids:
+                visitor = self.by_id.get(visitor_id)
+                floors.append(visitor.get('destination_floor') if visitor is not None else None)
+            return floors
+
+    def on_floor(self, floor):
+        """IDs of visitors currently authorized on a floor"""
+        with self.lock:
+            self.evict_expired()
+            return set(self.by_floor.get(floor, ()))
+
+    def floor_counts(self):
+        with self.lock:
+            self.evict_expired()
+            return {floor: len(ids) for floor, ids in self.by_floor.items()}
+
+    def __contains__(self, visitor_id):
+        return self.get(visitor_id) is not None
+
+    def __len__(self):
+        with self.lock:
+            self.evict_expired()
+            return len(self.by_id)
+
+    def load(self):
+        """Replay the log, keeping only still-valid passes, and compact it"""
+        if not os.path.exists(self.log_path):
+            return
+        with self.lock:
+            with open(self.log_path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._insert(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        print(f"Skipping invalid visitor registry entry: {e}")
+            self.evict_expired()
+
+            tmp_path = f"{self.log_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                for visitor_data in self.by_id.values():
+                    f.write(json.dumps(visitor_data) + '\n')
+            os.replace(tmp_path, self.log_path)